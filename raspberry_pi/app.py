@@ -1,15 +1,35 @@
 """
 Application Flask pour le contrôleur Palazzetti
 """
+import math
 import time
+import select
+import socket
 import threading
 import logging
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
+from flask_sock import Sock
 from config import *
-from palazzetti_controller import PalazzettiController
+from palazzetti_controller import PalazzettiController, READ_STEPS, STATE_STEPS, plan_reads
 from consumption_storage import ConsumptionStorage
+from sqlite_storage import SQLiteConsumptionStorage
+from history_store import HistoryStore, HISTORY_METRICS
+from recent_buffer import RecentBuffer
+from heating_analytics import HeatingAnalytics
+from history_export import export_samples, EXPORT_FORMATS
 from email_notifications import EmailNotificationManager
 from notification_scheduler import start_notification_scheduler, stop_notification_scheduler
+from notification_outbox import start_notification_outbox, stop_notification_outbox
+from bus_scheduler import (bus_scheduler, start_bus_scheduler, stop_bus_scheduler, get_bus_status,
+                           PRIORITY_COMMAND, PRIORITY_INTERACTIVE, JOB_DROPPED)
+from realtime import realtime_hub
+from mqtt_bridge import mqtt_bridge, start_mqtt_bridge, stop_mqtt_bridge
+from http_server import http_server, stop_http_server
+from response_cache import response_cache
+from rate_limiter import rate_limiter, CLASS_BUS_READ, CLASS_COMMAND
+from metrics import metrics
+from connection_supervisor import (start_connection_supervisor, stop_connection_supervisor,
+                                   get_connection_status, request_reconnect)
 
 # Configuration du logging
 import os
@@ -27,10 +47,16 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'palazzetti_secret'
+# Pings WebSocket: une session inactive reste ouverte, un client disparu est détecté
+app.config['SOCK_SERVER_OPTIONS'] = {'ping_interval': REALTIME_PING_INTERVAL or None}
+sock = Sock(app)
 
 # Instance globale du contrôleur (sera initialisée dans main())
 controller = None
 consumption_storage = None
+history_store = None
+recent_buffer = None
+heating_analytics = None
 email_notification_manager = None
 
 
@@ -51,9 +77,234 @@ def consumption():
 
 
 
+def _client_id():
+    """Identifiant du client pour le contrôle d'admission"""
+    return request.remote_addr or 'inconnu'
+
+
+def _admit_bus_read():
+    """
+    Admettre une requête qui forcerait une lecture sur le bus
+    
+    Returns:
+        bool: False si le client est hors budget: la réponse doit venir du cache
+    """
+    if rate_limiter.allow(_client_id(), CLASS_BUS_READ):
+        return True
+    g.served_from_cache = True
+    return False
+
+
+def _too_many_requests(endpoint_class):
+    """Réponse 429 avec le délai avant la prochaine requête admise"""
+    retry = max(1, math.ceil(rate_limiter.retry_after(_client_id(), endpoint_class)))
+    response = jsonify({'success': False, 'error': f'Trop de requêtes - réessayer dans {retry} s'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry)
+    return response
+
+
+def _pellet_consumption():
+    """Lire le compteur de consommation, ou reprendre la dernière valeur si le client est hors budget"""
+    if _admit_bus_read():
+        consumption = _bus_run('pellet_consumption', controller.get_pellet_consumption)
+        if not g.get('bus_dropped'):
+            return consumption
+    return controller.state.get('pellet_consumption')
+
+
+HTTP_LATENCY = metrics.histogram(
+    'palazzetti_http_request_duration_seconds', "Durée de traitement des requêtes HTTP", ('route', 'method'))
+
+
+@app.before_request
+def _start_timer():
+    """Début du traitement de la requête (latence par route)"""
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def _record_latency(response):
+    """Enregistrer la latence de la requête (hors connexions WebSocket, qui durent toute la session)"""
+    if 'started' in g and request.headers.get('Upgrade', '').lower() != 'websocket':
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - g.started, route=route, method=request.method)
+    return response
+
+
+@app.before_request
+def _set_deadline():
+    """Échéance de la requête: REQUEST_TIMEOUT, ou moins si le client le demande (X-Request-Timeout)"""
+    timeout = REQUEST_TIMEOUT
+    if request.headers.get('X-Request-Timeout'):
+        try:
+            timeout = min(timeout, max(0.0, float(request.headers['X-Request-Timeout'])))
+        except ValueError:
+            pass
+    g.deadline = time.time() + timeout
+
+
+def _client_gone_check():
+    """
+    Fonction de détection de la déconnexion du client de la requête en cours
+    
+    Un client qui abandonne sa requête (AbortController, onglet fermé) ferme la
+    connexion: le socket devient lisible et ne renvoie plus rien.
+    
+    Returns:
+        Fonction sans argument (appelée depuis le thread du bus) ou None si le socket n'est pas accessible
+    """
+    connection = request.environ.get('werkzeug.socket')
+    if connection is None:
+        return None
+    
+    def _client_gone():
+        try:
+            readable, _, _ = select.select([connection], [], [], 0)
+            return bool(readable) and connection.recv(1, socket.MSG_PEEK) == b''
+        except ValueError:
+            return False  # Socket déjà fermé par le serveur ou TLS: pas de détection
+        except OSError:
+            return True  # Connexion réinitialisée par le client
+    
+    return _client_gone
+
+
+def _bus_run(name, func, priority=PRIORITY_INTERACTIVE):
+    """
+    Exécuter une opération sur le bus pour la requête en cours
+    
+    Le job porte l'échéance de la requête et la détection de déconnexion: il
+    est abandonné sans accès au bus si personne n'attend plus son résultat.
+    
+    Returns:
+        Résultat de l'opération (None si échec ou abandon; g.bus_dropped indique l'abandon)
+    """
+    job = bus_scheduler.submit(name, func, priority, deadline=g.deadline, cancel_check=_client_gone_check())
+    result = bus_scheduler.wait(job)
+    if job.state == JOB_DROPPED:
+        g.bus_dropped = True
+    return result
+
+
+def _deadline_exceeded():
+    """Réponse 504: l'opération n'a pas pu passer sur le bus avant l'échéance de la requête"""
+    return jsonify({'success': False, 'error': "Délai dépassé - opération non envoyée au poêle"}), 504
+
+
+@app.before_request
+def _admit_websocket():
+    """Connexion WebSocket: place réservée (REALTIME_MAX_CLIENTS) et socket sans délai keep-alive"""
+    if request.endpoint != 'ws_realtime':
+        return None
+    if not realtime_hub.reserve():
+        response = jsonify({'error': 'Trop de clients temps réel connectés'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    g.realtime_slot = True
+    # Le délai keep-alive du serveur HTTP fermerait une session inactive: les pings la surveillent
+    connection = request.environ.get('werkzeug.socket')
+    if connection is not None:
+        connection.settimeout(None)
+    return None
+
+
+@app.teardown_request
+def _release_websocket(exc):
+    """Libérer la place du client WebSocket à la fin de la connexion"""
+    if g.pop('realtime_slot', False):
+        realtime_hub.release()
+
+
+@app.after_request
+def _mark_cached_response(response):
+    """Signaler les réponses servies depuis le cache faute de budget"""
+    if g.get('served_from_cache'):
+        response.headers['X-Served-From'] = 'cache'
+    return response
+
+
+# Préfixe des ETags: les compteurs de version repartent de zéro à chaque démarrage
+ETAG_PREFIX = f"{int(time.time()):x}"
+
+
+def _cache_headers(response, etag, max_age):
+    """
+    Ajouter l'ETag (faible: l'horodatage de lecture n'en fait pas partie) et la durée de validité
+    
+    Args:
+        response: Réponse Flask
+        etag: Version du contenu
+        max_age: Secondes avant que les champs servis soient à relire
+    """
+    response.set_etag(etag, weak=True)
+    response.cache_control.max_age = max_age
+    return response
+
+
+def _not_modified(etag, max_age):
+    """Réponse 304 avec les mêmes en-têtes de cache que la réponse complète"""
+    return _cache_headers(app.response_class(status=304), etag, max_age)
+
+
+# Champs toujours présents dans une réponse partielle de /api/state
+STATE_BASE_FIELDS = ('connected', 'synchronized', 'link_down', 'timestamp')
+
+
+def _state_payload(fields):
+    """
+    Contenu de /api/state (sérialisé une fois par version par le cache de réponses)
+    
+    Args:
+        fields: Champs demandés (None pour l'état complet)
+    """
+    state = controller.state
+    if fields is None:
+        state = state.copy()
+    else:
+        state = {field: state.get(field) for field in STATE_BASE_FIELDS + tuple(fields)}
+    
+    if fields is None or 'fill_level' in fields:
+        # Ajouter le taux de remplissage si disponible
+        try:
+            consumption = controller.state.get('pellet_consumption')
+            if consumption is not None and consumption_storage:
+                # Mettre à jour le stockage
+                consumption_storage.update_total_consumption(consumption)
+                # Calculer le taux de remplissage
+                fill_data = consumption_storage.get_fill_level(consumption)
+                if fill_data:
+                    state['fill_level'] = fill_data
+                else:
+                    state['fill_level'] = None
+            else:
+                state['fill_level'] = None
+        except Exception as e:
+            logger.warning(f"Erreur lors de la lecture du taux de remplissage: {e}")
+            state['fill_level'] = None
+    
+    return state
+
+
 @app.route('/api/state')
 def api_state():
-    """API pour obtenir l'état du poêle avec vérification de connexion"""
+    """
+    API pour obtenir l'état du poêle avec vérification de connexion
+    
+    ?fields=temperature,status limite la réponse à ces champs: seuls leurs
+    registres sont relus (si leur cache a expiré), le reste n'est pas lu.
+    """
+    fields = None
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        # fill_level est calculé à partir du compteur de consommation
+        state_fields = ['pellet_consumption' if field == 'fill_level' else field for field in fields]
+        try:
+            steps = plan_reads(state_fields)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    
     if controller is None:
         logger.warning("Contrôleur non initialisé - retour d'état par défaut")
         default_state = {
@@ -97,30 +348,43 @@ def api_state():
     
     # Si connecté, tenter de lire l'état
     try:
-        state = controller.get_state()
+        if fields is None:
+            steps = STATE_STEPS + ('pellet_consumption',)
+        
+        def _read_state():
+            if fields is not None:
+                return controller.get_state(fields=state_fields)
+            state = controller.get_state()
+            # Compteur repris du cache s'il a été lu récemment (surveillance, lecture groupée)
+            controller.read_steps(['pellet_consumption'], controller.state_cache_duration)
+            return state
+        
+        if controller.remaining_ttl(steps) > 0:
+            state = _read_state()  # Tout est en cache: pas d'accès au bus
+        elif not _admit_bus_read():
+            # Hors budget: dernier état connu, sans accès au bus
+            state = controller.state
+        else:
+            # Lecture par la file du bus, abandonnée si le client part avant son tour
+            state = _bus_run('state', _read_state) or controller.state
         
         # Vérifier que l'état contient des données valides
         if state and state.get('connected', False) and state.get('synchronized', False):
-            # Ajouter le taux de remplissage si disponible
-            try:
-                consumption = controller.get_pellet_consumption()
-                if consumption is not None and consumption_storage:
-                    # Mettre à jour le stockage
-                    consumption_storage.update_total_consumption(consumption)
-                    # Calculer le taux de remplissage
-                    fill_data = consumption_storage.get_fill_level(consumption)
-                    if fill_data:
-                        state['fill_level'] = fill_data
-                    else:
-                        state['fill_level'] = None
-                else:
-                    state['fill_level'] = None
-            except Exception as e:
-                logger.warning(f"Erreur lors de la lecture du taux de remplissage: {e}")
-                state['fill_level'] = None
+            # Version de l'état (et du stockage si fill_level est servi): un client à jour reçoit 304 sans corps
+            etag = f"{ETAG_PREFIX}-state-{controller.state_version()}"
+            if (fields is None or 'fill_level' in fields) and consumption_storage:
+                etag += f"-{consumption_storage.revision}"
+            if fields is not None:
+                etag += f"-{','.join(fields)}"
+            max_age = controller.remaining_ttl(steps)
+            if request.if_none_match.contains_weak(etag):
+                return _not_modified(etag, max_age)
             
-            logger.info("État lu avec succès depuis le poêle")
-            return jsonify(state)
+            # Corps JSON sérialisé (et compressé) une seule fois par version et par lecture
+            key = ('state', tuple(fields) if fields is not None else None)
+            entry = response_cache.get(key, (etag, state.get('timestamp')), lambda: _state_payload(fields))
+            logger.debug("État servi")
+            return _cache_headers(response_cache.respond(entry, request.accept_encodings), etag, max_age)
         else:
             logger.warning("État non synchronisé - retour d'état par défaut")
             default_state = {
@@ -168,41 +432,47 @@ def api_refresh_state():
     if controller is None:
         return jsonify({'error': 'Contrôleur non initialisé'}), 500
     
-    # Si le contrôleur n'est pas connecté, tenter de se reconnecter
+    # Si le contrôleur n'est pas connecté, réveiller le superviseur (sans attendre la reconnexion)
     if not controller.is_connected():
-        logger.info("Tentative de reconnexion automatique...")
-        if controller.connect():
-            logger.info("Reconnexion automatique réussie")
-            # WebSocket supprimé - plus de temps réel
-            # Démarrer la surveillance si pas déjà fait
-            controller.start_monitoring()
-        else:
-            logger.warning("Échec de la reconnexion automatique")
-            default_state = {
-                'connected': False,
-                'synchronized': False,
-                'status': 'OFF',
-                'power': False,
-                'temperature': '--',
-                'setpoint': '--',
-                'night_mode': False,
-                'error_code': 0,
-                'error_message': 'Connexion série perdue - vérifiez le câble',
-                'seco': 0,
-                'power_level': 0,
-                'alarm_status': 0,
-                'timer_enabled': False,
-                'pellet_consumption_raw': None
-            }
-            return jsonify({
-                'success': False,
-                'state': default_state,
-                'message': 'Connexion série perdue - vérifiez le câble'
-            })
+        request_reconnect()
+        default_state = {
+            'connected': False,
+            'synchronized': False,
+            'status': 'OFF',
+            'power': False,
+            'temperature': '--',
+            'setpoint': '--',
+            'night_mode': False,
+            'error_code': 0,
+            'error_message': 'Connexion série perdue - reconnexion en cours',
+            'seco': 0,
+            'power_level': 0,
+            'alarm_status': 0,
+            'timer_enabled': False,
+            'pellet_consumption_raw': None
+        }
+        return jsonify({
+            'success': False,
+            'state': default_state,
+            'link': get_connection_status(),
+            'message': 'Connexion série perdue - reconnexion en cours'
+        })
+    
+    # Budget du client et plafond global des rafraîchissements forcés
+    if not rate_limiter.allow_forced_refresh(_client_id()):
+        g.served_from_cache = True
+        return jsonify({
+            'success': True,
+            'state': controller.state,
+            'cached': True,
+            'message': 'Limite de rafraîchissement atteinte - dernier état connu'
+        })
     
     try:
         # Forcer la lecture de l'état (ignorer le cache)
-        state = controller.force_state_refresh()
+        state = _bus_run('refresh_state', controller.force_state_refresh)
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         return jsonify({
             'success': True,
             'state': state,
@@ -217,6 +487,12 @@ def api_refresh_state():
         }), 500
 
 
+@app.route('/api/connection')
+def api_connection():
+    """API pour obtenir l'état du lien série publié par le superviseur (sans accès au bus)"""
+    return jsonify(get_connection_status())
+
+
 @app.route('/api/pellet_consumption')
 def api_pellet_consumption():
     """API pour obtenir la consommation de pellets"""
@@ -227,7 +503,7 @@ def api_pellet_consumption():
         return jsonify({'error': 'Connexion série perdue', 'consumption': None}), 503
     
     try:
-        consumption = controller.get_pellet_consumption()
+        consumption = _pellet_consumption()
         if consumption is not None:
             # Mettre à jour le stockage
             if consumption_storage:
@@ -263,7 +539,7 @@ def api_fill_level():
         return jsonify({'error': 'Connexion série perdue'}), 503
     
     try:
-        consumption = controller.get_pellet_consumption()
+        consumption = _pellet_consumption()
         if consumption is not None:
             fill_data = consumption_storage.get_fill_level(consumption)
             if fill_data:
@@ -273,6 +549,9 @@ def api_fill_level():
                     'consumption_since_fill': fill_data['consumption_since_fill'],
                     'capacity': fill_data['capacity'],
                     'last_fill_date': fill_data['last_fill_date'],
+                    'burn_rate_kg_h': fill_data['burn_rate_kg_h'],
+                    'hours_to_empty': fill_data['hours_to_empty'],
+                    'empty_at': fill_data['empty_at'],
                     'current_consumption': consumption
                 })
             else:
@@ -296,6 +575,8 @@ def api_fill_level():
 @app.route('/api/record_fill', methods=['POST'])
 def api_record_fill():
     """API pour enregistrer un remplissage du poêle"""
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     if controller is None or consumption_storage is None:
         return jsonify({'error': 'Contrôleur ou stockage non initialisé'}), 500
     
@@ -303,7 +584,9 @@ def api_record_fill():
         return jsonify({'error': 'Connexion série perdue'}), 503
     
     try:
-        consumption = controller.get_pellet_consumption()
+        consumption = _bus_run('pellet_consumption', controller.get_pellet_consumption, PRIORITY_COMMAND)
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         if consumption is not None:
             consumption_storage.record_fill(consumption)
             return jsonify({
@@ -333,7 +616,7 @@ def api_maintenance_consumption():
         return jsonify({'error': 'Connexion série perdue'}), 503
     
     try:
-        consumption = controller.get_pellet_consumption()
+        consumption = _pellet_consumption()
         if consumption is not None:
             maintenance_data = consumption_storage.get_maintenance_consumption(consumption)
             if maintenance_data:
@@ -364,6 +647,8 @@ def api_maintenance_consumption():
 @app.route('/api/reset_maintenance', methods=['POST'])
 def api_reset_maintenance():
     """API pour réinitialiser le compteur de maintenance"""
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     if controller is None or consumption_storage is None:
         return jsonify({'error': 'Contrôleur ou stockage non initialisé'}), 500
     
@@ -371,7 +656,9 @@ def api_reset_maintenance():
         return jsonify({'error': 'Connexion série perdue'}), 503
     
     try:
-        consumption = controller.get_pellet_consumption()
+        consumption = _bus_run('pellet_consumption', controller.get_pellet_consumption, PRIORITY_COMMAND)
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         if consumption is not None:
             consumption_storage.reset_maintenance_counter(consumption)
             return jsonify({
@@ -391,6 +678,129 @@ def api_reset_maintenance():
             'error': str(e)
         }), 500
 
+@app.route('/api/consumption_events')
+def api_consumption_events():
+    """API pour obtenir l'historique des remplissages et resets de maintenance (sans accès au bus)"""
+    if consumption_storage is None:
+        return jsonify({'error': 'Stockage non initialisé'}), 500
+    
+    try:
+        events = consumption_storage.get_events(
+            event_type=request.args.get('type'),
+            start=request.args.get('from', 0, type=float),
+            end=request.args.get('to', type=float),
+            limit=request.args.get('limit', 100, type=int)
+        )
+        return jsonify({'success': True, 'events': events})
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des événements de consommation: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/history')
+def api_history():
+    """API pour obtenir l'historique agrégé d'une métrique, en colonnes (sans accès au bus)"""
+    if history_store is None:
+        return jsonify({'error': 'Historique non initialisé'}), 500
+    
+    metric = request.args.get('metric', 'pqt')
+    if metric not in HISTORY_METRICS:
+        return jsonify({'success': False, 'error': f"Métrique inconnue (valeurs possibles: {', '.join(HISTORY_METRICS)})"}), 400
+    
+    # Sans 'to', la plage se termine au dernier échantillon: l'ETag reste stable entre deux échantillons
+    last_sample = history_store.last_sample
+    default_end = int(last_sample.timestamp) + 1 if last_sample else int(time.time()) + 1
+    end = request.args.get('to', default_end, type=int)
+    start = request.args.get('from', end - 86400, type=int)
+    # Pas par défaut: agrégats horaires jusqu'à un mois, journaliers au-delà
+    step = request.args.get('step', 3600 if end - start <= 31 * 86400 else 86400, type=int)
+    # max_points: échantillons bruts réduits par LTTB au lieu des agrégats par pas
+    max_points = request.args.get('max_points', type=int)
+    if start >= end or step <= 0 or (max_points is not None and max_points < 3):
+        return jsonify({'success': False, 'error': 'Plage, pas ou nombre de points invalide'}), 400
+    if max_points is None and (end - start) // step > HISTORY_MAX_POINTS:
+        return jsonify({'success': False, 'error': f'Trop de points demandés (max {HISTORY_MAX_POINTS}), augmenter step'}), 400
+    if max_points is not None:
+        max_points = min(max_points, HISTORY_MAX_POINTS)
+    
+    try:
+        # L'ETag ne change qu'avec un nouvel échantillon: les graphiques revalident sans recalcul
+        resolution = f"lttb{max_points}" if max_points else step
+        etag = f"{metric}-{start}-{end}-{resolution}-{last_sample.timestamp if last_sample else 0}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        if max_points:
+            columns = history_store.query_downsampled(metric, start, end, max_points)
+        else:
+            columns = history_store.query_columns(metric, start, end, step)
+        response = jsonify({
+            'success': True,
+            'metric': metric,
+            'from': start,
+            'to': end,
+            'step': None if max_points else step,
+            'max_points': max_points,
+            'columns': columns
+        })
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de l'historique: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/recent')
+def api_recent():
+    """API pour obtenir les derniers échantillons gardés en mémoire (sans accès au bus ni au stockage)"""
+    if recent_buffer is None:
+        return jsonify({'error': 'Tampon non initialisé'}), 500
+    
+    return jsonify({
+        'success': True,
+        'columns': recent_buffer.snapshot(since=request.args.get('since', type=int))
+    })
+
+@app.route('/api/analytics')
+def api_analytics():
+    """API pour obtenir le rapport de chauffage calculé sur l'historique (sans accès au bus)"""
+    if heating_analytics is None:
+        return jsonify({'error': 'Historique non initialisé'}), 500
+    
+    end = request.args.get('to', int(time.time()) + 1, type=int)
+    start = request.args.get('from', end - 30 * 86400, type=int)
+    if start >= end:
+        return jsonify({'success': False, 'error': 'Plage invalide'}), 400
+    
+    try:
+        return jsonify({'success': True, 'report': heating_analytics.report(start, end)})
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul du rapport de chauffage: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/export')
+def api_export():
+    """API pour exporter les échantillons bruts en CSV ou JSON, en flux (sans accès au bus)"""
+    if history_store is None:
+        return jsonify({'error': 'Historique non initialisé'}), 500
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f"Format inconnu (valeurs possibles: {', '.join(EXPORT_FORMATS)})"}), 400
+    start = request.args.get('from', 0, type=int)
+    end = request.args.get('to', int(time.time()) + 1, type=int)
+    compress = request.args.get('gzip', '0').lower() in ('1', 'true')
+    
+    # Réponse en transfert chunked: les échantillons sont lus et sérialisés au fil de l'envoi
+    filename = f"palazzetti_{start}_{end}.{export_format}" + ('.gz' if compress else '')
+    response = Response(
+        export_samples(history_store.query(start, end), export_format, compress),
+        mimetype='application/gzip' if compress else EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @app.route('/api/consumption_status')
 def api_consumption_status():
     """API légère pour vérifier la connexion et obtenir la consommation (optimisée pour la page consommation)"""
@@ -411,7 +821,7 @@ def api_consumption_status():
     
     try:
         # Lire seulement la consommation (plus rapide que l'état complet)
-        consumption = controller.get_pellet_consumption()
+        consumption = _pellet_consumption()
         if consumption is not None:
             # Mettre à jour le stockage
             consumption_storage.update_total_consumption(consumption)
@@ -444,6 +854,148 @@ def api_consumption_status():
         }), 500
 
 
+def _batch_consumption(state):
+    """Compteur lu par le plan, après mise à jour du stockage (None si indisponible)"""
+    consumption = state.get('pellet_consumption')
+    if consumption is not None:
+        consumption_storage.update_total_consumption(consumption)
+    return consumption
+
+
+def _batch_state(state):
+    """Opération 'state': même contenu que /api/state"""
+    result = dict(state)
+    consumption = _batch_consumption(state)
+    result['fill_level'] = consumption_storage.get_fill_level(consumption) if consumption is not None else None
+    return result
+
+
+def _batch_fill_level(state):
+    """Opération 'fill_level': même contenu que /api/fill_level"""
+    consumption = _batch_consumption(state)
+    if consumption is None:
+        return {'success': False, 'error': 'Impossible de lire la consommation de pellets'}
+    fill_data = consumption_storage.get_fill_level(consumption)
+    if not fill_data:
+        return {'success': False, 'error': 'Aucun remplissage enregistré', 'fill_level': None}
+    return {'success': True, **fill_data, 'current_consumption': consumption}
+
+
+def _batch_maintenance_consumption(state):
+    """Opération 'maintenance_consumption': même contenu que /api/maintenance_consumption"""
+    consumption = _batch_consumption(state)
+    if consumption is None:
+        return {'success': False, 'error': 'Impossible de lire la consommation de pellets'}
+    maintenance_data = consumption_storage.get_maintenance_consumption(consumption)
+    if not maintenance_data:
+        return {'success': False, 'error': 'Aucun reset de maintenance enregistré', 'consumption_since_reset': None}
+    return {'success': True, **maintenance_data, 'current_consumption': consumption}
+
+
+def _batch_consumption_status(state):
+    """Opération 'consumption_status': même contenu que /api/consumption_status"""
+    consumption = _batch_consumption(state)
+    if consumption is None:
+        return {'connected': True, 'synchronized': False, 'error': 'Impossible de lire la consommation de pellets'}
+    return {
+        'connected': True,
+        'synchronized': True,
+        'total_consumption': consumption,
+        'fill_level': consumption_storage.get_fill_level(consumption),
+        'maintenance_consumption': consumption_storage.get_maintenance_consumption(consumption)
+    }
+
+
+def _batch_chrono_data(state):
+    """Opération 'chrono_data': même contenu que /api/chrono_data"""
+    if not state.get('chrono_programs'):
+        return {'success': False, 'error': 'Échec de lecture des données du chrono'}
+    return {
+        'success': True,
+        'data': {
+            'timer_enabled': state['timer_enabled'],
+            'programs': state['chrono_programs'],
+            'days': state['chrono_days']
+        }
+    }
+
+
+# Opérations du lot: nom → (champs de l'état nécessaires, construction du résultat)
+BATCH_OPERATIONS = {
+    'state': (tuple(field for step in STATE_STEPS for field in READ_STEPS[step]) + ('pellet_consumption',), _batch_state),
+    'fill_level': (('pellet_consumption',), _batch_fill_level),
+    'maintenance_consumption': (('pellet_consumption',), _batch_maintenance_consumption),
+    'consumption_status': (('pellet_consumption',), _batch_consumption_status),
+    'chrono_data': (('chrono_programs', 'chrono_days', 'timer_enabled'), _batch_chrono_data),
+}
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    API de lecture groupée: champs de l'état et opérations lus en un seul cycle du bus
+    
+    Corps JSON: {"fields": [...], "operations": [...], "refresh": false}
+    Les registres communs ne sont lus qu'une fois; sans refresh, les étapes lues
+    depuis moins de la durée du cache d'état ne sont pas relues.
+    """
+    if controller is None or consumption_storage is None:
+        return jsonify({'success': False, 'error': 'Contrôleur ou stockage non initialisé'}), 500
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Objet JSON attendu'}), 400
+    fields = data.get('fields') or []
+    operations = data.get('operations') or []
+    if not isinstance(fields, list) or not isinstance(operations, list) or not (fields or operations):
+        return jsonify({'success': False, 'error': 'Listes fields et/ou operations requises'}), 400
+    if not all(isinstance(name, str) for name in fields + operations):
+        return jsonify({'success': False, 'error': 'fields et operations doivent être des listes de noms'}), 400
+    unknown = [name for name in operations if name not in BATCH_OPERATIONS]
+    if unknown:
+        return jsonify({'success': False, 'error': f"Opérations inconnues: {', '.join(map(str, unknown))} (valeurs possibles: {', '.join(BATCH_OPERATIONS)})"}), 400
+    
+    # Plan de lecture commun à tous les éléments du lot
+    needed = list(fields)
+    for name in operations:
+        needed.extend(BATCH_OPERATIONS[name][0])
+    try:
+        steps = plan_reads(needed)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if not controller.is_connected():
+        return jsonify({'success': False, 'connected': False, 'error': 'Connexion série perdue'}), 503
+    
+    try:
+        started = time.time()
+        max_age = None if data.get('refresh') else controller.state_cache_duration
+        admitted = True
+        if max_age is None:
+            admitted = rate_limiter.allow_forced_refresh(_client_id())
+        elif controller.remaining_ttl(steps) == 0:
+            admitted = _admit_bus_read()
+        if admitted:
+            read = _bus_run('batch', lambda: controller.read_steps(steps, max_age))
+        else:
+            # Hors budget: aucune lecture, valeurs en cache
+            g.served_from_cache = True
+            read = []
+        state = controller.state.copy()
+        
+        return jsonify({
+            'success': True,
+            'fields': {field: state.get(field) for field in fields},
+            'results': {name: BATCH_OPERATIONS[name][1](state) for name in operations},
+            'plan': steps,
+            'read': read or [],
+            'duration': round(time.time() - started, 3)
+        })
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture groupée: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/chrono_data', methods=['GET'])
 def api_chrono_data():
     """
@@ -456,17 +1008,32 @@ def api_chrono_data():
                 'error': 'Poêle non connecté'
             }), 500
         
-        chrono_data = controller.get_chrono_data()
+        # Données en cache tant qu'elles sont récentes (invalidées par les écritures), ?refresh=1 pour relire
+        max_age = None if request.args.get('refresh') == '1' else controller.chrono_cache_duration
+        if max_age is not None and controller.remaining_ttl(['chrono'], max_age) > 0:
+            chrono_data = controller.get_chrono_data(max_age)  # Pas d'accès au bus
+        elif not (rate_limiter.allow_forced_refresh(_client_id()) if max_age is None else _admit_bus_read()):
+            # Hors budget: données en cache même expirées, 429 s'il n'y en a pas
+            if not controller.state['chrono_programs']:
+                return _too_many_requests(CLASS_BUS_READ)
+            g.served_from_cache = True
+            chrono_data = controller.get_chrono_data(float('inf'))
+        else:
+            chrono_data = _bus_run('chrono_data', lambda: controller.get_chrono_data(max_age))
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         if chrono_data is None:
             return jsonify({
                 'success': False,
                 'error': 'Échec de lecture des données du chrono'
             }), 500
         
-        return jsonify({
-            'success': True,
-            'data': chrono_data
-        })
+        etag = f"{ETAG_PREFIX}-chrono-{controller.chrono_generation}"
+        ttl = controller.remaining_ttl(['chrono'], controller.chrono_cache_duration)
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag, ttl)
+        entry = response_cache.get('chrono_data', etag, lambda: {'success': True, 'data': chrono_data})
+        return _cache_headers(response_cache.respond(entry, request.accept_encodings), etag, ttl)
         
     except Exception as e:
         logger.error(f"Erreur API données chrono: {e}")
@@ -481,6 +1048,8 @@ def api_set_chrono_program():
     """
     API pour configurer un programme de timer
     """
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     try:
         if not controller.is_connected():
             return jsonify({
@@ -503,15 +1072,17 @@ def api_set_chrono_program():
                     'error': f'Champ manquant: {field}'
                 }), 400
         
-        success = controller.set_chrono_program(
+        success = _bus_run('set_chrono_program', lambda: controller.set_chrono_program(
             data['program_number'],
             data['start_hour'],
             data['start_minute'],
             data['stop_hour'],
             data['stop_minute'],
             data['setpoint']
-        )
+        ), PRIORITY_COMMAND)
         
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         if not success:
             return jsonify({
                 'success': False,
@@ -536,6 +1107,8 @@ def api_set_chrono_day():
     """
     API pour configurer la programmation d'un jour
     """
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     try:
         if not controller.is_connected():
             return jsonify({
@@ -558,13 +1131,15 @@ def api_set_chrono_day():
                     'error': f'Champ manquant: {field}'
                 }), 400
         
-        success = controller.set_chrono_day(
+        success = _bus_run('set_chrono_day', lambda: controller.set_chrono_day(
             data['day_number'],
             data['memory_1'],
             data['memory_2'],
             data['memory_3']
-        )
+        ), PRIORITY_COMMAND)
         
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         if not success:
             return jsonify({
                 'success': False,
@@ -592,6 +1167,8 @@ def api_set_chrono_status():
     """
     API pour activer/désactiver le timer
     """
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     try:
         if not controller.is_connected():
             return jsonify({
@@ -606,8 +1183,10 @@ def api_set_chrono_status():
                 'error': 'Champ "enabled" manquant'
             }), 400
         
-        success = controller.set_chrono_status(data['enabled'])
+        success = _bus_run('set_chrono_status', lambda: controller.set_chrono_status(data['enabled']), PRIORITY_COMMAND)
         
+        if g.get('bus_dropped'):
+            return _deadline_exceeded()
         if not success:
             return jsonify({
                 'success': False,
@@ -633,6 +1212,8 @@ def api_set_chrono_status():
 @app.route('/api/set_temperature', methods=['POST'])
 def api_set_temperature():
     """API pour définir la température"""
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     if controller is None:
         return jsonify({'success': False, 'message': 'Contrôleur non initialisé'}), 500
     
@@ -642,9 +1223,11 @@ def api_set_temperature():
     logger.info(f"Demande de définition de température: {temperature}°C")
     
     try:
-        if controller.set_temperature(temperature):
+        if _bus_run('set_temperature', lambda: controller.set_temperature(temperature), PRIORITY_COMMAND):
             logger.info(f"Température définie avec succès: {temperature}°C")
             return jsonify({'success': True, 'message': f'Température définie à {temperature}°C'})
+        elif g.get('bus_dropped'):
+            return _deadline_exceeded()
         else:
             logger.error(f"Échec de la définition de température: {temperature}°C")
             return jsonify({'success': False, 'message': 'Erreur lors de la définition de la température'}), 400
@@ -666,7 +1249,31 @@ def api_set_temperature():
 #         return jsonify({'success': False, 'message': 'Erreur lors du changement d\'état'}), 400
 
 
-# Gestionnaires WebSocket supprimés - plus de temps réel
+@sock.route('/ws')
+def ws_realtime(ws):
+    """Canal temps réel: différences d'état poussées et commandes avec accusé (voir realtime.py)"""
+    realtime_hub.handle(ws, _client_id())
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métriques au format texte de Prometheus (calculées en mémoire, sans accès au bus)"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/bus')
+def api_bus():
+    """API pour obtenir l'état de la file des transactions série et du canal temps réel"""
+    return jsonify({
+        'success': True,
+        'bus': get_bus_status(),
+        'realtime': realtime_hub.get_status(),
+        'mqtt': mqtt_bridge.get_status(),
+        'http': http_server.get_status(),
+        'response_cache': response_cache.get_status(),
+        'rate_limiter': rate_limiter.get_status(),
+        'metrics': metrics.get_status()
+    })
 
 # ===== ENDPOINTS POUR LES NOTIFICATIONS EMAIL =====
 
@@ -696,6 +1303,8 @@ def api_notifications_status():
 @app.route('/api/notifications/test', methods=['POST'])
 def api_test_notification():
     """API pour tester l'envoi de notifications email"""
+    if not rate_limiter.allow(_client_id(), CLASS_COMMAND):
+        return _too_many_requests(CLASS_COMMAND)
     global email_notification_manager
     
     if email_notification_manager is None:
@@ -741,18 +1350,31 @@ def main():
     import signal
     
     # Créer le contrôleur et le stockage
-    global controller, consumption_storage, email_notification_manager
+    global controller, consumption_storage, history_store, recent_buffer, heating_analytics, email_notification_manager
     controller = None
     consumption_storage = None
+    history_store = None
+    recent_buffer = None
+    heating_analytics = None
     email_notification_manager = None
     
     def signal_handler(signum, frame):
         """Gestionnaire de signal pour arrêt propre"""
         logger.info("Signal d'arrêt reçu, fermeture en cours...")
+        if stop_http_server():
+            # Le serveur draine les requêtes en cours, le bloc finally de main() fait le reste
+            return
         stop_notification_scheduler()
+        stop_notification_outbox()
+        stop_connection_supervisor()
+        stop_mqtt_bridge()
         if controller:
             controller.stop_monitoring()
+        stop_bus_scheduler()
+        if controller:
             controller.disconnect()
+        if consumption_storage:
+            consumption_storage.stop()
         sys.exit(0)
     
     # Enregistrer les gestionnaires de signaux
@@ -762,23 +1384,53 @@ def main():
     try:
         # Créer le contrôleur et le stockage
         controller = PalazzettiController()
-        consumption_storage = ConsumptionStorage()
+        if STORAGE_BACKEND == 'sqlite':
+            consumption_storage = SQLiteConsumptionStorage(SQLITE_DB_FILE)
+        else:
+            consumption_storage = ConsumptionStorage()
+        consumption_storage.start()
+        history_store = HistoryStore(HISTORY_DIR)
+        recent_buffer = RecentBuffer()
+        heating_analytics = HeatingAnalytics(history_store)
         email_notification_manager = EmailNotificationManager()
         
+        # Enregistrer chaque instantané publié par la surveillance dans l'historique
+        controller.add_state_listener(history_store.record_snapshot)
+        controller.add_state_listener(consumption_storage.record_sample)
+        controller.add_state_listener(recent_buffer.record_snapshot)
+        
+        # Diffuser les différences d'état aux clients WebSocket
+        realtime_hub.initialize(controller)
+        controller.add_state_listener(realtime_hub.publish)
+        
         # Essayer de se connecter (mais ne pas arrêter si ça échoue)
         if controller.connect():
             logger.info("Connexion au poêle établie")
-            # Démarrer la surveillance
-            controller.start_monitoring()
         else:
             logger.warning("Impossible de se connecter au poêle - interface web disponible en mode déconnecté")
         
-        # Démarrer le scheduler de notifications email
+        # Démarrer la file des transactions série, puis la surveillance qui y soumet ses lectures
+        # (elle attend la reconnexion si le poêle est absent)
+        start_bus_scheduler()
+        controller.start_monitoring()
+        
+        # Publier l'état sur MQTT et recevoir les commandes domotiques (optionnel)
+        if MQTT_ENABLED:
+            start_mqtt_bridge(controller)
+        
+        # Démarrer le superviseur de connexion (détection de perte et reconnexion en arrière-plan)
+        start_connection_supervisor(controller)
+        
+        # Démarrer l'envoi des emails en arrière-plan (reprend les messages non remis), puis le scheduler
+        start_notification_outbox()
         start_notification_scheduler(controller, consumption_storage)
         
         # Démarrer le serveur web (toujours, même sans connexion au poêle)
         logger.info(f"Démarrage du serveur sur {HOST}:{PORT}")
-        app.run(host=HOST, port=PORT, debug=DEBUG)
+        if DEBUG:
+            app.run(host=HOST, port=PORT, debug=DEBUG)
+        else:
+            http_server.serve(app, HOST, PORT)
         
     except KeyboardInterrupt:
         logger.info("Arrêt demandé par l'utilisateur")
@@ -786,9 +1438,16 @@ def main():
         logger.error(f"Erreur inattendue: {e}")
     finally:
         stop_notification_scheduler()
+        stop_notification_outbox()
+        stop_connection_supervisor()
+        stop_mqtt_bridge()
         if controller:
             controller.stop_monitoring()
+        stop_bus_scheduler()
+        if controller:
             controller.disconnect()
+        if consumption_storage:
+            consumption_storage.stop()
         logger.info("Application fermée")
 
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Mesure du débit et de la latence du serveur HTTP
+
+Plusieurs clients gardent chacun une connexion keep-alive ouverte et enchaînent
+les requêtes pendant la durée demandée. Affiche les requêtes/s et les
+percentiles de latence.
+
+Exemple (sur le Raspberry Pi, application démarrée):
+    python benchmark_http.py --url http://127.0.0.1:5000/api/state --clients 8 --duration 30
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def run_client(url, headers, deadline, latencies, errors):
+    """Enchaîner les requêtes sur une connexion keep-alive jusqu'à l'échéance"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    connection.close()
+
+
+def percentile(values, fraction):
+    """Percentile d'une liste triée"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP keep-alive")
+    parser.add_argument('--url', default='http://127.0.0.1:5000/api/state')
+    parser.add_argument('--clients', type=int, default=8, help="Connexions simultanées")
+    parser.add_argument('--duration', type=float, default=10.0, help="Durée de la mesure (s)")
+    parser.add_argument('--encoding', default=None, help="En-tête Accept-Encoding (ex: gzip, br)")
+    args = parser.parse_args()
+
+    print(f"🔍 {args.url} - {args.clients} clients pendant {args.duration:.0f}s")
+    headers = {'Accept-Encoding': args.encoding} if args.encoding else {}
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=run_client, args=(args.url, headers, deadline, latencies, errors))
+        for _ in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"   Requêtes : {len(latencies)} ({len(latencies) / elapsed:.0f} req/s)")
+    print(f"   Erreurs  : {len(errors)}")
+    print(f"   Latence  : p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p90 {percentile(latencies, 0.90) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"max {(latencies[-1] if latencies else 0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+File centrale des transactions sur le bus série
+
+Toutes les opérations qui parlent au poêle (commandes, lectures à la demande,
+surveillance) sont soumises comme des jobs à une file à priorités traitée par un
+unique thread: une commande utilisateur passe devant les lectures de fond et
+deux transactions ne se chevauchent jamais sur le bus.
+
+Un job peut porter une échéance et une fonction d'annulation (client HTTP
+déconnecté): s'il est encore en file quand son demandeur n'attend plus, il est
+abandonné sans toucher au bus; s'il est en cours, les lectures en plusieurs
+registres s'interrompent entre deux transactions (should_abort). Les fenêtres
+de synchronisation consommées pour un demandeur parti sont comptées comme
+perdues.
+"""
+import itertools
+import queue
+import threading
+import time
+import logging
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priorités (plus petit = plus prioritaire)
+PRIORITY_COMMAND = 0      # Écritures demandées par l'utilisateur
+PRIORITY_INTERACTIVE = 1  # Lectures à la demande (rafraîchissement, API)
+PRIORITY_BACKGROUND = 2   # Surveillance périodique
+
+# Noms des priorités (étiquettes des métriques)
+PRIORITY_NAMES = {
+    PRIORITY_COMMAND: 'command',
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_BACKGROUND: 'background',
+}
+
+# États d'un job
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_DROPPED = 'dropped'  # Abandonné en file: demandeur parti ou échéance dépassée
+
+# Raisons d'abandon
+REASON_EXPIRED = 'expired'
+REASON_DISCONNECTED = 'disconnected'
+
+SYNC_WINDOWS = metrics.counter(
+    'palazzetti_bus_sync_windows_total', "Fenêtres de synchronisation utilisées pour une transaction")
+WASTED_SYNC_WINDOWS = metrics.counter(
+    'palazzetti_bus_wasted_sync_windows_total', "Fenêtres de synchronisation utilisées pour un demandeur parti")
+JOBS_DROPPED = metrics.counter(
+    'palazzetti_bus_jobs_dropped_total', "Jobs abandonnés avant leur exécution", ('reason',))
+JOBS_ABORTED = metrics.counter(
+    'palazzetti_bus_jobs_aborted_total', "Jobs interrompus entre deux transactions", ('reason',))
+QUEUE_WAIT = metrics.histogram(
+    'palazzetti_bus_queue_wait_seconds', "Attente d'un job dans la file avant son exécution", ('priority',))
+
+
+class BusJob:
+    """Opération en attente ou en cours sur le bus"""
+
+    def __init__(self, job_id, name, func, priority, callback=None, deadline=None, cancel_check=None):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.callback = callback  # Appelé avec le job une fois terminé
+        self.deadline = deadline  # Heure (time.time) après laquelle le résultat n'est plus attendu
+        self.cancel_check = cancel_check  # Fonction renvoyant True si le demandeur est parti
+        self.cancel_reason = None  # Raison de l'annulation (demandeur parti ou lassé d'attendre)
+        self.aborted = False  # Interrompu en cours d'exécution
+        self.sync_windows = 0  # Transactions effectuées pour ce job
+        self.state = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()  # Départ de l'exécution ou abandon: l'un exclut l'autre
+
+    def abort_reason(self):
+        """
+        Raison pour laquelle le job ne doit pas (ou plus) occuper le bus
+
+        Returns:
+            str: REASON_EXPIRED, REASON_DISCONNECTED ou None si le demandeur attend toujours
+        """
+        if self.deadline is not None and time.time() >= self.deadline:
+            return REASON_EXPIRED
+        if self.cancel_reason is not None:
+            return self.cancel_reason
+        if self.cancel_check is not None:
+            try:
+                if self.cancel_check():
+                    self.cancel_reason = REASON_DISCONNECTED
+                    return REASON_DISCONNECTED
+            except Exception as e:
+                logger.debug(f"Vérification d'annulation du job {self.name} impossible: {e}")
+        return None
+
+    def wait(self, timeout=None):
+        """
+        Attendre la fin du job
+
+        Returns:
+            Résultat de l'opération (None si échec ou délai dépassé)
+        """
+        self.done.wait(timeout)
+        return self.result
+
+    def to_dict(self):
+        """Représentation sérialisable du job"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'queued_for': round((self.started or time.time()) - self.created, 3),
+            'duration': round(self.finished - self.started, 3) if self.finished and self.started else None,
+            'error': str(self.error) if self.error else None,
+            'sync_windows': self.sync_windows
+        }
+
+
+class BusScheduler:
+    """File à priorités traitée par un unique thread d'accès au bus"""
+
+    def __init__(self):
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()  # Ordre FIFO à priorité égale
+        self.running = False
+        self.worker_thread = None
+        self.current_job = None
+        self.local = threading.local()  # Job exécuté par le thread courant
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        """Démarrer le thread d'accès au bus"""
+        if self.running:
+            return
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        logger.info("File des transactions série démarrée")
+
+    def stop(self):
+        """Arrêter le thread après le job en cours"""
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put((-1, next(self.sequence), None))  # Réveil du thread
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("File des transactions série arrêtée")
+
+    def submit(self, name, func, priority=PRIORITY_INTERACTIVE, callback=None, deadline=None, cancel_check=None):
+        """
+        Ajouter une opération à la file
+
+        Args:
+            name: Nom de l'opération (journalisation, statut)
+            func: Fonction sans argument exécutée par le thread du bus
+            priority: PRIORITY_COMMAND, PRIORITY_INTERACTIVE ou PRIORITY_BACKGROUND
+            callback: Fonction appelée avec le job terminé
+            deadline: Heure (time.time) au-delà de laquelle le job est abandonné
+            cancel_check: Fonction renvoyant True si le demandeur est parti
+
+        Returns:
+            BusJob
+        """
+        sequence = next(self.sequence)
+        job = BusJob(sequence, name, func, priority, callback, deadline, cancel_check)
+        if not self.running or threading.current_thread() is self.worker_thread:
+            # File non démarrée (scripts, tests matériels) ou appel depuis un job: exécution immédiate
+            self._execute(job)
+            return job
+        self.queue.put((priority, sequence, job))
+        logger.debug(f"Job {name} #{job.id} en file (priorité {priority}, {self.queue.qsize()} en attente)")
+        return job
+
+    def run(self, name, func, priority=PRIORITY_INTERACTIVE, timeout=None, deadline=None, cancel_check=None):
+        """
+        Soumettre une opération et attendre son résultat
+
+        Avec une échéance, l'attente s'arrête à l'échéance et le job est annulé:
+        encore en file, il sera abandonné sans accès au bus.
+
+        Returns:
+            Résultat de l'opération (None si échec, abandon ou délai dépassé)
+        """
+        job = self.submit(name, func, priority, deadline=deadline, cancel_check=cancel_check)
+        return self.wait(job, timeout)
+
+    def wait(self, job, timeout=None):
+        """
+        Attendre un job jusqu'à son échéance (ou timeout)
+
+        Passé ce délai, un job encore en file est abandonné sur-le-champ. Un job
+        déjà commencé est attendu jusqu'au bout: une écriture n'est jamais
+        coupée, une lecture s'arrête à la transaction suivante (should_abort).
+
+        Returns:
+            Résultat de l'opération (None si échec ou abandon)
+        """
+        if job.deadline is not None:
+            remaining = max(0.0, job.deadline - time.time())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if job.done.wait(timeout):
+            return job.result
+
+        with job.lock:
+            if job.cancel_reason is None:
+                job.cancel_reason = REASON_EXPIRED
+            queued = job.state == JOB_QUEUED
+            if queued:
+                self._drop(job, job.cancel_reason)
+        if not queued:
+            logger.info(f"Job {job.name} #{job.id} hors délai - attente de la fin de la transaction en cours")
+            job.done.wait()
+        return job.result
+
+    def should_abort(self):
+        """
+        Indiquer si le job en cours dans ce thread peut s'arrêter
+
+        Appelé entre deux transactions par les lectures en plusieurs registres.
+
+        Returns:
+            bool: True si le demandeur du job est parti ou son échéance dépassée
+        """
+        job = getattr(self.local, 'job', None)
+        if job is None:
+            return False
+        reason = job.abort_reason()
+        if reason is None:
+            return False
+        if not job.aborted:
+            job.aborted = True
+            JOBS_ABORTED.inc(reason=reason)
+            logger.info(f"Job {job.name} #{job.id} interrompu ({reason})")
+        return True
+
+    def record_sync_window(self):
+        """Compter une fenêtre de synchronisation utilisée par le thread courant"""
+        SYNC_WINDOWS.inc()
+        job = getattr(self.local, 'job', None)
+        if job is not None:
+            job.sync_windows += 1
+
+    def _worker_loop(self):
+        """Thread unique d'accès au bus"""
+        while self.running:
+            _, _, job = self.queue.get()
+            if job is None:
+                continue
+            self._execute(job)
+
+    def _drop(self, job, reason):
+        """Abandonner un job en file sans l'exécuter (appelé sous job.lock, sans callback)"""
+        job.state = JOB_DROPPED
+        job.error = f"abandonné ({reason})"
+        job.finished = time.time()
+        self.dropped += 1
+        JOBS_DROPPED.inc(reason=reason)
+        logger.info(f"Job {job.name} #{job.id} abandonné avant exécution ({reason})")
+        job.done.set()
+
+    def _execute(self, job):
+        """Exécuter un job et notifier son résultat"""
+        with job.lock:
+            if job.state == JOB_DROPPED:
+                return  # Déjà abandonné par son demandeur
+            reason = job.abort_reason()
+            if reason is not None:
+                self._drop(job, reason)
+                return
+            job.state = JOB_RUNNING
+            job.started = time.time()
+        QUEUE_WAIT.observe(job.started - job.created, priority=PRIORITY_NAMES.get(job.priority, job.priority))
+
+        previous = self.current_job  # Job appelant en cas d'exécution imbriquée
+        previous_local = getattr(self.local, 'job', None)
+        self.current_job = job
+        self.local.job = job
+        try:
+            job.result = job.func()
+            job.state = JOB_DONE
+            self.processed += 1
+        except Exception as e:
+            logger.error(f"Erreur dans le job {job.name} #{job.id}: {e}")
+            job.error = e
+            job.state = JOB_FAILED
+            self.failed += 1
+        finally:
+            job.finished = time.time()
+            self.current_job = previous
+            self.local.job = previous_local
+            job.done.set()
+
+        # Transactions dont le résultat n'est plus attendu par personne
+        if job.sync_windows and job.abort_reason() is not None:
+            WASTED_SYNC_WINDOWS.inc(job.sync_windows)
+
+        if job.callback:
+            try:
+                job.callback(job)
+            except Exception as e:
+                logger.error(f"Erreur dans le callback du job {job.name} #{job.id}: {e}")
+
+    def queue_depths(self):
+        """
+        Jobs en attente par priorité (sans les jobs déjà abandonnés)
+
+        Returns:
+            dict: (nom de la priorité,) → nombre de jobs
+        """
+        depths = {(name,): 0 for name in PRIORITY_NAMES.values()}
+        with self.queue.mutex:
+            jobs = [job for _, _, job in self.queue.queue if job is not None]
+        for job in jobs:
+            if job.state == JOB_QUEUED:
+                key = (PRIORITY_NAMES.get(job.priority, str(job.priority)),)
+                depths[key] = depths.get(key, 0) + 1
+        return depths
+
+    def get_status(self):
+        """Obtenir l'état de la file"""
+        current = self.current_job
+        return {
+            'running': self.running,
+            'queue_depth': self.queue.qsize(),
+            'current_job': current.to_dict() if current else None,
+            'processed': self.processed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'sync_windows': SYNC_WINDOWS.value(),
+            'wasted_sync_windows': WASTED_SYNC_WINDOWS.value()
+        }
+
+
+# Instance globale de la file
+bus_scheduler = BusScheduler()
+
+metrics.gauge('palazzetti_bus_queue_depth', "Jobs en attente dans la file, par priorité", ('priority',),
+              bus_scheduler.queue_depths)
+
+def start_bus_scheduler():
+    """Démarrer la file des transactions série"""
+    bus_scheduler.start()
+
+def stop_bus_scheduler():
+    """Arrêter la file des transactions série"""
+    bus_scheduler.stop()
+
+def get_bus_status():
+    """Obtenir l'état de la file des transactions série"""
+    return bus_scheduler.get_status()
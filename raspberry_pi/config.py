@@ -13,11 +13,79 @@ BAUD_RATE = int(os.getenv('BAUD_RATE', '38400'))  # 38400 bauds selon documentat
 TIMEOUT = int(os.getenv('TIMEOUT', '10'))
 CONNECTION_TEST_TIMEOUT = int(os.getenv('CONNECTION_TEST_TIMEOUT', '5'))  # Timeout pour test de connexion
 
+# Configuration du superviseur de connexion (reconnexion en arrière-plan)
+LINK_CHECK_INTERVAL = float(os.getenv('LINK_CHECK_INTERVAL', '5'))  # Intervalle de vérification du lien (s)
+LINK_MAX_SILENCE = float(os.getenv('LINK_MAX_SILENCE', '10'))  # Silence max. sans trame valide avant écoute du bus (s)
+RECONNECT_BASE_DELAY = float(os.getenv('RECONNECT_BASE_DELAY', '1'))  # Délai initial de reconnexion (s)
+RECONNECT_MAX_DELAY = float(os.getenv('RECONNECT_MAX_DELAY', '60'))  # Délai maximal de reconnexion (s)
+
+# Disjoncteur des transactions série (échec immédiat pendant une coupure)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '3'))  # Échecs consécutifs avant ouverture
+BREAKER_PROBE_INTERVAL = float(os.getenv('BREAKER_PROBE_INTERVAL', '15'))  # Intervalle entre deux sondes (s)
+
+# Surveillance périodique et historique
+MONITOR_INTERVAL = int(os.getenv('MONITOR_INTERVAL', '60'))  # Intervalle d'échantillonnage (s), 0 = désactivée
+CHRONO_CACHE_DURATION = int(os.getenv('CHRONO_CACHE_DURATION', '300'))  # Durée du cache des données du timer (s)
+HISTORY_DIR = os.getenv('HISTORY_DIR', 'history')  # Dossier des segments d'historique
+# Rétention de l'historique par niveau, en jours (0 = conservation illimitée)
+HISTORY_RETENTION_DAYS = {
+    'raw': int(os.getenv('HISTORY_RETENTION_RAW_DAYS', '365')),       # Échantillons bruts
+    'minute': int(os.getenv('HISTORY_RETENTION_MINUTE_DAYS', '30')),  # Agrégats 1 minute
+    'hour': int(os.getenv('HISTORY_RETENTION_HOUR_DAYS', '730')),     # Agrégats 1 heure
+    'day': int(os.getenv('HISTORY_RETENTION_DAY_DAYS', '0')),         # Agrégats 1 jour
+}
+RECENT_BUFFER_SIZE = int(os.getenv('RECENT_BUFFER_SIZE', '1440'))  # Échantillons gardés en mémoire (24 h à 60 s)
+HISTORY_ARCHIVE_AFTER_DAYS = int(os.getenv('HISTORY_ARCHIVE_AFTER_DAYS', '7'))  # Compression des segments bruts plus anciens (jours), 0 = désactivée
+HISTORY_MAX_POINTS = int(os.getenv('HISTORY_MAX_POINTS', '5000'))  # Pas max. renvoyés par /api/history
+CONSUMPTION_FLUSH_INTERVAL = int(os.getenv('CONSUMPTION_FLUSH_INTERVAL', '300'))  # Écriture différée de la consommation (s)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()  # Stockage de la consommation: 'json' ou 'sqlite'
+SQLITE_DB_FILE = os.getenv('SQLITE_DB_FILE', 'consumption.db')  # Base SQLite (STORAGE_BACKEND=sqlite)
+SQLITE_BATCH_SIZE = int(os.getenv('SQLITE_BATCH_SIZE', '100'))  # Écritures max. par transaction
+BURN_RATE_TAU_HOURS = float(os.getenv('BURN_RATE_TAU_HOURS', '2'))  # Constante de lissage du débit de combustion (h)
+
+# Canal temps réel WebSocket
+REALTIME_SEND_QUEUE_SIZE = int(os.getenv('REALTIME_SEND_QUEUE_SIZE', '100'))  # Messages en attente max. par client
+
+# Pont MQTT (optionnel, nécessite paho-mqtt)
+MQTT_ENABLED = os.getenv('MQTT_ENABLED', 'false').lower() == 'true'
+MQTT_HOST = os.getenv('MQTT_HOST', 'localhost')
+MQTT_PORT = int(os.getenv('MQTT_PORT', '1883'))
+MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
+MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
+MQTT_CLIENT_ID = os.getenv('MQTT_CLIENT_ID', 'palazzetti')  # Identifiant du client et du poêle dans Home Assistant
+MQTT_TOPIC_PREFIX = os.getenv('MQTT_TOPIC_PREFIX', 'palazzetti')  # Racine des topics d'état et de commande
+MQTT_DISCOVERY = os.getenv('MQTT_DISCOVERY', 'true').lower() == 'true'  # Publier la découverte Home Assistant
+MQTT_DISCOVERY_PREFIX = os.getenv('MQTT_DISCOVERY_PREFIX', 'homeassistant')
+MQTT_KEEPALIVE = int(os.getenv('MQTT_KEEPALIVE', '60'))  # Intervalle de keep-alive avec le broker (s)
+
 # Configuration Flask
 HOST = os.getenv('HOST', '0.0.0.0')
 PORT = int(os.getenv('PORT', '5000'))
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'  # Mode debug désactivé par défaut
 
+# Serveur HTTP de production (utilisé hors mode debug)
+HTTP_WORKERS = int(os.getenv('HTTP_WORKERS', '8'))  # Threads servant les connexions (WebSocket compris)
+HTTP_BACKLOG = int(os.getenv('HTTP_BACKLOG', '32'))  # Connexions acceptées en attente d'un thread
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '15'))  # Inactivité max. d'une connexion (s)
+HTTP_SHUTDOWN_TIMEOUT = float(os.getenv('HTTP_SHUTDOWN_TIMEOUT', '10'))  # Attente des requêtes en cours à l'arrêt (s)
+# Chaque connexion WebSocket occupe un thread du pool: au moins un thread reste aux requêtes HTTP
+REALTIME_MAX_CLIENTS = min(int(os.getenv('REALTIME_MAX_CLIENTS', str(HTTP_WORKERS // 2))), HTTP_WORKERS - 1)
+REALTIME_PING_INTERVAL = float(os.getenv('REALTIME_PING_INTERVAL', '25'))  # Ping des clients WebSocket (détection des clients disparus, s), 0 = désactivé
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '20'))  # Échéance d'une requête: ses jobs de bus en file sont abandonnés au-delà (s)
+
+# Cache des réponses JSON pré-sérialisées
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '32'))  # Réponses gardées en mémoire
+RESPONSE_COMPRESS_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESS_MIN_SIZE', '512'))  # Taille min. compressée (octets)
+
+# Limites de débit par client (jetons par seconde, réserve) et par classe de requête
+RATE_LIMITS = {
+    'bus_read': (float(os.getenv('RATE_LIMIT_BUS_READ_RATE', '0.5')), int(os.getenv('RATE_LIMIT_BUS_READ_BURST', '10'))),
+    'command': (float(os.getenv('RATE_LIMIT_COMMAND_RATE', '1')), int(os.getenv('RATE_LIMIT_COMMAND_BURST', '10'))),
+}
+# Plafond global des rafraîchissements forcés, tous clients confondus (jetons par seconde, réserve)
+FORCED_REFRESH_LIMIT = (float(os.getenv('FORCED_REFRESH_RATE', '0.2')), int(os.getenv('FORCED_REFRESH_BURST', '3')))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '256'))  # Clients suivis au plus
+
 # Configuration du poêle
 DEFAULT_TEMPERATURE = 22.0
 MIN_TEMPERATURE = 15.0
@@ -136,7 +204,7 @@ NOTIFICATION_URL = os.getenv('NOTIFICATION_URL', 'http://localhost:5000')
 # Configuration des notifications email
 NOTIFICATION_CONFIG = {
     'enabled': os.getenv('NOTIFICATIONS_ENABLED', 'true').lower() == 'true',
-    'check_interval': int(os.getenv('NOTIFICATION_CHECK_INTERVAL', '30')),  # minutes
+    'check_interval': int(os.getenv('NOTIFICATION_CHECK_INTERVAL', '30')),  # minutes, réévaluation de secours sans instantané
     'alerts': {
         'critical_errors': {
             'codes': [253, 247, 248, 252, 254],  # E114, E108, E109, E113, E115
@@ -145,6 +213,7 @@ NOTIFICATION_CONFIG = {
         },
         'low_pellets': {
             'threshold': 20,  # %
+            'autonomy_hours': int(os.getenv('LOW_PELLETS_AUTONOMY_HOURS', '6')),  # Autonomie projetée minimale (h), 0 = ignorée
             'cooldown': 3600,  # 1 heure
             'title': '⚠️ Niveau de Pellets Bas'
         },
@@ -171,3 +240,11 @@ SMTP_CONFIG = {
     'use_tls': os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
 }
 
+# File d'envoi des notifications (persistante, envoyée en arrière-plan)
+NOTIFICATION_OUTBOX_FILE = os.getenv('NOTIFICATION_OUTBOX_FILE', 'notification_outbox.json')
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))  # Délai max. d'une opération SMTP (s)
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '60'))  # Session SMTP gardée ouverte sans envoi (s)
+NOTIFICATION_RETRY_BASE_DELAY = float(os.getenv('NOTIFICATION_RETRY_BASE_DELAY', '30'))  # Premier délai avant nouvel essai (s)
+NOTIFICATION_RETRY_MAX_DELAY = float(os.getenv('NOTIFICATION_RETRY_MAX_DELAY', '3600'))  # Délai max. entre deux essais (s)
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '12'))  # Essais avant abandon d'un message
+
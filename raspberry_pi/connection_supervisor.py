@@ -0,0 +1,159 @@
+"""
+Superviseur de connexion: détection de perte du lien et reconnexion en arrière-plan
+"""
+import random
+import time
+import threading
+import logging
+from datetime import datetime
+from config import (
+    CONNECTION_TEST_TIMEOUT,
+    LINK_CHECK_INTERVAL,
+    LINK_MAX_SILENCE,
+    RECONNECT_BASE_DELAY,
+    RECONNECT_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+# États publiés du lien série
+LINK_CONNECTED = 'connected'
+LINK_RECONNECTING = 'reconnecting'
+LINK_DISCONNECTED = 'disconnected'
+
+
+class ConnectionSupervisor:
+    """Surveillance du lien série et reconnexion avec backoff exponentiel"""
+
+    def __init__(self):
+        self.controller = None
+        self.running = False
+        self.supervisor_thread = None
+        self.wake_event = threading.Event()  # Réveil anticipé (demande de reconnexion)
+        self.status_lock = threading.Lock()
+        self.link_state = LINK_DISCONNECTED
+        self.attempts = 0           # Tentatives de reconnexion consécutives échouées
+        self.next_retry = None      # Timestamp de la prochaine tentative
+        self.last_change = None     # Date du dernier changement d'état du lien
+
+    def initialize(self, controller):
+        """Initialiser le superviseur avec le contrôleur à surveiller"""
+        self.controller = controller
+        if controller.is_connected():
+            self._set_link_state(LINK_CONNECTED)
+
+    def start(self):
+        """Démarrer la supervision en arrière-plan"""
+        if self.running:
+            logger.warning("Superviseur de connexion déjà en cours d'exécution")
+            return
+
+        self.running = True
+        self.supervisor_thread = threading.Thread(target=self._supervisor_loop, daemon=True)
+        self.supervisor_thread.start()
+        logger.info(f"Superviseur de connexion démarré (vérification toutes les {LINK_CHECK_INTERVAL}s)")
+
+    def stop(self):
+        """Arrêter la supervision"""
+        if not self.running:
+            return
+
+        self.running = False
+        self.wake_event.set()
+        if self.supervisor_thread:
+            self.supervisor_thread.join(timeout=5)
+        logger.info("Superviseur de connexion arrêté")
+
+    def request_reconnect(self):
+        """Demander une tentative de reconnexion immédiate (non bloquant)"""
+        if self.link_state != LINK_CONNECTED:
+            logger.info("Reconnexion anticipée demandée")
+            self.wake_event.set()
+
+    def get_status(self):
+        """Obtenir l'état publié du lien série"""
+        with self.status_lock:
+            silence = None
+            if self.controller:
+                silence = self.controller.communicator.get_silence_duration()
+            return {
+                'state': self.link_state,
+                'attempts': self.attempts,
+                'next_retry_in': round(max(0, self.next_retry - time.time()), 1) if self.next_retry else None,
+                'last_frame_age': round(silence, 1) if silence is not None else None,
+                'last_change': self.last_change,
+                'breaker': self.controller.communicator.breaker.get_status() if self.controller else None
+            }
+
+    def _set_link_state(self, new_state):
+        """Publier un nouvel état du lien"""
+        with self.status_lock:
+            if new_state == self.link_state:
+                return
+            logger.info(f"État du lien série: {self.link_state} → {new_state}")
+            self.link_state = new_state
+            self.last_change = datetime.now().isoformat()
+
+    def _next_delay(self):
+        """Calculer le prochain délai de reconnexion (backoff exponentiel avec gigue)"""
+        delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * (2 ** self.attempts))
+        # Gigue: éviter de retenter à intervalles fixes synchronisés sur le bus
+        return random.uniform(delay / 2, delay)
+
+    def _supervisor_loop(self):
+        """Boucle principale de supervision"""
+        while self.running:
+            wait = LINK_CHECK_INTERVAL
+            try:
+                if self.controller.is_connected():
+                    if self.controller.communicator.check_liveness(LINK_MAX_SILENCE, CONNECTION_TEST_TIMEOUT):
+                        self._set_link_state(LINK_CONNECTED)
+                        # Le poêle émet mais ne répond plus: sonder pour refermer le disjoncteur
+                        if self.controller.communicator.breaker.is_probe_due():
+                            self.controller.probe_link()
+                    else:
+                        logger.warning("Lien série perdu - aucune trame reçue du poêle")
+                        self.controller.mark_link_lost()
+                        self._set_link_state(LINK_RECONNECTING)
+                        wait = 0
+                else:
+                    self._set_link_state(LINK_RECONNECTING)
+                    logger.info(f"Tentative de reconnexion {self.attempts + 1}...")
+                    if self.controller.reconnect():
+                        logger.info("Reconnexion réussie")
+                        with self.status_lock:
+                            self.attempts = 0
+                            self.next_retry = None
+                        self._set_link_state(LINK_CONNECTED)
+                    else:
+                        wait = self._next_delay()
+                        with self.status_lock:
+                            self.attempts += 1
+                            self.next_retry = time.time() + wait
+                        logger.warning(f"Échec de la reconnexion - nouvelle tentative dans {wait:.1f}s")
+            except Exception as e:
+                logger.error(f"Erreur dans la boucle de supervision: {e}")
+
+            self.wake_event.wait(wait)
+            self.wake_event.clear()
+
+
+# Instance globale du superviseur
+supervisor = ConnectionSupervisor()
+
+def start_connection_supervisor(controller):
+    """Démarrer le superviseur de connexion"""
+    supervisor.initialize(controller)
+    supervisor.start()
+
+def stop_connection_supervisor():
+    """Arrêter le superviseur de connexion"""
+    supervisor.stop()
+
+def get_connection_status():
+    """Obtenir l'état publié du lien série"""
+    return supervisor.get_status()
+
+def request_reconnect():
+    """Demander une reconnexion anticipée"""
+    supervisor.request_reconnect()
@@ -0,0 +1,98 @@
+"""
+Estimation en ligne du débit de combustion des pellets et de l'autonomie restante
+"""
+import math
+import threading
+import logging
+from frame import parse_status
+
+logger = logging.getLogger(__name__)
+
+
+class BurnRateEstimator:
+    """
+    Débit de combustion (kg/h) estimé par moyenne mobile exponentielle
+
+    Chaque échantillon apporte un delta du compteur PQT sur un intervalle de
+    temps. Le débit de l'intervalle est attribué au statut du poêle au début de
+    l'intervalle, puis lissé avec une constante de temps tau (EWMA en temps
+    continu, poids 1 - exp(-dt / tau)). Le lissage absorbe la granularité du
+    compteur, qui n'avance que par paliers. Mise à jour en O(1).
+    """
+
+    def __init__(self, tau_hours=2.0, max_gap=900):
+        self.tau = tau_hours * 3600.0
+        self.max_gap = max_gap       # Intervalle max. entre deux échantillons (s) au-delà duquel on repart de zéro
+        self.lock = threading.Lock()
+        self.rates = {}              # Débit lissé par statut (kg/h)
+        self.running_rate = None     # Débit lissé sur tous les statuts poêle allumé (kg/h)
+        self.last_timestamp = None
+        self.last_pqt = None
+        self.last_status = None      # (nom, allumé) du dernier échantillon
+
+    def _smooth(self, previous, value, weight):
+        """Appliquer un pas d'EWMA"""
+        if previous is None:
+            return value
+        return previous + weight * (value - previous)
+
+    def update(self, timestamp, pqt, status_code):
+        """
+        Intégrer un nouvel échantillon
+
+        Args:
+            timestamp: Horodatage (secondes epoch)
+            pqt: Compteur de consommation de pellets (kg)
+            status_code: Code de statut du poêle
+        """
+        _, status_name, power_on = parse_status([status_code])
+        with self.lock:
+            if self.last_timestamp is not None:
+                dt = timestamp - self.last_timestamp
+                if 0 < dt <= self.max_gap and pqt >= self.last_pqt:
+                    rate = (pqt - self.last_pqt) * 3600.0 / dt
+                    weight = 1.0 - math.exp(-dt / self.tau)
+                    name, was_on = self.last_status
+                    self.rates[name] = self._smooth(self.rates.get(name), rate, weight)
+                    if was_on:
+                        self.running_rate = self._smooth(self.running_rate, rate, weight)
+                elif dt > self.max_gap:
+                    logger.debug(f"Estimation du débit: trou de {dt:.0f}s dans les échantillons, reprise")
+
+            self.last_timestamp = timestamp
+            self.last_pqt = pqt
+            self.last_status = (status_name, power_on)
+
+    def update_from_state(self, state):
+        """Intégrer un instantané d'état publié par le contrôleur"""
+        if state.get('pellet_consumption') is None or state.get('status_code') is None:
+            return
+        if not state.get('timestamp'):
+            return
+        self.update(state['timestamp'], state['pellet_consumption'], state['status_code'])
+
+    def estimate(self, remaining_kg):
+        """
+        Projeter l'autonomie restante
+
+        Args:
+            remaining_kg: Pellets restants dans le réservoir (kg)
+
+        Returns:
+            dict: burn_rate_kg_h, hours_to_empty (None si le poêle est éteint ou
+            le débit inconnu), empty_at (timestamp projeté) et débits par statut
+        """
+        with self.lock:
+            running = self.last_status is not None and self.last_status[1]
+            rate = self.running_rate
+            hours_to_empty = None
+            empty_at = None
+            if running and rate and rate > 0 and remaining_kg is not None:
+                hours_to_empty = max(0.0, remaining_kg / rate)
+                empty_at = self.last_timestamp + hours_to_empty * 3600
+            return {
+                'burn_rate_kg_h': round(rate, 3) if rate is not None else None,
+                'hours_to_empty': round(hours_to_empty, 1) if hours_to_empty is not None else None,
+                'empty_at': empty_at,
+                'rates_by_status': {name: round(value, 3) for name, value in self.rates.items()}
+            }
@@ -4,18 +4,63 @@ Gestionnaire de stockage pour les données de consommation de pellets
 import json
 import os
 import time
+import threading
 import logging
 from datetime import datetime
+from config import CONSUMPTION_FLUSH_INTERVAL, BURN_RATE_TAU_HOURS
+from consumption_estimator import BurnRateEstimator
 
 logger = logging.getLogger(__name__)
 
 class ConsumptionStorage:
-    """Gestionnaire de stockage pour les données de consommation de pellets"""
+    """
+    Gestionnaire de stockage pour les données de consommation de pellets
     
-    def __init__(self, storage_file='consumption_data.json'):
+    Les mises à jour fréquentes (consommation totale) sont gardées en mémoire et
+    écrites en différé par un thread de sauvegarde. Les événements explicites
+    (remplissage, reset de maintenance) sont écrits immédiatement.
+    """
+    
+    def __init__(self, storage_file='consumption_data.json', flush_interval=CONSUMPTION_FLUSH_INTERVAL):
         self.storage_file = storage_file
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()  # Protège self.data et self.dirty
+        self.dirty = False  # Modifications en mémoire non encore écrites
+        self.running = False
+        self.flush_thread = None
+        self.stop_event = threading.Event()
+        self.estimator = BurnRateEstimator(tau_hours=BURN_RATE_TAU_HOURS)  # Débit de combustion et autonomie
+        self.revision = 0  # Incrémenté quand le niveau de remplissage, l'autonomie ou la maintenance changent (ETag)
+        self.fill_signature = (None, None)  # Dernier niveau de remplissage et débit publiés (voir record_sample)
         self.data = self._load_data()
     
+    def start(self):
+        """Démarrer le thread de sauvegarde différée"""
+        if self.running:
+            return
+        
+        self.running = True
+        self.stop_event.clear()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+        logger.info(f"Sauvegarde différée de la consommation démarrée (intervalle: {self.flush_interval}s)")
+    
+    def stop(self):
+        """Arrêter le thread de sauvegarde et écrire les modifications en attente"""
+        if self.running:
+            self.running = False
+            self.stop_event.set()
+            if self.flush_thread:
+                self.flush_thread.join(timeout=5)
+        self.flush()
+    
+    def _flush_loop(self):
+        """Boucle de sauvegarde périodique des modifications en attente"""
+        while self.running:
+            self.stop_event.wait(self.flush_interval)
+            if self.running:
+                self.flush()
+    
     def _load_data(self):
         """Charger les données depuis le fichier JSON"""
         try:
@@ -48,34 +93,109 @@ class ConsumptionStorage:
             'last_updated': None
         }
     
-    def _save_data(self):
-        """Sauvegarder les données dans le fichier JSON"""
+    def _write_atomic(self, data, event_key=None):
+        """
+        Écrire les données dans un fichier temporaire puis le renommer sur l'original
+
+        Args:
+            data: Données à écrire
+            event_key: Clé de l'événement à l'origine de l'écriture (ignorée: le fichier
+                ne garde que le dernier remplissage et le dernier reset)
+        """
+        tmp_file = f"{self.storage_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.storage_file)
+        # Rendre le renommage durable: l'entrée du répertoire doit aussi atteindre le disque
+        directory = os.open(os.path.dirname(os.path.abspath(self.storage_file)), os.O_RDONLY)
         try:
-            self.data['last_updated'] = datetime.now().isoformat()
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+    
+    def _write_pending(self, event_key=None):
+        """
+        Écrire les modifications en attente (sans effet si rien n'a changé)
+
+        Args:
+            event_key: Clé de l'événement à enregistrer avec les données ('last_fill', 'maintenance_counter')
+
+        Raises:
+            OSError, sqlite3.Error: Si l'écriture échoue (les modifications restent en attente)
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            self._write_atomic(self.data, event_key)
+            self.dirty = False
             logger.debug(f"Données de consommation sauvegardées dans {self.storage_file}")
+    
+    def flush(self):
+        """Écrire les modifications en attente; une erreur est journalisée et l'écriture retentée plus tard"""
+        try:
+            self._write_pending()
         except Exception as e:
             logger.error(f"Erreur lors de la sauvegarde des données: {e}")
     
+    def _mark_dirty(self):
+        """Marquer les données comme modifiées (écriture différée)"""
+        self.data['last_updated'] = datetime.now().isoformat()
+        self.dirty = True
+    
+    def _save_data(self, event_key=None):
+        """
+        Sauvegarder immédiatement les données dans le fichier JSON
+
+        Args:
+            event_key: Clé de l'événement à enregistrer avec les données
+
+        Raises:
+            OSError, sqlite3.Error: Si l'écriture échoue, pour que l'appelant ne confirme pas l'événement
+        """
+        with self.lock:
+            self._mark_dirty()
+            self._write_pending(event_key)
+    
     def update_total_consumption(self, consumption):
-        """Mettre à jour la consommation totale"""
-        if consumption is not None:
+        """Mettre à jour la consommation totale (écriture différée)"""
+        if consumption is None:
+            return
+        with self.lock:
+            if self.data['total_consumption'] == consumption:
+                return
             self.data['total_consumption'] = consumption
-            self._save_data()
-            logger.info(f"Consommation totale mise à jour: {consumption} kg")
+            self._mark_dirty()
+        logger.info(f"Consommation totale mise à jour: {consumption} kg")
+    
+    def _save_event(self, key, entry):
+        """
+        Remplacer une entrée de l'état et l'écrire immédiatement avec son événement
+
+        L'entrée précédente est rétablie si l'écriture échoue, pour qu'une
+        sauvegarde différée ne la persiste pas plus tard sans son événement.
+        """
+        with self.lock:
+            previous = self.data[key]
+            self.data[key] = entry
+            try:
+                self._save_data(key)
+            except Exception:
+                self.data[key] = previous
+                raise
+            self.revision += 1
     
     def record_fill(self, consumption_at_fill):
         """Enregistrer un remplissage du poêle"""
         timestamp = time.time()
         date = datetime.now().isoformat()
         
-        self.data['last_fill'] = {
+        self._save_event('last_fill', {
             'timestamp': timestamp,
             'consumption_at_fill': consumption_at_fill,
             'date': date
-        }
-        self._save_data()
+        })
         logger.info(f"Remplissage enregistré: {consumption_at_fill} kg le {date}")
     
     def reset_maintenance_counter(self, consumption_at_reset):
@@ -83,12 +203,11 @@ class ConsumptionStorage:
         timestamp = time.time()
         date = datetime.now().isoformat()
         
-        self.data['maintenance_counter'] = {
+        self._save_event('maintenance_counter', {
             'consumption_at_reset': consumption_at_reset,
             'reset_timestamp': timestamp,
             'reset_date': date
-        }
-        self._save_data()
+        })
         logger.info(f"Compteur de maintenance réinitialisé: {consumption_at_reset} kg le {date}")
     
     def get_fill_level(self, current_consumption):
@@ -103,12 +222,16 @@ class ConsumptionStorage:
         # Capacité du poêle: 15 kg
         capacity = 15.0
         fill_level = max(0, 100 * (1 - (consumption_since_fill / capacity)))
+        autonomy = self.estimator.estimate(max(0.0, capacity - consumption_since_fill))
         
         return {
             'fill_level': round(fill_level, 1),
             'consumption_since_fill': round(consumption_since_fill, 1),
             'capacity': capacity,
-            'last_fill_date': self.data['last_fill']['date']
+            'last_fill_date': self.data['last_fill']['date'],
+            'burn_rate_kg_h': autonomy['burn_rate_kg_h'],
+            'hours_to_empty': autonomy['hours_to_empty'],
+            'empty_at': autonomy['empty_at']
         }
     
     def get_maintenance_consumption(self, current_consumption):
@@ -125,6 +248,46 @@ class ConsumptionStorage:
             'reset_date': self.data['maintenance_counter']['reset_date']
         }
     
+    def record_sample(self, state):
+        """
+        Intégrer un échantillon publié par le contrôleur
+
+        Alimente l'estimateur de débit; le fichier JSON ne garde pas d'historique.
+        La révision n'est incrémentée que si le niveau de remplissage arrondi ou
+        le débit changent (empty_at, recalculé à chaque échantillon, est ignoré).
+        """
+        if not state.get('connected') or not state.get('synchronized') or state.get('link_down'):
+            return
+        self.estimator.update_from_state(state)
+        pqt = state.get('pellet_consumption')
+        with self.lock:
+            fill = self.get_fill_level(pqt) if pqt is not None else None
+            if fill:
+                fill.pop('empty_at')
+            signature = (fill, self.estimator.estimate(None)['burn_rate_kg_h'])
+            if signature != self.fill_signature:
+                self.fill_signature = signature
+                self.revision += 1
+    
+    def get_events(self, event_type=None, start=0, end=None, limit=100):
+        """Obtenir les derniers événements connus (un seul par type avec le fichier JSON)"""
+        events = []
+        with self.lock:
+            last_fill = self.data['last_fill']
+            maintenance = self.data['maintenance_counter']
+            if last_fill['timestamp']:
+                events.append({'timestamp': last_fill['timestamp'], 'type': 'fill',
+                               'consumption': last_fill['consumption_at_fill'], 'details': None})
+            if maintenance['reset_timestamp']:
+                events.append({'timestamp': maintenance['reset_timestamp'], 'type': 'maintenance_reset',
+                               'consumption': maintenance['consumption_at_reset'], 'details': None})
+        end = end if end is not None else time.time() + 1
+        events = [event for event in events
+                  if (not event_type or event['type'] == event_type) and start <= event['timestamp'] < end]
+        events.sort(key=lambda event: event['timestamp'], reverse=True)
+        return events[:limit]
+    
     def get_all_data(self):
         """Obtenir toutes les données"""
-        return self.data.copy()
+        with self.lock:
+            return self.data.copy()
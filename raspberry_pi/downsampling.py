@@ -0,0 +1,71 @@
+"""
+Sous-échantillonnage des séries pour les graphiques (Largest-Triangle-Three-Buckets)
+
+LTTB garde, dans chaque seau, le point qui forme le plus grand triangle avec le
+point retenu précédemment et la moyenne du seau suivant: les pics (allumages) et
+les creux (refroidissements) survivent à la réduction. L'implémentation est un
+passage unique sur un itérateur et ne garde en mémoire que deux seaux.
+"""
+from itertools import islice
+
+
+def lttb(points, count, threshold):
+    """
+    Réduire une série à threshold points
+
+    Args:
+        points: Itérable de (x, y) triés par x
+        count: Nombre de points de la série (HistoryStore.count)
+        threshold: Nombre de points voulus (au moins 3)
+
+    Yields:
+        tuple: Points (x, y) retenus, dans l'ordre
+    """
+    points = iter(points)
+    if threshold >= count or threshold < 3:
+        yield from points
+        return
+
+    every = (count - 2) / (threshold - 2)
+
+    def bucket(i):
+        """Points du seau i (le dernier seau contient tout le reste)"""
+        if i == threshold - 1:
+            return list(points)
+        start = int((i - 1) * every) + 1
+        end = int(i * every) + 1
+        return list(islice(points, end - start))
+
+    selected = next(points, None)
+    if selected is None:
+        return
+    yield selected
+
+    current = bucket(1)
+    for i in range(2, threshold):
+        following = bucket(i)
+        if not current:
+            break
+        if i == threshold - 1:
+            following = following[-1:]  # Dernier point de la série
+        if following:
+            avg_x = sum(p[0] for p in following) / len(following)
+            avg_y = sum(p[1] for p in following) / len(following)
+        else:
+            avg_x, avg_y = current[-1]
+
+        # Point du seau courant formant le plus grand triangle
+        ax, ay = selected
+        best = None
+        best_area = -1.0
+        for point in current:
+            area = abs((ax - avg_x) * (point[1] - ay) - (ax - point[0]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = point
+        selected = best
+        yield selected
+        current = following
+
+    if current:
+        yield current[-1]
@@ -1,26 +1,27 @@
 """
 Système de notifications par email pour le contrôleur Palazzetti
 """
-import smtplib
 import time
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
 from datetime import datetime
-from config import NOTIFICATION_CONFIG
+from config import NOTIFICATION_CONFIG, SMTP_TIMEOUT
+from notification_outbox import notification_outbox
 
 logger = logging.getLogger(__name__)
 
+# Une alerte d'autonomie se lève sous autonomy_hours et ne se résout qu'au-delà de ce multiple
+AUTONOMY_HYSTERESIS = 1.5
+
 class EmailNotificationManager:
     """Gestionnaire de notifications par email"""
     
-    def __init__(self, smtp_config=None):
+    def __init__(self, smtp_config=None, outbox=None):
         self.config = NOTIFICATION_CONFIG
         self.smtp_config = smtp_config or self._get_default_smtp_config()
+        self.outbox = outbox or notification_outbox
         self.last_alerts = {}  # Pour gérer les cooldowns
         self.alert_states = {}  # Pour suivre l'état des alertes (active/résolue)
+        self.last_fill_date = None  # Date du dernier remplissage vue (résolution de l'alerte d'autonomie)
         
     def _get_default_smtp_config(self):
         """Configuration SMTP par défaut"""
@@ -73,46 +74,62 @@ class EmailNotificationManager:
             # Problème persiste ou pas de problème
             return False
     
-    def _send_email(self, subject, body, html_body=None):
-        """Envoyer un email"""
+    def _is_low_pellets(self, fill_data):
+        """
+        Niveau sous le seuil, ou autonomie projetée au débit actuel trop courte
+        
+        L'autonomie n'est projetée que poêle allumé: poêle éteint, le verdict
+        précédent est conservé. Une alerte d'autonomie ne se résout qu'après un
+        remplissage, ou quand l'autonomie dépasse AUTONOMY_HYSTERESIS fois le seuil.
+        
+        Args:
+            fill_data: Données de remplissage (get_fill_level du stockage)
+        
+        Returns:
+            bool: True si le niveau de pellets est bas
+        """
+        alert = self.config['alerts']['low_pellets']
+        autonomy_hours = alert.get('autonomy_hours', 0)
+        hours_to_empty = fill_data.get('hours_to_empty')
+        
+        low_autonomy = self._is_alert_active('low_autonomy')
+        refilled = self.last_fill_date is not None and fill_data.get('last_fill_date') != self.last_fill_date
+        self.last_fill_date = fill_data.get('last_fill_date')
+        if autonomy_hours <= 0 or refilled:
+            low_autonomy = False
+        if autonomy_hours > 0 and hours_to_empty is not None:
+            bound = autonomy_hours * AUTONOMY_HYSTERESIS if low_autonomy else autonomy_hours
+            low_autonomy = hours_to_empty < bound
+        self._set_alert_state('low_autonomy', low_autonomy)
+        
+        return fill_data.get('fill_level', 100) < alert['threshold'] or low_autonomy
+    
+    def _send_email(self, subject, body, html_body=None, wait=None):
+        """
+        Mettre un email dans la file d'envoi (envoyé en arrière-plan, réessayé en cas d'échec)
+
+        Args:
+            subject: Sujet
+            body: Texte brut
+            html_body: Version HTML (optionnelle)
+            wait: Attendre l'envoi au plus wait secondes (None pour rendre la main aussitôt)
+
+        Returns:
+            bool: True si l'email est en file (ou, avec wait, effectivement envoyé)
+        """
         if not self.smtp_config['username'] or not self.smtp_config['to_emails']:
             logger.warning("Configuration SMTP incomplète, email non envoyé")
             return False
         
         try:
-            # Créer le message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.smtp_config['from_email'] or self.smtp_config['username']
-            msg['To'] = ', '.join(self.smtp_config['to_emails'])
-            msg['Subject'] = subject
-            
-            # Ajouter le texte brut
-            text_part = MIMEText(body, 'plain', 'utf-8')
-            msg.attach(text_part)
-            
-            # Ajouter le HTML si fourni
-            if html_body:
-                html_part = MIMEText(html_body, 'html', 'utf-8')
-                msg.attach(html_part)
-            
-            # Connexion SMTP
-            server = smtplib.SMTP(self.smtp_config['smtp_server'], self.smtp_config['smtp_port'])
-            
-            if self.smtp_config['use_tls']:
-                server.starttls()
-            
-            server.login(self.smtp_config['username'], self.smtp_config['password'])
-            
-            # Envoyer l'email
-            text = msg.as_string()
-            server.sendmail(msg['From'], self.smtp_config['to_emails'], text)
-            server.quit()
-            
-            logger.info(f"Email envoyé avec succès: {subject}")
-            return True
-            
+            return self.outbox.send(
+                subject, body, html_body,
+                self.smtp_config['from_email'] or self.smtp_config['username'],
+                self.smtp_config['to_emails'],
+                wait=wait
+            )
         except Exception as e:
-            logger.error(f"Erreur lors de l'envoi de l'email: {e}")
+            logger.error(f"Erreur lors de la mise en file de l'email: {e}")
             return False
     
     def send_critical_error_alert(self, error_code, error_message):
@@ -162,17 +179,20 @@ Système de surveillance automatique
         
         self._send_email(subject, body, html_body)
     
-    def send_low_pellets_alert(self, fill_level, threshold):
+    def send_low_pellets_alert(self, fill_level, threshold, hours_to_empty=None):
         """Envoyer une alerte de niveau de pellets bas"""
         if not self._should_send_alert('low_pellets'):
             return
         
+        autonomy = f"{hours_to_empty} h" if hours_to_empty is not None else "inconnue"
+        
         subject = "⚠️ Niveau de Pellets Bas - Poêle Palazzetti"
         body = f"""
 ALERTE NIVEAU DE PELLETS BAS
 
 Niveau actuel: {fill_level}%
 Seuil d'alerte: {threshold}%
+Autonomie estimée: {autonomy}
 Date: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}
 
 Recommandation: Préparez-vous à remplir le poêle avec des pellets.
@@ -191,6 +211,7 @@ Système de surveillance automatique
                 <div style="background: white; padding: 15px; border-radius: 5px; margin: 10px 0;">
                     <p><strong>Niveau actuel:</strong> {fill_level}%</p>
                     <p><strong>Seuil d'alerte:</strong> {threshold}%</p>
+                    <p><strong>Autonomie estimée:</strong> {autonomy}</p>
                     <p><strong>Date:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}</p>
                 </div>
                 
@@ -344,7 +365,8 @@ Système de surveillance automatique
         </html>
         """
         
-        return self._send_email(subject, body, html_body)
+        # Le test attend l'envoi réel pour rendre compte d'une erreur SMTP
+        return self._send_email(subject, body, html_body, wait=SMTP_TIMEOUT)
     
     def send_critical_error_resolved_alert(self):
         """Envoyer une notification de résolution d'erreur critique"""
@@ -490,16 +512,17 @@ Système de surveillance automatique
                 else:
                     self.send_critical_error_resolved_alert()
             
-            # Vérifier le niveau de pellets
-            fill_level = state.get('fill_level', {}).get('fill_level', 100)
-            threshold = self.config['alerts']['low_pellets']['threshold']
-            
-            is_low_pellets = fill_level < threshold
-            if self._should_send_alert_smart('low_pellets', is_low_pellets):
-                if is_low_pellets:
-                    self.send_low_pellets_alert(fill_level, threshold)
-                else:
-                    self.send_low_pellets_resolved_alert()
+            # Vérifier le niveau de pellets (sans compteur de consommation, le verdict précédent est conservé)
+            fill_data = state.get('fill_level')
+            if fill_data:
+                is_low_pellets = self._is_low_pellets(fill_data)
+                if self._should_send_alert_smart('low_pellets', is_low_pellets):
+                    if is_low_pellets:
+                        self.send_low_pellets_alert(fill_data.get('fill_level', 100),
+                                                    self.config['alerts']['low_pellets']['threshold'],
+                                                    fill_data.get('hours_to_empty'))
+                    else:
+                        self.send_low_pellets_resolved_alert()
             
             # Vérifier la perte de connexion
             is_connected = state.get('connected', False)
@@ -527,5 +550,6 @@ Système de surveillance automatique
             'smtp_server': self.smtp_config['smtp_server'],
             'from_email': self.smtp_config['from_email'] or self.smtp_config['username'],
             'to_emails': self.smtp_config['to_emails'],
-            'last_alerts': self.last_alerts
+            'last_alerts': self.last_alerts,
+            'outbox': self.outbox.get_status()
         }
@@ -0,0 +1,246 @@
+"""
+Statistiques de chauffage calculées sur l'historique local avec NumPy
+
+Chaque jour est chargé en un tableau structuré (segment brut lu directement,
+archive décodée de façon vectorisée) puis réduit en quelques passes: kg brûlés,
+heures par statut, allumages, degrés-heures au-dessus de la consigne. Les
+résultats des jours terminés ne changent plus et sont gardés en cache.
+"""
+import time
+import threading
+import logging
+from datetime import datetime
+import numpy as np
+from frame import parse_status
+from history_store import RECORD_STRUCT, SEGMENT_SUFFIX, period_start, next_period_start
+from history_archive import read_archive_columns
+
+logger = logging.getLogger(__name__)
+
+# Même disposition que RECORD_STRUCT ('<IHhhBx')
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<u4'), ('pqt', '<u2'), ('temperature', '<i2'),
+    ('setpoint', '<i2'), ('status', 'u1'), ('reserved', 'u1')
+])
+
+# Intervalle max. entre deux échantillons compté comme continu (s)
+MAX_SAMPLE_GAP = 900
+
+# Tables indexées par code de statut
+_STATUS = [parse_status([code]) for code in range(256)]
+STATUS_NAMES = [name for _, name, _ in _STATUS]
+RUNNING = np.array([power_on for _, _, power_on in _STATUS], dtype=bool)
+
+
+def _decode_varints(data):
+    """Décoder un flux de varints zigzag en tableau int64 (vectorisé)"""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if raw.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Rang de chaque octet dans son varint
+    group = np.zeros(raw.size, dtype=np.int64)
+    group[ends[:-1] + 1] = 1
+    position = np.arange(raw.size) - starts[np.cumsum(group)]
+    values = np.add.reduceat((raw & 0x7F).astype(np.int64) << (7 * position), starts)
+    return (values >> 1) ^ -(values & 1)
+
+
+def load_segment(path):
+    """
+    Charger un segment brut ou une archive en tableau structuré
+
+    Returns:
+        numpy.ndarray: Enregistrements de type RECORD_DTYPE
+    """
+    if path.endswith(SEGMENT_SUFFIX):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return np.frombuffer(data, dtype=RECORD_DTYPE, count=len(data) // RECORD_DTYPE.itemsize)
+
+    header, columns = read_archive_columns(path, RECORD_STRUCT)
+    records = np.zeros(header.count, dtype=RECORD_DTYPE)
+    if not columns:
+        return records
+    records['timestamp'] = np.cumsum(np.cumsum(_decode_varints(columns[0])))
+    for name, data in zip(('pqt', 'temperature', 'setpoint', 'status'), columns[1:]):
+        records[name] = np.cumsum(_decode_varints(data))
+    return records
+
+
+class DayStats:
+    """Statistiques d'une journée (tableaux indexés par code de statut)"""
+
+    def __init__(self, start, kg=0.0, hours_by_status=None, kg_by_status=None,
+                 ignitions=0, degree_hours=0.0, samples=0, last=None):
+        self.start = start
+        self.kg = kg
+        self.hours_by_status = hours_by_status if hours_by_status is not None else np.zeros(256)
+        self.kg_by_status = kg_by_status if kg_by_status is not None else np.zeros(256)
+        self.ignitions = ignitions
+        self.degree_hours = degree_hours  # °C·h au-dessus de la consigne
+        self.samples = samples
+        self.last = last  # Dernier enregistrement (tableau de longueur 1), raccord avec le jour suivant
+
+    @property
+    def burn_hours(self):
+        """Heures passées dans un statut poêle allumé"""
+        return float(self.hours_by_status[RUNNING].sum())
+
+
+def compute_day(start, records, previous=None):
+    """
+    Calculer les statistiques d'une journée en passes vectorisées
+
+    Args:
+        start: Début de la journée (timestamp)
+        records: Tableau structuré RECORD_DTYPE trié par timestamp
+        previous: Dernier enregistrement de la veille (intervalle à cheval sur minuit)
+
+    Returns:
+        DayStats
+    """
+    samples = int(records.size)
+    last = records[-1:].copy() if samples else previous
+    if previous is not None and previous.size:
+        records = np.concatenate((previous, records))
+    if records.size < 2:
+        return DayStats(start, samples=samples, last=last)
+
+    timestamps = records['timestamp'].astype(np.int64)
+    pqt = records['pqt'].astype(np.int64)
+    status = records['status'][:-1]
+
+    # Chaque intervalle est attribué au statut de l'échantillon qui l'ouvre
+    dt = np.diff(timestamps)
+    valid = (dt > 0) & (dt <= MAX_SAMPLE_GAP)
+    hours = np.where(valid, dt, 0) / 3600.0
+    dpqt = np.diff(pqt)
+    burned = np.where(valid & (dpqt > 0), dpqt, 0)  # Compteur qui recule: remise à zéro
+
+    running = RUNNING[records['status']]
+    ignitions = int(np.count_nonzero(running[1:] & ~running[:-1]))
+
+    excess = np.maximum(records['temperature'][:-1].astype(np.int64) - records['setpoint'][:-1], 0) / 10.0
+
+    return DayStats(
+        start,
+        kg=float(burned.sum()),
+        hours_by_status=np.bincount(status, weights=hours, minlength=256),
+        kg_by_status=np.bincount(status, weights=burned, minlength=256),
+        ignitions=ignitions,
+        degree_hours=float((excess * hours).sum()),
+        samples=samples,
+        last=last
+    )
+
+
+class HeatingAnalytics:
+    """Rapports de chauffage sur l'historique, avec cache des jours terminés"""
+
+    def __init__(self, history_store):
+        self.history_store = history_store
+        self.cache = {}  # Début de journée → DayStats (jours terminés uniquement)
+        self.lock = threading.Lock()
+
+    def _load_day(self, day_start, segments):
+        """Charger les enregistrements d'un jour (tableau vide si absent)"""
+        path = segments.get(day_start)
+        try:
+            return load_segment(path) if path else np.zeros(0, dtype=RECORD_DTYPE)
+        except FileNotFoundError:
+            # Segment archivé entre-temps: relire la liste
+            path = dict(self.history_store.segments()).get(day_start)
+            return load_segment(path) if path else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def _day_stats(self, day_start, segments, today, previous):
+        """Statistiques d'un jour, depuis le cache si le jour est terminé"""
+        with self.lock:
+            cached = self.cache.get(day_start)
+        if cached is not None:
+            return cached
+
+        if previous is None:
+            # Premier jour du rapport: raccord avec la fin de la veille
+            records = self._load_day(period_start(day_start - 3600), segments)
+            previous_last = records[-1:]
+        else:
+            previous_last = previous.last
+        stats = compute_day(day_start, self._load_day(day_start, segments), previous_last)
+
+        if day_start < today:
+            with self.lock:
+                self.cache[day_start] = stats
+        return stats
+
+    def report(self, start, end):
+        """
+        Calculer le rapport de chauffage des jours recoupant [start, end)
+
+        Returns:
+            dict: Totaux, séries journalières et mensuelles (en colonnes) et détail par statut
+        """
+        started = time.time()
+        segments = dict(self.history_store.segments())
+        now = time.time()
+        today = period_start(now)
+        # Limiter la plage aux jours présents dans l'historique
+        if segments:
+            start = max(start, min(segments))
+        end = min(end, next_period_start(now))
+        days = []
+        day = period_start(start)
+        while day < end:
+            days.append(self._day_stats(day, segments, today, days[-1] if days else None))
+            day = next_period_start(day)
+
+        hours_by_status = np.sum([d.hours_by_status for d in days], axis=0) if days else np.zeros(256)
+        kg_by_status = np.sum([d.kg_by_status for d in days], axis=0) if days else np.zeros(256)
+
+        # Regroupement par nom (plusieurs codes partagent le même libellé)
+        by_status = {}
+        for code in np.flatnonzero(hours_by_status):
+            entry = by_status.setdefault(STATUS_NAMES[code], {'hours': 0.0, 'kg': 0.0})
+            entry['hours'] += float(hours_by_status[code])
+            entry['kg'] += float(kg_by_status[code])
+        for entry in by_status.values():
+            entry['kg_per_hour'] = round(entry['kg'] / entry['hours'], 3) if entry['hours'] else None
+            entry['hours'] = round(entry['hours'], 2)
+
+        months = {}
+        for d in days:
+            month = datetime.fromtimestamp(d.start).strftime('%Y-%m')
+            kg, burn_hours = months.get(month, (0.0, 0.0))
+            months[month] = (kg + d.kg, burn_hours + d.burn_hours)
+
+        kg_total = sum(d.kg for d in days)
+        degree_hours = sum(d.degree_hours for d in days)
+        logger.debug(f"Rapport de chauffage sur {len(days)} jours calculé en {time.time() - started:.3f}s")
+
+        return {
+            'from': days[0].start if days else start,
+            'to': end,
+            'kg_total': kg_total,
+            'burn_hours_total': round(sum(d.burn_hours for d in days), 2),
+            'ignitions': sum(d.ignitions for d in days),
+            'degree_hours_above_setpoint': round(degree_hours, 1),
+            'degree_hours_per_kg': round(degree_hours / kg_total, 2) if kg_total else None,
+            'days': {
+                't': [d.start for d in days],
+                'kg': [d.kg for d in days],
+                'burn_hours': [round(d.burn_hours, 2) for d in days],
+                'ignitions': [d.ignitions for d in days]
+            },
+            'months': {
+                'month': list(months),
+                'kg': [kg for kg, _ in months.values()],
+                'burn_hours': [round(hours, 2) for _, hours in months.values()]
+            },
+            'by_status': by_status
+        }
+
+    def get_status(self):
+        """Obtenir l'état du cache"""
+        with self.lock:
+            return {'cached_days': len(self.cache)}
@@ -0,0 +1,211 @@
+"""
+Archives compressées des segments d'historique scellés
+
+Un segment dont la période est terminée est réécrit en colonnes: timestamps en
+delta-of-delta, autres champs (PQT, températures en 0.1°C, statut) en deltas,
+chaque colonne en varints zigzag puis compressée par zlib. À intervalle
+d'échantillonnage régulier, presque toutes les valeurs valent 0 et la
+compression dépasse largement 10×.
+
+Format d'un fichier .arc:
+    en-tête: magic (4 octets) | nombre de colonnes (uint8) | nombre d'enregistrements (uint32)
+    premier et dernier enregistrement (format du segment d'origine)
+    puis, par colonne: longueur compressée (uint32) | varints compressés
+"""
+import os
+import struct
+import zlib
+
+ARCHIVE_MAGIC = b'PZA1'
+ARCHIVE_SUFFIX = '.arc'
+HEADER_STRUCT = struct.Struct('<4sBI')
+LENGTH_STRUCT = struct.Struct('<I')
+
+
+class ArchiveHeader:
+    """En-tête d'une archive: nombre d'enregistrements et enregistrements extrêmes"""
+
+    def __init__(self, count, first, last):
+        self.count = count
+        self.first = first  # Premier enregistrement (tuple brut)
+        self.last = last    # Dernier enregistrement (tuple brut)
+
+    def overlaps(self, start, end):
+        """Vérifier si l'archive contient des timestamps dans [start, end)"""
+        return self.count > 0 and self.first[0] < end and self.last[0] >= start
+
+
+def _encode_varints(values):
+    """Encoder des entiers signés en varints zigzag"""
+    out = bytearray()
+    for value in values:
+        value = value << 1 if value >= 0 else (-value << 1) - 1
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def _iter_varints(data):
+    """Décoder un flux de varints zigzag"""
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield (value >> 1) ^ -(value & 1)
+            value = 0
+            shift = 0
+
+
+def _deltas(column):
+    """Différences successives (la première valeur par rapport à 0)"""
+    previous = 0
+    for value in column:
+        yield value - previous
+        previous = value
+
+
+def _cumulate(deltas):
+    """Inverse de _deltas"""
+    value = 0
+    for delta in deltas:
+        value += delta
+        yield value
+
+
+def encode_archive(records, record_struct):
+    """
+    Encoder des enregistrements en archive colonnaire
+
+    Args:
+        records: Liste non vide de tuples d'entiers, le timestamp en premier
+        record_struct: Format des enregistrements (pour le premier et le dernier)
+
+    Returns:
+        bytes: Contenu du fichier archive
+    """
+    columns = list(zip(*records))
+    parts = [
+        HEADER_STRUCT.pack(ARCHIVE_MAGIC, len(columns), len(records)),
+        record_struct.pack(*records[0]),
+        record_struct.pack(*records[-1])
+    ]
+
+    for index, column in enumerate(columns):
+        values = _deltas(column)
+        if index == 0:
+            values = _deltas(list(values))  # Timestamps: delta-of-delta
+        data = zlib.compress(_encode_varints(values), 9)
+        parts.append(LENGTH_STRUCT.pack(len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def read_archive_header(f, record_struct):
+    """
+    Lire l'en-tête d'une archive ouverte (sans décompresser les colonnes)
+
+    Returns:
+        ArchiveHeader
+    """
+    magic, column_count, count = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("Archive d'historique invalide (magic)")
+    first = record_struct.unpack(f.read(record_struct.size))
+    last = record_struct.unpack(f.read(record_struct.size))
+    return ArchiveHeader(count, first, last)
+
+
+def read_archive_columns(path, record_struct, start=0, end=2 ** 32):
+    """
+    Lire l'en-tête et les colonnes décompressées d'une archive
+
+    Returns:
+        tuple: (ArchiveHeader, liste des varints de chaque colonne en bytes),
+        colonnes vides si l'archive ne recoupe pas [start, end)
+    """
+    with open(path, 'rb') as f:
+        header = read_archive_header(f, record_struct)
+        if not header.overlaps(start, end):
+            return header, []
+        columns = []
+        for _ in range(len(header.first)):
+            length, = LENGTH_STRUCT.unpack(f.read(LENGTH_STRUCT.size))
+            columns.append(zlib.decompress(f.read(length)))
+    return header, columns
+
+
+def iter_archive(path, record_struct, start, end):
+    """
+    Itérer sur les enregistrements d'une archive dans la plage [start, end)
+
+    Seul l'en-tête est lu si l'archive ne recoupe pas la plage; sinon les
+    colonnes sont décodées au fil de l'itération.
+
+    Yields:
+        tuple: Valeurs brutes dans l'ordre chronologique
+    """
+    _, columns = read_archive_columns(path, record_struct, start, end)
+    streams = []
+    for index, data in enumerate(columns):
+        values = _cumulate(_iter_varints(data))
+        if index == 0:
+            values = _cumulate(values)  # Timestamps: delta-of-delta
+        streams.append(values)
+
+    for record in zip(*streams):
+        timestamp = record[0]
+        if timestamp >= end:
+            break
+        if timestamp >= start:
+            yield record
+
+
+def archive_count(path, record_struct, start, end):
+    """Compter les enregistrements d'une archive dans [start, end)"""
+    with open(path, 'rb') as f:
+        header = read_archive_header(f, record_struct)
+    if not header.overlaps(start, end):
+        return 0
+    if header.first[0] >= start and header.last[0] < end:
+        return header.count
+    return sum(1 for _ in iter_archive(path, record_struct, start, end))
+
+
+def write_archive(segment_path, record_struct):
+    """
+    Convertir un segment scellé en archive puis supprimer le segment
+
+    L'archive est écrite dans un fichier temporaire, synchronisée, relue et
+    comparée au segment avant de remplacer celui-ci.
+
+    Returns:
+        tuple: (taille du segment, taille de l'archive) en octets
+    """
+    size = record_struct.size
+    with open(segment_path, 'rb') as f:
+        data = f.read()
+    records = list(record_struct.iter_unpack(data[:len(data) - len(data) % size]))
+    if not records:
+        os.remove(segment_path)  # Segment vide: rien à archiver
+        return len(data), 0
+
+    archive_path = segment_path[:-len(os.path.splitext(segment_path)[1])] + ARCHIVE_SUFFIX
+    tmp_path = f"{archive_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_archive(records, record_struct))
+        f.flush()
+        os.fsync(f.fileno())
+
+    # Vérification avant de supprimer l'original
+    if list(iter_archive(tmp_path, record_struct, 0, records[-1][0] + 1)) != records:
+        os.remove(tmp_path)
+        raise ValueError(f"Vérification de l'archive échouée pour {segment_path}")
+
+    os.replace(tmp_path, archive_path)
+    os.remove(segment_path)
+    return len(data), os.path.getsize(archive_path)
@@ -0,0 +1,78 @@
+"""
+Export en flux de l'historique des échantillons (CSV ou JSON, gzip optionnel)
+
+Les générateurs produisent la réponse par morceaux à partir de l'itérateur du
+stockage: la mémoire utilisée ne dépend pas de la taille de la plage exportée.
+"""
+import json
+import zlib
+from datetime import datetime
+
+EXPORT_CSV = 'csv'
+EXPORT_JSON = 'json'
+EXPORT_FORMATS = {EXPORT_CSV: 'text/csv', EXPORT_JSON: 'application/json'}
+
+CSV_HEADER = 'timestamp,date,pqt,temperature,setpoint,status\n'
+CHUNK_SIZE = 64 * 1024  # Taille cible des morceaux envoyés (octets)
+
+
+def _csv_lines(samples):
+    """Une ligne CSV par échantillon"""
+    yield CSV_HEADER
+    for timestamp, pqt, temperature, setpoint, status in samples:
+        date = datetime.fromtimestamp(timestamp).isoformat()
+        yield f"{timestamp},{date},{pqt},{temperature},{setpoint},{status}\n"
+
+
+def _json_lines(samples):
+    """Tableau JSON d'objets, un objet par échantillon"""
+    separator = '['
+    for sample in samples:
+        yield separator + json.dumps(sample._asdict())
+        separator = ',\n'
+    yield '[]' if separator == '[' else ']'
+
+
+def _chunked(lines):
+    """Regrouper les lignes en morceaux d'environ CHUNK_SIZE octets"""
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    """Compresser un flux de morceaux au format gzip"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: en-tête et somme gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_samples(samples, export_format=EXPORT_CSV, compress=False):
+    """
+    Sérialiser des échantillons en flux
+
+    Args:
+        samples: Itérateur de Sample (HistoryStore.query)
+        export_format: EXPORT_CSV ou EXPORT_JSON
+        compress: True pour compresser le flux en gzip
+
+    Returns:
+        generator: Morceaux d'octets à envoyer tels quels
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {export_format}")
+    lines = _csv_lines(samples) if export_format == EXPORT_CSV else _json_lines(samples)
+    chunks = _chunked(lines)
+    return _gzipped(chunks) if compress else chunks
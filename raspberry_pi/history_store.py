@@ -0,0 +1,669 @@
+"""
+Stockage append-only des échantillons de consommation et de température
+
+Chaque échantillon est un enregistrement binaire de taille fixe ajouté à la fin
+d'un segment journalier (un fichier par jour, heure locale). Les lectures passent
+par mmap et les requêtes par plage utilisent une recherche dichotomique sur les
+timestamps, qui sont strictement croissants dans chaque segment.
+
+À l'ingestion, les échantillons alimentent aussi des agrégats (1 min, 1 h, 1 jour)
+stockés de la même façon, chacun avec sa propre durée de rétention.
+
+Les segments bruts anciens sont réécrits en archives compressées (voir
+history_archive); les requêtes les lisent de façon transparente.
+"""
+import os
+import mmap
+import time
+import struct
+import threading
+import logging
+from collections import namedtuple
+from config import HISTORY_RETENTION_DAYS, HISTORY_ARCHIVE_AFTER_DAYS
+from downsampling import lttb
+from history_archive import ARCHIVE_SUFFIX, archive_count, iter_archive, read_archive_header, write_archive
+
+logger = logging.getLogger(__name__)
+
+# Enregistrement de 12 octets (little-endian):
+# timestamp (uint32, s) | PQT (uint16, brut) | température (int16, 0.1°C)
+# | consigne (int16, 0.1°C) | code statut (uint8) | réservé (uint8)
+RECORD_STRUCT = struct.Struct('<IHhhBx')
+RECORD_SIZE = RECORD_STRUCT.size
+
+# Agrégat de 26 octets (little-endian):
+# début (uint32, s) | nombre d'échantillons (uint16)
+# | deltas PQT: somme (uint32), min, max (uint16) | dernier PQT (uint16)
+# | température (0.1°C): somme (int32), min, max, dernière (int16)
+ROLLUP_STRUCT = struct.Struct('<IHIHHHihhh')
+
+TIMESTAMP_STRUCT = struct.Struct('<I')
+SEGMENT_SUFFIX = '.seg'
+
+# Périodes de découpage des segments (heure locale)
+PERIOD_DAY = 'day'
+PERIOD_MONTH = 'month'
+PERIOD_YEAR = 'year'
+_PERIOD_FORMATS = {PERIOD_DAY: '%Y%m%d', PERIOD_MONTH: '%Y%m', PERIOD_YEAR: '%Y'}
+_PERIOD_SPANS = {PERIOD_DAY: 26 * 3600, PERIOD_MONTH: 32 * 86400, PERIOD_YEAR: 367 * 86400}
+
+# Niveaux d'agrégation: (nom, largeur du seau en secondes, période des segments)
+ROLLUP_TIERS = [
+    ('minute', 60, PERIOD_DAY),
+    ('hour', 3600, PERIOD_MONTH),
+    ('day', 86400, PERIOD_YEAR),
+]
+
+# Métriques servies en colonnes par query_columns
+METRIC_PQT = 'pqt'
+METRIC_TEMPERATURE = 'temperature'
+HISTORY_METRICS = (METRIC_PQT, METRIC_TEMPERATURE)
+
+Sample = namedtuple('Sample', ['timestamp', 'pqt', 'temperature', 'setpoint', 'status'])
+Rollup = namedtuple('Rollup', [
+    'start', 'count',
+    'pqt_sum', 'pqt_min', 'pqt_max', 'pqt_last',
+    'temperature_sum', 'temperature_min', 'temperature_max', 'temperature_last'
+])
+
+
+def period_start(timestamp, period=PERIOD_DAY):
+    """Obtenir le timestamp du début de la période (heure locale) contenant timestamp"""
+    t = time.localtime(timestamp)
+    month = 1 if period == PERIOD_YEAR else t.tm_mon
+    mday = t.tm_mday if period == PERIOD_DAY else 1
+    return int(time.mktime((t.tm_year, month, mday, 0, 0, 0, 0, 0, -1)))
+
+
+def next_period_start(timestamp, period=PERIOD_DAY):
+    """Obtenir le début de la période suivante (gère les jours de 23h/25h)"""
+    return period_start(period_start(timestamp, period) + _PERIOD_SPANS[period], period)
+
+
+def _lower_bound(buf, count, record_size, timestamp):
+    """Premier indice d'enregistrement dont le timestamp est >= timestamp"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if TIMESTAMP_STRUCT.unpack_from(buf, mid * record_size)[0] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _decode_sample(record):
+    """Convertir un enregistrement brut en Sample"""
+    timestamp, pqt, temperature, setpoint, status = record
+    return Sample(timestamp, pqt, temperature / 10.0, setpoint / 10.0, status)
+
+
+def _decode_rollup(record):
+    """Convertir un agrégat brut en Rollup (températures en °C)"""
+    start, count, d_sum, d_min, d_max, pqt_last, t_sum, t_min, t_max, t_last = record
+    return Rollup(start, count, d_sum, d_min, d_max, pqt_last,
+                  t_sum / 10.0, t_min / 10.0, t_max / 10.0, t_last / 10.0)
+
+
+def merge_rollups(a, b):
+    """Fusionner deux agrégats consécutifs (b postérieur à a)"""
+    return Rollup(
+        a.start, a.count + b.count,
+        a.pqt_sum + b.pqt_sum, min(a.pqt_min, b.pqt_min), max(a.pqt_max, b.pqt_max), b.pqt_last,
+        a.temperature_sum + b.temperature_sum,
+        min(a.temperature_min, b.temperature_min), max(a.temperature_max, b.temperature_max),
+        b.temperature_last
+    )
+
+
+class SegmentSeries:
+    """Série d'enregistrements de taille fixe répartis en segments append-only par période"""
+
+    def __init__(self, directory, record_struct, period=PERIOD_DAY):
+        self.directory = directory
+        self.record_struct = record_struct
+        self.record_size = record_struct.size
+        self.period = period
+        self.lock = threading.Lock()  # Sérialise les ajouts et les purges
+        os.makedirs(self.directory, exist_ok=True)
+        self.last_record = self._load_last_record()
+
+    def _segment_path(self, timestamp):
+        """Chemin du segment contenant timestamp"""
+        name = time.strftime(_PERIOD_FORMATS[self.period], time.localtime(timestamp)) + SEGMENT_SUFFIX
+        return os.path.join(self.directory, name)
+
+    def segments(self):
+        """
+        Lister les segments existants
+
+        Returns:
+            list: Tuples (début de période, chemin) triés par date
+        """
+        found = {}
+        for name in os.listdir(self.directory):
+            stem, suffix = os.path.splitext(name)
+            if suffix not in (SEGMENT_SUFFIX, ARCHIVE_SUFFIX):
+                continue
+            try:
+                parsed = time.strptime(stem, _PERIOD_FORMATS[self.period])
+            except ValueError:
+                logger.warning(f"Segment d'historique ignoré (nom invalide): {name}")
+                continue
+            # Pendant un archivage, le segment d'origine fait foi jusqu'à sa suppression
+            seg_start = int(time.mktime(parsed))
+            if suffix == SEGMENT_SUFFIX or seg_start not in found:
+                found[seg_start] = os.path.join(self.directory, name)
+        return sorted(found.items())
+
+    def _load_last_record(self):
+        """Relire le dernier enregistrement (reprise après redémarrage)"""
+        for _, path in reversed(self.segments()):
+            if path.endswith(ARCHIVE_SUFFIX):
+                with open(path, 'rb') as f:
+                    return read_archive_header(f, self.record_struct).last
+            size = os.path.getsize(path)
+            if size >= self.record_size:
+                with open(path, 'rb') as f:
+                    f.seek((size // self.record_size - 1) * self.record_size)
+                    return self.record_struct.unpack(f.read(self.record_size))
+        return None
+
+    def append(self, values):
+        """
+        Ajouter un enregistrement à la fin du segment de sa période
+
+        Args:
+            values: Tuple de valeurs brutes, le timestamp en premier
+
+        Returns:
+            bool: True si l'enregistrement a été ajouté, False s'il est ignoré
+        """
+        timestamp = values[0]
+        with self.lock:
+            # Les timestamps doivent rester strictement croissants (recherche dichotomique)
+            if self.last_record and timestamp <= self.last_record[0]:
+                logger.debug(f"Enregistrement ignoré dans {self.directory} (timestamp {timestamp} non croissant)")
+                return False
+
+            record = self.record_struct.pack(*values)
+            path = self._segment_path(timestamp)
+            try:
+                with open(path, 'ab') as f:
+                    # Tronquer un enregistrement partiel (écriture interrompue)
+                    size = f.tell()
+                    if size % self.record_size:
+                        logger.warning(f"Enregistrement partiel tronqué dans {path}")
+                        f.truncate(size - size % self.record_size)
+                    f.write(record)
+            except OSError as e:
+                logger.error(f"Erreur lors de l'écriture de l'historique: {e}")
+                return False
+
+            self.last_record = tuple(values)
+            return True
+
+    def _segment_ranges(self, start, end):
+        """Segments dont la période recoupe [start, end)"""
+        for seg_start, path in self.segments():
+            if seg_start < end and next_period_start(seg_start, self.period) > start:
+                yield path
+
+    def iter_records(self, start, end):
+        """
+        Itérer sur les enregistrements bruts de la plage [start, end)
+
+        Yields:
+            tuple: Valeurs brutes dans l'ordre chronologique
+        """
+        size = self.record_size
+        for path in self._segment_ranges(start, end):
+            if path.endswith(ARCHIVE_SUFFIX):
+                try:
+                    yield from iter_archive(path, self.record_struct, start, end)
+                except FileNotFoundError:
+                    pass  # Archive purgée entre-temps
+                continue
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                # Segment archivé ou purgé entre-temps
+                archive_path = path[:-len(SEGMENT_SUFFIX)] + ARCHIVE_SUFFIX
+                if os.path.exists(archive_path):
+                    yield from iter_archive(archive_path, self.record_struct, start, end)
+                continue
+            with f:
+                count = os.fstat(f.fileno()).st_size // size
+                if count == 0:
+                    continue
+                with mmap.mmap(f.fileno(), count * size, access=mmap.ACCESS_READ) as buf:
+                    first = _lower_bound(buf, count, size, start)
+                    last = _lower_bound(buf, count, size, end)
+                    view = memoryview(buf)
+                    try:
+                        yield from self.record_struct.iter_unpack(view[first * size:last * size])
+                    finally:
+                        view.release()
+
+    def count(self, start, end):
+        """Compter les enregistrements de la plage [start, end) sans les décoder"""
+        total = 0
+        size = self.record_size
+        for path in self._segment_ranges(start, end):
+            if path.endswith(ARCHIVE_SUFFIX):
+                total += archive_count(path, self.record_struct, start, end)
+                continue
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                count = os.fstat(f.fileno()).st_size // size
+                if count == 0:
+                    continue
+                with mmap.mmap(f.fileno(), count * size, access=mmap.ACCESS_READ) as buf:
+                    total += _lower_bound(buf, count, size, end) - _lower_bound(buf, count, size, start)
+        return total
+
+    def purge_before(self, cutoff):
+        """
+        Supprimer les segments entièrement antérieurs à cutoff
+
+        Returns:
+            int: Nombre de segments supprimés
+        """
+        removed = 0
+        with self.lock:
+            for seg_start, path in self.segments():
+                if next_period_start(seg_start, self.period) > cutoff:
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.error(f"Erreur lors de la suppression de {path}: {e}")
+        if removed:
+            logger.info(f"Rétention: {removed} segment(s) supprimé(s) dans {self.directory}")
+        return removed
+
+    def archive_before(self, cutoff):
+        """
+        Convertir en archives compressées les segments dont la période se termine avant cutoff
+
+        Returns:
+            int: Nombre de segments archivés
+        """
+        archived = 0
+        before = after = 0
+        with self.lock:
+            for seg_start, path in self.segments():
+                if next_period_start(seg_start, self.period) > cutoff:
+                    break
+                if not path.endswith(SEGMENT_SUFFIX):
+                    continue
+                try:
+                    segment_size, archive_size = write_archive(path, self.record_struct)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Erreur lors de l'archivage de {path}: {e}")
+                    continue
+                archived += 1
+                before += segment_size
+                after += archive_size
+        if archived:
+            logger.info(f"Archivage: {archived} segment(s) dans {self.directory}, {before} → {after} octets")
+        return archived
+
+    def size_bytes(self):
+        """Taille totale des segments sur disque"""
+        return sum(os.path.getsize(path) for _, path in self.segments())
+
+
+class RollupTier:
+    """Niveau d'agrégation maintenu incrémentalement à l'ingestion"""
+
+    def __init__(self, name, directory, width, period, retention_days):
+        self.name = name
+        self.width = width
+        self.retention_days = retention_days  # 0 = conservation illimitée
+        self.series = SegmentSeries(os.path.join(directory, name), ROLLUP_STRUCT, period)
+        self.open_bucket = None  # Seau en cours (liste de valeurs brutes)
+        # Les échantillons antérieurs au dernier seau scellé sont déjà agrégés
+        last = self.series.last_record
+        self.resume_from = self.bucket_end(last[0]) if last else 0
+
+    def bucket_start(self, timestamp):
+        """Début du seau contenant timestamp (les jours suivent l'heure locale)"""
+        if self.width == 86400:
+            return period_start(timestamp, PERIOD_DAY)
+        return timestamp - timestamp % self.width
+
+    def bucket_end(self, start):
+        """Fin (exclue) du seau commençant à start"""
+        if self.width == 86400:
+            return next_period_start(start, PERIOD_DAY)
+        return start + self.width
+
+    def covers(self, start, now):
+        """Vérifier si la rétention de ce niveau couvre encore start"""
+        return self.retention_days == 0 or start >= now - self.retention_days * 86400
+
+    def add(self, timestamp, pqt_delta, pqt, temperature):
+        """
+        Agréger un échantillon (valeurs brutes, température en 0.1°C)
+
+        Returns:
+            bool: True si un seau a été scellé et écrit sur disque
+        """
+        if timestamp < self.resume_from:
+            return False
+
+        start = self.bucket_start(timestamp)
+        bucket = self.open_bucket
+        sealed = False
+        if bucket is not None and bucket[0] != start:
+            self.series.append(tuple(bucket))
+            bucket = None
+            sealed = True
+
+        if bucket is None:
+            self.open_bucket = [start, 1, pqt_delta, pqt_delta, pqt_delta, pqt,
+                                temperature, temperature, temperature, temperature]
+        else:
+            bucket[1] = min(bucket[1] + 1, 0xFFFF)
+            bucket[2] += pqt_delta
+            bucket[3] = min(bucket[3], pqt_delta)
+            bucket[4] = max(bucket[4], pqt_delta)
+            bucket[5] = pqt
+            bucket[6] += temperature
+            bucket[7] = min(bucket[7], temperature)
+            bucket[8] = max(bucket[8], temperature)
+            bucket[9] = temperature
+        return sealed
+
+    def query(self, start, end):
+        """
+        Itérer sur les seaux de la plage [start, end), seau en cours compris
+
+        Yields:
+            Rollup: Agrégats dans l'ordre chronologique
+        """
+        first = self.bucket_start(start)
+        for record in self.series.iter_records(first, end):
+            yield _decode_rollup(record)
+        bucket = self.open_bucket
+        if bucket is not None and first <= bucket[0] < end:
+            yield _decode_rollup(tuple(bucket))
+
+
+class HistoryStore:
+    """Série temporelle des échantillons du poêle et de leurs agrégats"""
+
+    def __init__(self, directory='history', retention_days=None, archive_after_days=HISTORY_ARCHIVE_AFTER_DAYS):
+        self.directory = directory
+        self.retention_days = retention_days or HISTORY_RETENTION_DAYS
+        self.archive_after_days = archive_after_days  # 0 = pas d'archivage
+        self.raw = SegmentSeries(directory, RECORD_STRUCT, PERIOD_DAY)
+        self.tiers = [
+            RollupTier(name, directory, width, period, self.retention_days[name])
+            for name, width, period in ROLLUP_TIERS
+        ]
+        self.ingest_lock = threading.Lock()  # Sérialise échantillons bruts et agrégats
+        self.last_pqt = None
+        self._rebuild_open_buckets()
+        self.apply_retention()
+        logger.info(f"Historique chargé depuis {self.directory} ({len(self.segments())} segments)")
+
+    @property
+    def last_sample(self):
+        """Dernier échantillon enregistré"""
+        record = self.raw.last_record
+        return _decode_sample(record) if record else None
+
+    def segments(self):
+        """Lister les segments d'échantillons bruts"""
+        return self.raw.segments()
+
+    def _rebuild_open_buckets(self):
+        """Reconstruire les seaux en cours depuis les échantillons bruts (après redémarrage)"""
+        resume_from = min(tier.resume_from for tier in self.tiers)
+        replayed = 0
+        # Un jour de marge pour retrouver le PQT précédant le premier seau ouvert
+        for record in self.raw.iter_records(max(0, resume_from - 86400), 2 ** 32 - 1):
+            self._rollup(record[0], record[1], record[2])
+            replayed += 1
+        if replayed:
+            logger.debug(f"Agrégats reconstruits depuis {replayed} échantillons bruts")
+
+    def _rollup(self, timestamp, pqt, temperature):
+        """Alimenter tous les niveaux d'agrégation (valeurs brutes)"""
+        # Un compteur qui recule (remise à zéro) ne compte pas comme consommation
+        pqt_delta = pqt - self.last_pqt if self.last_pqt is not None and pqt >= self.last_pqt else 0
+        self.last_pqt = pqt
+        sealed = False
+        for tier in self.tiers:
+            if tier.add(timestamp, pqt_delta, pqt, temperature) and tier.name == 'hour':
+                sealed = True
+        return sealed
+
+    def append(self, timestamp, pqt, temperature, setpoint, status):
+        """
+        Ajouter un échantillon et mettre à jour les agrégats
+
+        Args:
+            timestamp: Horodatage (secondes epoch)
+            pqt: Compteur de consommation de pellets (registre 0x2002, brut)
+            temperature: Température ambiante en °C
+            setpoint: Température de consigne en °C
+            status: Code de statut du poêle
+
+        Returns:
+            bool: True si l'échantillon a été ajouté, False s'il est ignoré
+        """
+        values = (
+            int(timestamp),
+            int(pqt) & 0xFFFF,
+            int(round(temperature * 10)),
+            int(round(setpoint * 10)),
+            int(status) & 0xFF
+        )
+        with self.ingest_lock:
+            if not self.raw.append(values):
+                return False
+            hour_sealed = self._rollup(values[0], values[1], values[2])
+
+        # Rétention et archivage appliqués au plus une fois par heure
+        if hour_sealed:
+            self.apply_retention()
+        return True
+
+    def record_snapshot(self, state):
+        """
+        Enregistrer un instantané d'état publié par le contrôleur
+
+        Args:
+            state: État du poêle (doit contenir pellet_consumption et status_code)
+
+        Returns:
+            bool: True si un échantillon a été ajouté
+        """
+        if not state.get('connected') or not state.get('synchronized') or state.get('link_down'):
+            return False
+        pqt = state.get('pellet_consumption')
+        if pqt is None or state.get('status_code') is None:
+            return False
+        return self.append(
+            state.get('timestamp') or time.time(),
+            pqt,
+            state['temperature'],
+            state['setpoint'],
+            state['status_code']
+        )
+
+    def apply_retention(self, now=None):
+        """Supprimer les segments sortis de la rétention de chaque niveau, archiver les segments bruts anciens"""
+        now = now or time.time()
+        raw_days = self.retention_days['raw']
+        if raw_days:
+            self.raw.purge_before(now - raw_days * 86400)
+        for tier in self.tiers:
+            if tier.retention_days:
+                tier.series.purge_before(now - tier.retention_days * 86400)
+        if self.archive_after_days:
+            self.raw.archive_before(period_start(now - self.archive_after_days * 86400))
+
+    def query(self, start, end):
+        """
+        Itérer sur les échantillons bruts de la plage [start, end)
+
+        Args:
+            start: Timestamp de début (inclus)
+            end: Timestamp de fin (exclu)
+
+        Yields:
+            Sample: Échantillons dans l'ordre chronologique
+        """
+        for record in self.raw.iter_records(start, end):
+            yield _decode_sample(record)
+
+    def count(self, start, end):
+        """Compter les échantillons bruts de la plage [start, end)"""
+        return self.raw.count(start, end)
+
+    def select_tier(self, start, step):
+        """
+        Choisir le niveau le plus grossier dont la résolution satisfait le pas demandé
+
+        Un niveau dont la rétention ne couvre plus start est écarté: ses seaux
+        anciens sont purgés et la plage reviendrait vide.
+
+        Returns:
+            RollupTier ou None pour les échantillons bruts
+        """
+        now = time.time()
+        candidates = [tier for tier in self.tiers if tier.width <= step]
+        for tier in reversed(candidates):
+            if tier.covers(start, now):
+                return tier
+        raw_days = self.retention_days['raw']
+        if raw_days == 0 or start >= now - raw_days * 86400:
+            return None
+        # Échantillons bruts purgés: niveau plus grossier encore conservé pour start
+        for tier in self.tiers:
+            if tier.width > step and tier.covers(start, now):
+                return tier
+        return None
+
+    def _raw_rollups(self, start, end):
+        """Convertir les échantillons bruts en agrégats d'un échantillon"""
+        last_pqt = None
+        for timestamp, pqt, temperature, _, _ in self.raw.iter_records(start, end):
+            delta = pqt - last_pqt if last_pqt is not None and pqt >= last_pqt else 0
+            last_pqt = pqt
+            yield _decode_rollup((timestamp, 1, delta, delta, delta, pqt,
+                                  temperature, temperature, temperature, temperature))
+
+    def query_rollups(self, start, end, step):
+        """
+        Itérer sur les agrégats de la plage [start, end) regroupés par pas de step secondes
+
+        Args:
+            start: Timestamp de début (inclus), aussi origine des pas
+            end: Timestamp de fin (exclu)
+            step: Pas d'agrégation en secondes
+
+        Yields:
+            Rollup: Un agrégat par pas non vide
+        """
+        tier = self.select_tier(start, step)
+        source = tier.query(start, end) if tier else self._raw_rollups(start, end)
+        same_width = tier is not None and tier.width == step
+
+        current = None
+        for bucket in source:
+            key = bucket.start if same_width else start + max(0, bucket.start - start) // step * step
+            if current is not None and current.start == key:
+                current = merge_rollups(current, bucket)
+            else:
+                if current is not None:
+                    yield current
+                current = bucket._replace(start=key)
+        if current is not None:
+            yield current
+
+    def query_columns(self, metric, start, end, step):
+        """
+        Agréger une métrique par pas de step secondes, en colonnes parallèles
+
+        Args:
+            metric: METRIC_PQT (consommation par pas et compteur) ou
+                METRIC_TEMPERATURE (moyenne, minimum et maximum par pas)
+            start: Timestamp de début (inclus)
+            end: Timestamp de fin (exclu)
+            step: Pas d'agrégation en secondes
+
+        Returns:
+            dict: Tableaux de même longueur, 't' contenant le début de chaque pas
+        """
+        if metric not in HISTORY_METRICS:
+            raise ValueError(f"Métrique inconnue: {metric}")
+
+        t = []
+        if metric == METRIC_PQT:
+            consumption, counter = [], []
+            for bucket in self.query_rollups(start, end, step):
+                t.append(bucket.start)
+                consumption.append(bucket.pqt_sum)
+                counter.append(bucket.pqt_last)
+            return {'t': t, 'consumption': consumption, 'counter': counter}
+
+        average, minimum, maximum = [], [], []
+        for bucket in self.query_rollups(start, end, step):
+            t.append(bucket.start)
+            average.append(round(bucket.temperature_sum / bucket.count, 1))
+            minimum.append(bucket.temperature_min)
+            maximum.append(bucket.temperature_max)
+        return {'t': t, 'avg': average, 'min': minimum, 'max': maximum}
+
+    def query_downsampled(self, metric, start, end, max_points):
+        """
+        Réduire les échantillons bruts d'une métrique à max_points points (LTTB)
+
+        Args:
+            metric: METRIC_PQT (compteur) ou METRIC_TEMPERATURE
+            start: Timestamp de début (inclus)
+            end: Timestamp de fin (exclu)
+            max_points: Nombre maximal de points renvoyés
+
+        Returns:
+            dict: Colonnes 't' et 'counter' ou 'temperature' de même longueur
+        """
+        if metric not in HISTORY_METRICS:
+            raise ValueError(f"Métrique inconnue: {metric}")
+
+        name = 'counter' if metric == METRIC_PQT else 'temperature'
+        field = 1 if metric == METRIC_PQT else 2
+        points = ((sample[0], sample[field]) for sample in self.query(start, end))
+        t, values = [], []
+        for x, y in lttb(points, self.count(start, end), max_points):
+            t.append(x)
+            values.append(y)
+        return {'t': t, name: values}
+
+    def get_status(self):
+        """Obtenir un résumé de l'historique"""
+        last_sample = self.last_sample
+        return {
+            'directory': self.directory,
+            'segments': len(self.segments()),
+            'archived_segments': sum(1 for _, path in self.segments() if path.endswith(ARCHIVE_SUFFIX)),
+            'size_bytes': self.raw.size_bytes(),
+            'last_sample': last_sample._asdict() if last_sample else None,
+            'tiers': {
+                tier.name: {
+                    'segments': len(tier.series.segments()),
+                    'size_bytes': tier.series.size_bytes(),
+                    'retention_days': tier.retention_days
+                }
+                for tier in self.tiers
+            }
+        }
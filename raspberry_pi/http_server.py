@@ -0,0 +1,211 @@
+"""
+Serveur HTTP de production: pool de threads borné, keep-alive et arrêt propre
+
+Le serveur de développement de Flask crée un thread par connexion, sans limite
+ni arrêt ordonné. Ici un nombre fixe de threads (HTTP_WORKERS) sert les
+connexions acceptées, mises en attente dans une file bornée (HTTP_BACKLOG):
+quand tout est occupé, l'acceptation se suspend et le noyau garde les
+connexions suivantes. Les connexions HTTP/1.1 restent ouvertes entre deux
+requêtes jusqu'à HTTP_KEEPALIVE_TIMEOUT. À l'arrêt, le serveur cesse
+d'accepter, ferme les connexions inactives et laisse les requêtes en cours se
+terminer pendant HTTP_SHUTDOWN_TIMEOUT au plus.
+
+Une connexion WebSocket occupe un thread du pool pendant toute sa durée: leur
+nombre est limité à REALTIME_MAX_CLIENTS (au plus HTTP_WORKERS - 1), et leur
+socket n'a pas de délai keep-alive (les pings WebSocket la surveillent).
+"""
+import queue
+import socket
+import threading
+import time
+import logging
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from config import HTTP_WORKERS, HTTP_BACKLOG, HTTP_KEEPALIVE_TIMEOUT, HTTP_SHUTDOWN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """Gestionnaire HTTP/1.1 avec délai d'inactivité et fermeture pendant l'arrêt"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = HTTP_KEEPALIVE_TIMEOUT  # Délai d'attente de la requête suivante sur la connexion
+
+    def setup(self):
+        super().setup()
+        self.busy = False
+        self.server.track_connection(self)
+
+    def finish(self):
+        self.server.untrack_connection(self)
+        super().finish()
+
+    def parse_request(self):
+        # Appelé une fois la ligne de requête reçue: la connexion n'est plus inactive
+        self.busy = True
+        return super().parse_request()
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        finally:
+            self.busy = False
+            if self.server.draining:
+                self.close_connection = True
+
+    def log_request(self, code='-', size='-'):
+        # Les accès réussis sont journalisés en debug pour ne pas noyer le journal
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+        else:
+            logger.debug(f'{self.address_string()} "{self.requestline}" {code}')
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Serveur WSGI dont les connexions sont servies par un pool de threads fixe"""
+
+    def __init__(self, host, port, app, workers=HTTP_WORKERS, backlog=HTTP_BACKLOG):
+        super().__init__(host, port, app, handler=KeepAliveRequestHandler)
+        self.workers = workers
+        self.pending = queue.Queue(maxsize=backlog)  # Connexions acceptées en attente d'un thread
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+        self.draining = False
+        self.served = 0
+        self.worker_threads = [
+            threading.Thread(target=self._worker_loop, name=f"http-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.worker_threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        # Bloque si la file est pleine: le noyau garde les connexions suivantes
+        self.pending.put((request, client_address))
+
+    def _worker_loop(self):
+        """Servir les connexions en attente"""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.served += 1
+
+    def track_connection(self, handler):
+        with self.connections_lock:
+            self.connections.add(handler)
+
+    def untrack_connection(self, handler):
+        with self.connections_lock:
+            self.connections.discard(handler)
+
+    def _close_idle_connections(self):
+        """Débloquer les connexions keep-alive en attente d'une requête"""
+        with self.connections_lock:
+            idle = [handler for handler in self.connections if not handler.busy]
+        for handler in idle:
+            try:
+                handler.connection.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+
+    def drain(self, timeout=HTTP_SHUTDOWN_TIMEOUT):
+        """
+        Terminer les requêtes en cours puis arrêter les threads
+
+        Args:
+            timeout: Délai maximal d'attente des requêtes en cours (s)
+
+        Returns:
+            int: Nombre de connexions encore ouvertes à l'expiration du délai
+        """
+        self.draining = True
+        self.server_close()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self._close_idle_connections()
+            if not self.connections and self.pending.empty():
+                break
+            time.sleep(0.05)
+
+        for _ in self.worker_threads:
+            try:
+                self.pending.put_nowait(None)
+            except queue.Full:
+                break
+        with self.connections_lock:
+            return len(self.connections)
+
+    def get_status(self):
+        """Obtenir l'état du serveur"""
+        with self.connections_lock:
+            connections = len(self.connections)
+            busy = sum(1 for handler in self.connections if handler.busy)
+        return {
+            'workers': self.workers,
+            'connections': connections,
+            'busy': busy,
+            'pending': self.pending.qsize(),
+            'served': self.served,
+            'draining': self.draining
+        }
+
+
+class HttpServer:
+    """Cycle de vie du serveur HTTP de production"""
+
+    def __init__(self):
+        self.server = None
+        self.stopping = False
+
+    def serve(self, app, host, port):
+        """
+        Servir l'application jusqu'à l'appel de stop(), puis drainer les requêtes
+
+        Args:
+            app: Application WSGI
+            host: Adresse d'écoute
+            port: Port d'écoute
+        """
+        self.server = PooledWSGIServer(host, port, app)
+        logger.info(f"Serveur HTTP sur {host}:{port} ({self.server.workers} threads, keep-alive {HTTP_KEEPALIVE_TIMEOUT}s)")
+        try:
+            self.server.serve_forever()
+        finally:
+            remaining = self.server.drain()
+            if remaining:
+                logger.warning(f"Arrêt du serveur HTTP: {remaining} connexion(s) interrompue(s)")
+            else:
+                logger.info("Serveur HTTP arrêté, requêtes en cours terminées")
+
+    def stop(self):
+        """
+        Demander l'arrêt (utilisable depuis un gestionnaire de signal)
+
+        serve_forever() tourne dans le thread principal: shutdown() est appelé
+        depuis un autre thread pour ne pas bloquer le gestionnaire.
+        """
+        if self.server is None or self.stopping:
+            return False
+        self.stopping = True
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return True
+
+    def get_status(self):
+        """Obtenir l'état du serveur (None si non démarré)"""
+        return self.server.get_status() if self.server else None
+
+
+# Instance globale du serveur
+http_server = HttpServer()
+
+def stop_http_server():
+    """Demander l'arrêt du serveur HTTP"""
+    return http_server.stop()
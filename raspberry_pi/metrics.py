@@ -0,0 +1,220 @@
+"""
+Métriques de fonctionnement (bus série, caches, requêtes HTTP)
+
+Les métriques sont déclarées une fois au niveau du module qui les alimente et
+enregistrées dans le registre global. get_status() renvoie leurs valeurs pour
+les APIs de diagnostic, render() les expose au format texte de Prometheus
+(GET /metrics). Tout est calculé en mémoire: lire les métriques ne provoque
+aucune transaction sur le bus.
+"""
+import math
+import threading
+
+# Bornes des histogrammes de durée (secondes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    """Échapper une valeur d'étiquette pour le format texte"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    """Étiquettes au format {nom="valeur",...} (chaîne vide sans étiquette)"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    """Nombre au format texte (entiers sans décimale, infini en +Inf)"""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base des métriques: nom, description et étiquettes déclarées"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}  # Valeurs des étiquettes (tuple) → valeur
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        """Copie des valeurs: valeurs des étiquettes → valeur"""
+        with self.lock:
+            return dict(self.values)
+
+    def status(self):
+        """Valeurs sérialisables (pour get_status)"""
+        samples = self.samples()
+        if not self.labels:
+            return samples.get((), 0)
+        return {','.join(key): value for key, value in samples.items()}
+
+    def render(self):
+        """Lignes au format texte de Prometheus"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Compteur monotone, éventuellement décliné par étiquettes"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Incrémenter le compteur
+
+        Args:
+            amount: Valeur à ajouter (positive)
+            **labels: Valeur de chaque étiquette déclarée
+        """
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Total pour une combinaison d'étiquettes"""
+        key = self._key(labels)
+        with self.lock:
+            return self.values.get(key, 0)
+
+
+class Gauge(Metric):
+    """Jauge calculée à la lecture par une fonction (profondeur de file...)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), collect=None):
+        super().__init__(name, description, labels)
+        self.collect = collect  # Fonction renvoyant {valeurs des étiquettes (tuple): valeur}
+
+    def samples(self):
+        if self.collect is None:
+            return {}
+        try:
+            return dict(self.collect())
+        except Exception:
+            return {}
+
+
+class Histogram(Metric):
+    """Histogramme de durées: comptes cumulés par borne, somme et nombre d'observations"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """
+        Enregistrer une observation
+
+        Args:
+            value: Valeur observée (secondes)
+            **labels: Valeur de chaque étiquette déclarée
+        """
+        key = self._key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self.lock:
+            return {key: {'counts': list(series['counts']), 'sum': series['sum'], 'count': series['count']}
+                    for key, series in self.values.items()}
+
+    def status(self):
+        summaries = {
+            ','.join(key): {'count': series['count'], 'sum': round(series['sum'], 6)}
+            for key, series in self.samples().items()
+        }
+        if not self.labels:
+            return summaries.get('', {'count': 0, 'sum': 0.0})
+        return summaries
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registre des métriques"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, *args, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, description, labels=()):
+        """Déclarer un compteur (ou retrouver celui déjà déclaré sous ce nom)"""
+        return self._register(Counter, name, description, labels)
+
+    def gauge(self, name, description, labels=(), collect=None):
+        """Déclarer une jauge calculée par collect() à chaque lecture"""
+        return self._register(Gauge, name, description, labels, collect)
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        """Déclarer un histogramme"""
+        return self._register(Histogram, name, description, labels, buckets)
+
+    def get_status(self):
+        """Obtenir les valeurs de toutes les métriques"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.status() for metric in metrics}
+
+    def render(self):
+        """
+        Exposer toutes les métriques au format texte de Prometheus (version 0.0.4)
+
+        Returns:
+            str: Corps de la réponse GET /metrics
+        """
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Registre global
+metrics = MetricsRegistry()
@@ -0,0 +1,329 @@
+"""
+Pont MQTT: état du poêle en topics retenus et commandes domotiques
+
+Abonné aux instantanés du contrôleur, le pont publie uniquement les champs
+modifiés, chacun sur son topic retenu:
+    <prefix>/state/<champ>                valeur (texte brut ou JSON)
+    <prefix>/availability                 online / offline (dernière volonté)
+Un nouvel abonné reçoit aussitôt la dernière valeur de chaque champ depuis le
+broker: suivre le poêle n'ajoute ni lecture sur le bus ni requête HTTP.
+
+Commandes (mêmes commandes que le canal WebSocket, voir realtime.COMMANDS):
+    <prefix>/command/<commande>           paramètres JSON, ou valeur simple
+    <prefix>/command/<commande>/result    résultat JSON (non retenu)
+Elles passent par la file du bus et le budget de commandes du limiteur.
+
+La découverte Home Assistant (<discovery_prefix>/<composant>/<client_id>/...)
+déclare capteurs, consigne, timer et bouton de rafraîchissement.
+
+paho-mqtt est optionnel: sans le paquet, le pont reste désactivé.
+"""
+import json
+import threading
+import logging
+from bus_scheduler import bus_scheduler
+from rate_limiter import rate_limiter, CLASS_COMMAND
+from realtime import COMMANDS
+from config import (
+    MQTT_HOST,
+    MQTT_PORT,
+    MQTT_USERNAME,
+    MQTT_PASSWORD,
+    MQTT_CLIENT_ID,
+    MQTT_TOPIC_PREFIX,
+    MQTT_DISCOVERY,
+    MQTT_DISCOVERY_PREFIX,
+    MQTT_KEEPALIVE,
+    MIN_TEMPERATURE,
+    MAX_TEMPERATURE,
+)
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+logger = logging.getLogger(__name__)
+
+# Identifiant des commandes MQTT auprès du limiteur de débit
+MQTT_CLIENT = 'mqtt'
+
+# Paramètre des commandes acceptant une valeur simple au lieu d'un objet JSON
+SCALAR_PARAMS = {
+    'set_temperature': 'temperature',
+    'set_chrono_status': 'enabled',
+}
+
+
+def encode_value(value):
+    """Valeur d'un champ en charge utile: texte brut pour les chaînes, JSON sinon"""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def parse_command(name, payload):
+    """
+    Paramètres d'une commande à partir de sa charge utile
+
+    Args:
+        name: Nom de la commande
+        payload: Charge utile (texte)
+
+    Returns:
+        dict: Paramètres de la commande
+
+    Raises:
+        ValueError: Si la charge utile ne correspond pas à la commande
+    """
+    payload = payload.strip()
+    try:
+        value = json.loads(payload) if payload else None
+    except ValueError:
+        value = payload  # Valeur simple non JSON (ON, OFF, PRESS...)
+    if isinstance(value, dict):
+        return value
+
+    param = SCALAR_PARAMS.get(name)
+    if param is None:
+        if name == 'refresh':
+            return {}
+        raise ValueError(f"Paramètres JSON attendus pour {name}")
+    if param == 'enabled' and isinstance(value, str):
+        if value.lower() not in ('on', 'off', 'true', 'false', '1', '0'):
+            raise ValueError(f"Valeur invalide pour {name}: {value}")
+        value = value.lower() in ('on', 'true', '1')
+    return {param: value}
+
+
+class MqttBridge:
+    """Publication des champs modifiés et réception des commandes MQTT"""
+
+    def __init__(self):
+        self.controller = None
+        self.client = None
+        self.connected = False
+        self.lock = threading.Lock()  # Protège published
+        self.published = {}  # Champ → dernière charge utile publiée
+        self.messages_published = 0
+        self.commands_received = 0
+        self.prefix = MQTT_TOPIC_PREFIX.rstrip('/')
+        self.availability_topic = f"{self.prefix}/availability"
+
+    def initialize(self, controller):
+        """Initialiser le pont avec le contrôleur"""
+        self.controller = controller
+
+    def start(self):
+        """
+        Se connecter au broker (en arrière-plan, avec reconnexion automatique)
+
+        Returns:
+            bool: False si paho-mqtt n'est pas installé
+        """
+        if mqtt is None:
+            logger.warning("Pont MQTT activé mais paho-mqtt n'est pas installé - pont désactivé")
+            return False
+        if self.client is not None:
+            return True
+
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=MQTT_CLIENT_ID)
+        else:
+            self.client = mqtt.Client(client_id=MQTT_CLIENT_ID)
+        if MQTT_USERNAME:
+            self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD or None)
+        self.client.will_set(self.availability_topic, 'offline', qos=1, retain=True)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.message_callback_add(f"{self.prefix}/command/+", self._on_command)
+
+        self.client.connect_async(MQTT_HOST, MQTT_PORT, MQTT_KEEPALIVE)
+        self.client.loop_start()
+        logger.info(f"Pont MQTT démarré ({MQTT_HOST}:{MQTT_PORT}, topics {self.prefix}/...)")
+        return True
+
+    def stop(self):
+        """Publier la disponibilité hors ligne et se déconnecter"""
+        if self.client is None:
+            return
+        try:
+            if self.connected:
+                self.client.publish(self.availability_topic, 'offline', qos=1, retain=True).wait_for_publish(2)
+            self.client.disconnect()
+        except Exception as e:
+            logger.debug(f"Arrêt du pont MQTT: {e}")
+        self.client.loop_stop()
+        self.client = None
+        self.connected = False
+        logger.info("Pont MQTT arrêté")
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        """Connexion (ou reconnexion) au broker: disponibilité, découverte, abonnements, état complet"""
+        if reason_code != 0:
+            logger.error(f"Connexion au broker MQTT refusée: {reason_code}")
+            return
+        self.connected = True
+        logger.info("Connecté au broker MQTT")
+        client.publish(self.availability_topic, 'online', qos=1, retain=True)
+        if MQTT_DISCOVERY:
+            self._publish_discovery()
+        client.subscribe(f"{self.prefix}/command/+", qos=1)
+
+        # Republier tous les champs: le broker a pu perdre ses messages retenus
+        with self.lock:
+            self.published = {}
+        if self.controller is not None:
+            self.publish(self.controller.state.copy())
+
+    def _on_disconnect(self, client, userdata, *args):
+        """Perte de la connexion au broker (paho se reconnecte seul)"""
+        self.connected = False
+        logger.warning("Déconnecté du broker MQTT - reconnexion automatique")
+
+    def publish(self, state):
+        """
+        Publier les champs modifiés d'un instantané (abonné du contrôleur)
+
+        Args:
+            state: Copie de l'état publiée par le contrôleur
+        """
+        if self.client is None or not self.connected:
+            return
+        with self.lock:
+            changes = {}
+            for field, value in state.items():
+                payload = encode_value(value)
+                if self.published.get(field) != payload:
+                    changes[field] = payload
+            self.published.update(changes)
+
+        for field, payload in changes.items():
+            self.client.publish(f"{self.prefix}/state/{field}", payload, qos=1, retain=True)
+        self.messages_published += len(changes)
+        if changes:
+            logger.debug(f"MQTT: {len(changes)} champ(s) publié(s)")
+
+    def _on_command(self, client, userdata, message):
+        """Commande reçue sur <prefix>/command/<commande>"""
+        name = message.topic.rsplit('/', 1)[-1]
+        self.commands_received += 1
+        result_topic = f"{message.topic}/result"
+
+        def _reply(success, error=None, **extra):
+            payload = {'command': name, 'success': success, 'error': error, **extra}
+            client.publish(result_topic, json.dumps(payload), qos=1)
+
+        if name not in COMMANDS:
+            _reply(False, f'Commande inconnue: {name}')
+            return
+        try:
+            params = parse_command(name, message.payload.decode('utf-8', errors='replace'))
+        except ValueError as e:
+            _reply(False, str(e))
+            return
+        if self.controller is None or not self.controller.is_connected():
+            _reply(False, 'Poêle non connecté')
+            return
+
+        # Même budget que les APIs HTTP et le canal WebSocket
+        if name == 'refresh':
+            admitted = rate_limiter.allow_forced_refresh(MQTT_CLIENT)
+        else:
+            admitted = rate_limiter.allow(MQTT_CLIENT, CLASS_COMMAND)
+        if not admitted:
+            _reply(False, 'Trop de requêtes')
+            return
+
+        func, priority = COMMANDS[name]
+        logger.info(f"Commande MQTT {name} reçue: {params}")
+
+        def _command():
+            return func(self.controller, params)
+
+        def _on_done(job):
+            success = bool(job.result) and job.error is None
+            _reply(success, str(job.error) if job.error else None, duration=round(job.finished - job.started, 3))
+            # Les abonnés voient l'effet de la commande sans attendre la surveillance
+            if success:
+                self.publish(self.controller.state.copy())
+
+        bus_scheduler.submit(f"mqtt_{name}", _command, priority, callback=_on_done)
+
+    def _device(self):
+        """Appareil Home Assistant commun à toutes les entités"""
+        return {
+            'identifiers': [MQTT_CLIENT_ID],
+            'name': 'Poêle Palazzetti',
+            'manufacturer': 'Palazzetti',
+        }
+
+    def _discovery_entities(self):
+        """Entités Home Assistant: (composant, identifiant, configuration propre)"""
+        state = f"{self.prefix}/state"
+        command = f"{self.prefix}/command"
+        return [
+            ('sensor', 'temperature', {
+                'name': 'Température', 'state_topic': f"{state}/temperature",
+                'device_class': 'temperature', 'unit_of_measurement': '°C', 'state_class': 'measurement'}),
+            ('number', 'setpoint', {
+                'name': 'Consigne', 'state_topic': f"{state}/setpoint",
+                'command_topic': f"{command}/set_temperature",
+                'min': MIN_TEMPERATURE, 'max': MAX_TEMPERATURE, 'step': 0.5,
+                'device_class': 'temperature', 'unit_of_measurement': '°C'}),
+            ('sensor', 'status', {
+                'name': 'Statut', 'state_topic': f"{state}/status"}),
+            ('sensor', 'error_code', {
+                'name': "Code d'erreur", 'state_topic': f"{state}/error_code"}),
+            ('sensor', 'error_message', {
+                'name': "Message d'erreur", 'state_topic': f"{state}/error_message"}),
+            ('sensor', 'pellet_consumption', {
+                'name': 'Consommation de pellets', 'state_topic': f"{state}/pellet_consumption",
+                'unit_of_measurement': 'kg', 'state_class': 'total_increasing'}),
+            ('binary_sensor', 'connected', {
+                'name': 'Liaison série', 'state_topic': f"{state}/connected",
+                'device_class': 'connectivity', 'payload_on': 'true', 'payload_off': 'false'}),
+            ('switch', 'timer_enabled', {
+                'name': 'Timer', 'state_topic': f"{state}/timer_enabled",
+                'command_topic': f"{command}/set_chrono_status",
+                'payload_on': 'true', 'payload_off': 'false', 'state_on': 'true', 'state_off': 'false'}),
+            ('button', 'refresh', {
+                'name': 'Rafraîchir', 'command_topic': f"{command}/refresh"}),
+        ]
+
+    def _publish_discovery(self):
+        """Publier (retenues) les configurations de découverte Home Assistant"""
+        device = self._device()
+        for component, object_id, config in self._discovery_entities():
+            payload = dict(config)
+            payload['unique_id'] = f"{MQTT_CLIENT_ID}_{object_id}"
+            payload['availability_topic'] = self.availability_topic
+            payload['device'] = device
+            topic = f"{MQTT_DISCOVERY_PREFIX}/{component}/{MQTT_CLIENT_ID}/{object_id}/config"
+            self.client.publish(topic, json.dumps(payload), qos=1, retain=True)
+        logger.debug("Découverte Home Assistant publiée")
+
+    def get_status(self):
+        """Obtenir l'état du pont"""
+        return {
+            'enabled': self.client is not None,
+            'connected': self.connected,
+            'fields': len(self.published),
+            'messages_published': self.messages_published,
+            'commands_received': self.commands_received
+        }
+
+
+# Instance globale du pont MQTT
+mqtt_bridge = MqttBridge()
+
+def start_mqtt_bridge(controller):
+    """Démarrer le pont MQTT"""
+    mqtt_bridge.initialize(controller)
+    if mqtt_bridge.start():
+        controller.add_state_listener(mqtt_bridge.publish)
+
+def stop_mqtt_bridge():
+    """Arrêter le pont MQTT"""
+    mqtt_bridge.stop()
@@ -0,0 +1,398 @@
+"""
+File d'envoi persistante des notifications email
+
+Les alertes ne sont plus envoyées par le thread qui les détecte: elles sont
+écrites dans un fichier JSON (NOTIFICATION_OUTBOX_FILE) puis envoyées par un
+thread dédié. Un serveur SMTP lent ou indisponible ne bloque donc plus la
+surveillance, et les messages non remis survivent à un redémarrage.
+
+Le thread d'envoi garde une session SMTP ouverte (STARTTLS et authentification
+une seule fois) tant que des messages arrivent, et la ferme après
+SMTP_IDLE_TIMEOUT secondes d'inactivité. Chaque message part en une seule
+transaction vers tous ses destinataires. En cas d'échec temporaire, le message
+est réessayé avec un backoff exponentiel (NOTIFICATION_RETRY_BASE_DELAY à
+NOTIFICATION_RETRY_MAX_DELAY), au plus NOTIFICATION_MAX_ATTEMPTS fois. Les
+refus définitifs (codes 5xx) ne sont pas réessayés.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import smtplib
+import threading
+import logging
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.utils import formatdate, make_msgid
+from metrics import metrics
+from config import (
+    SMTP_CONFIG,
+    SMTP_TIMEOUT,
+    SMTP_IDLE_TIMEOUT,
+    NOTIFICATION_OUTBOX_FILE,
+    NOTIFICATION_RETRY_BASE_DELAY,
+    NOTIFICATION_RETRY_MAX_DELAY,
+    NOTIFICATION_MAX_ATTEMPTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Messages abandonnés gardés dans le fichier pour diagnostic
+MAX_FAILED_KEPT = 20
+
+# Inactivité au-delà de laquelle une session réutilisée est vérifiée (NOOP) avant l'envoi (s)
+SESSION_CHECK_AFTER = 1.0
+
+NOTIFICATIONS = metrics.counter(
+    'palazzetti_notifications_total', "Emails envoyés, réessayés ou abandonnés", ('result',))
+SMTP_SESSIONS = metrics.counter(
+    'palazzetti_smtp_sessions_total', "Sessions SMTP ouvertes (connexion, STARTTLS, authentification)")
+
+
+def _is_permanent(error):
+    """Indiquer si un échec d'envoi est définitif (inutile de réessayer)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False  # Identifiants corrigés puis redémarrage: les messages en attente partiront
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def build_mime(message):
+    """
+    Construire l'email d'un message de la file
+
+    Args:
+        message: Message de la file (dict)
+
+    Returns:
+        str: Email au format MIME
+    """
+    msg = MIMEMultipart('alternative')
+    msg['From'] = message['from']
+    msg['To'] = ', '.join(message['to'])
+    msg['Subject'] = message['subject']
+    # Date et identifiant fixés à la mise en file: un message réessayé reste le même message
+    msg['Date'] = message['date']
+    msg['Message-ID'] = message['message_id']
+    msg.attach(MIMEText(message['body'], 'plain', 'utf-8'))
+    if message.get('html_body'):
+        msg.attach(MIMEText(message['html_body'], 'html', 'utf-8'))
+    return msg.as_string()
+
+
+class SmtpSession:
+    """Session SMTP réutilisée entre les envois, fermée après inactivité"""
+
+    def __init__(self, smtp_config, timeout=SMTP_TIMEOUT, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.smtp_config = smtp_config
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.smtp = None
+        self.last_used = 0
+        self.opened = 0  # Sessions ouvertes depuis le démarrage
+
+    def _open(self):
+        """Se connecter, chiffrer et s'authentifier"""
+        smtp = smtplib.SMTP(self.smtp_config['smtp_server'], self.smtp_config['smtp_port'], timeout=self.timeout)
+        try:
+            if self.smtp_config['use_tls']:
+                smtp.starttls()
+            if self.smtp_config['username']:
+                smtp.login(self.smtp_config['username'], self.smtp_config['password'])
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.opened += 1
+        SMTP_SESSIONS.inc()
+        logger.debug(f"Session SMTP ouverte ({self.smtp_config['smtp_server']}:{self.smtp_config['smtp_port']})")
+
+    def send(self, sender, recipients, data):
+        """
+        Envoyer un email, en réutilisant la session ouverte si elle répond encore
+
+        Returns:
+            dict: Destinataires refusés (adresse → (code, message)), vide si tous acceptés
+
+        Raises:
+            smtplib.SMTPException, OSError: Si l'envoi échoue
+        """
+        if self.smtp is not None and time.time() - self.last_used > SESSION_CHECK_AFTER:
+            try:
+                if self.smtp.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self.smtp is None:
+            self._open()
+        refused = self.smtp.sendmail(sender, recipients, data)
+        self.last_used = time.time()
+        return refused
+
+    def idle_deadline(self):
+        """Heure de fermeture de la session inactive (None si pas de session)"""
+        return self.last_used + self.idle_timeout if self.smtp is not None else None
+
+    def close_if_idle(self):
+        """Fermer la session si elle n'a pas servi depuis idle_timeout"""
+        deadline = self.idle_deadline()
+        if deadline is not None and time.time() >= deadline:
+            logger.debug("Session SMTP inactive - fermeture")
+            self.close()
+
+    def close(self):
+        """Fermer la session"""
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                self.smtp.close()
+            except OSError:
+                pass
+        self.smtp = None
+
+
+class NotificationOutbox:
+    """File d'envoi persistante et thread d'envoi"""
+
+    def __init__(self, outbox_file=NOTIFICATION_OUTBOX_FILE, smtp_config=SMTP_CONFIG):
+        self.outbox_file = outbox_file
+        self.session = SmtpSession(smtp_config)
+        self.lock = threading.Lock()  # Protège pending, failed et le fichier
+        self.wake_event = threading.Event()
+        self.running = False
+        self.sender_thread = None
+        self.waiters = {}  # Identifiant → Event des appelants qui attendent l'envoi
+        self.results = {}  # Identifiant → True (envoyé) / False (abandonné), pour les appelants en attente
+        self.sent = 0
+        self.last_error = None
+        self.pending, self.failed = self._load()
+        if self.pending:
+            logger.info(f"{len(self.pending)} notification(s) en attente reprise(s) depuis {self.outbox_file}")
+
+    def _load(self):
+        """Charger les messages en attente du fichier"""
+        if not os.path.exists(self.outbox_file):
+            return [], []
+        try:
+            with open(self.outbox_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get('pending', []), data.get('failed', [])
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement de la file des notifications: {e}")
+            return [], []
+
+    def _save(self):
+        """Écrire la file dans un fichier temporaire puis le renommer sur l'original (sous self.lock)"""
+        tmp_file = f"{self.outbox_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'pending': self.pending, 'failed': self.failed}, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.outbox_file)
+        except Exception as e:
+            logger.error(f"Erreur lors de la sauvegarde de la file des notifications: {e}")
+
+    def start(self):
+        """Démarrer le thread d'envoi"""
+        if self.running:
+            return
+        self.running = True
+        self.sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self.sender_thread.start()
+        logger.info("File d'envoi des notifications démarrée")
+
+    def stop(self):
+        """Arrêter le thread d'envoi (les messages en attente restent dans le fichier)"""
+        if not self.running:
+            return
+        self.running = False
+        self.wake_event.set()
+        if self.sender_thread:
+            self.sender_thread.join(timeout=SMTP_TIMEOUT + 5)
+        logger.info(f"File d'envoi des notifications arrêtée ({len(self.pending)} en attente)")
+
+    def send(self, subject, body, html_body, sender, recipients, wait=None):
+        """
+        Mettre un email en file d'envoi
+
+        Args:
+            subject: Sujet
+            body: Texte brut
+            html_body: Version HTML (optionnelle)
+            sender: Adresse de l'expéditeur
+            recipients: Liste des destinataires (un seul envoi pour tous)
+            wait: Attendre l'envoi au plus wait secondes (None pour rendre la main aussitôt)
+
+        Returns:
+            bool: True si le message est en file (ou, avec wait, effectivement envoyé)
+        """
+        now = time.time()
+        message = {
+            'id': uuid.uuid4().hex,
+            'subject': subject,
+            'body': body,
+            'html_body': html_body,
+            'from': sender,
+            'to': list(recipients),
+            'date': formatdate(now, localtime=True),
+            'message_id': make_msgid(domain='palazzetti'),
+            'created': now,
+            'attempts': 0,
+            'next_attempt': now,
+            'last_error': None
+        }
+        event = threading.Event() if wait is not None else None
+        with self.lock:
+            self.pending.append(message)
+            if event:
+                self.waiters[message['id']] = event
+            self._save()
+        logger.info(f"Email mis en file: {subject}")
+
+        if event is None:
+            self.wake_event.set()
+            return True
+        if self.running:
+            self.wake_event.set()
+        else:
+            # Pas de thread d'envoi (scripts): envoi dans l'appelant
+            self._deliver_due()
+            self.session.close()
+        event.wait(wait)
+        with self.lock:
+            self.waiters.pop(message['id'], None)
+            return self.results.pop(message['id'], False)
+
+    def _sender_loop(self):
+        """Envoyer les messages dus, puis dormir jusqu'au prochain essai ou à la fermeture de la session"""
+        while self.running:
+            try:
+                self._deliver_due()
+                self.session.close_if_idle()
+            except Exception as e:
+                logger.error(f"Erreur dans la boucle d'envoi des notifications: {e}")
+
+            with self.lock:
+                wakeups = [message['next_attempt'] for message in self.pending]
+            idle_deadline = self.session.idle_deadline()
+            if idle_deadline is not None:
+                wakeups.append(idle_deadline)
+            timeout = max(0.1, min(wakeups) - time.time()) if wakeups else None
+            self.wake_event.wait(timeout)
+            self.wake_event.clear()
+        self.session.close()
+
+    def _deliver_due(self):
+        """Envoyer, sur une même session, tous les messages dont l'heure d'essai est passée"""
+        now = time.time()
+        with self.lock:
+            due = [message for message in self.pending if message['next_attempt'] <= now]
+
+        for index, message in enumerate(due):
+            try:
+                refused = self.session.send(message['from'], message['to'], build_mime(message))
+            except Exception as e:
+                # Refus du serveur: la session reste utilisable; autre erreur: elle est perdue
+                if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                    self.session.close()
+                permanent = _is_permanent(e)
+                retry_at = self._record_failure(message, e, permanent)
+                if not permanent:
+                    # Serveur indisponible: les messages suivants attendent le même délai
+                    with self.lock:
+                        for other in due[index + 1:]:
+                            other['next_attempt'] = max(other['next_attempt'], retry_at)
+                        self._save()
+                    break
+                continue
+
+            # Destinataires refusés temporairement: un nouvel essai pour eux seuls
+            retry = [address for address, (code, _) in refused.items() if code < 500]
+            rejected = [address for address, (code, _) in refused.items() if code >= 500]
+            if rejected:
+                logger.warning(f"Destinataires refusés par le serveur: {', '.join(rejected)}")
+            if retry:
+                message['to'] = retry
+                self._record_failure(message, f"Destinataires refusés: {', '.join(retry)}", False)
+            else:
+                self._record_success(message)
+
+    def _record_success(self, message):
+        """Retirer un message envoyé de la file"""
+        with self.lock:
+            self.pending = [other for other in self.pending if other['id'] != message['id']]
+            self.sent += 1
+            self._save()
+            self._notify(message['id'], True)
+        NOTIFICATIONS.inc(result='sent')
+        logger.info(f"Email envoyé avec succès: {message['subject']}")
+
+    def _record_failure(self, message, error, permanent):
+        """
+        Programmer un nouvel essai (backoff exponentiel avec gigue) ou abandonner le message
+
+        Returns:
+            float: Heure du prochain essai (0 si le message est abandonné)
+        """
+        message['attempts'] += 1
+        message['last_error'] = str(error)
+        self.last_error = str(error)
+        with self.lock:
+            if permanent or message['attempts'] >= NOTIFICATION_MAX_ATTEMPTS:
+                self.pending = [other for other in self.pending if other['id'] != message['id']]
+                self.failed = (self.failed + [message])[-MAX_FAILED_KEPT:]
+                self._save()
+                self._notify(message['id'], False)
+                NOTIFICATIONS.inc(result='failed')
+                logger.error(f"Email abandonné après {message['attempts']} essai(s): {message['subject']} ({error})")
+                return 0
+
+            delay = min(NOTIFICATION_RETRY_MAX_DELAY, NOTIFICATION_RETRY_BASE_DELAY * (2 ** (message['attempts'] - 1)))
+            message['next_attempt'] = time.time() + random.uniform(delay / 2, delay)
+            self._save()
+        NOTIFICATIONS.inc(result='retry')
+        logger.warning(f"Échec de l'envoi de l'email ({error}) - nouvel essai dans {message['next_attempt'] - time.time():.0f}s")
+        return message['next_attempt']
+
+    def _notify(self, message_id, delivered):
+        """Réveiller un appelant qui attend ce message (sous self.lock)"""
+        event = self.waiters.get(message_id)
+        if event:
+            self.results[message_id] = delivered
+            event.set()
+
+    def get_status(self):
+        """Obtenir l'état de la file d'envoi"""
+        with self.lock:
+            return {
+                'running': self.running,
+                'pending': len(self.pending),
+                'failed': len(self.failed),
+                'sent': self.sent,
+                'session_open': self.session.smtp is not None,
+                'sessions_opened': self.session.opened,
+                'last_error': self.last_error
+            }
+
+
+# Instance globale de la file d'envoi
+notification_outbox = NotificationOutbox()
+
+metrics.gauge('palazzetti_notification_outbox_pending', "Emails en attente d'envoi", (),
+              lambda: {(): len(notification_outbox.pending)})
+
+def start_notification_outbox():
+    """Démarrer l'envoi des notifications en arrière-plan"""
+    notification_outbox.start()
+
+def stop_notification_outbox():
+    """Arrêter l'envoi des notifications"""
+    notification_outbox.stop()
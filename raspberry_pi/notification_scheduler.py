@@ -1,5 +1,5 @@
 """
-Système de surveillance périodique pour les notifications du contrôleur Palazzetti
+Évaluation des alertes email à partir des instantanés d'état du contrôleur Palazzetti
 """
 import time
 import threading
@@ -13,15 +13,28 @@ from config import NOTIFICATION_CONFIG, SMTP_CONFIG
 logger = logging.getLogger(__name__)
 
 class NotificationScheduler:
-    """Planificateur de surveillance pour les notifications"""
+    """
+    Évaluation des alertes à partir des instantanés publiés par la surveillance
+
+    Abonné au contrôleur, le scheduler évalue les conditions d'alerte à chaque
+    instantané (et à chaque perte de lien): une alerte part quelques secondes
+    après le changement, sans aucune lecture supplémentaire sur le bus. Toutes
+    les check_interval minutes sans instantané (surveillance arrêtée ou port
+    fermé), l'état en cache est réévalué en secours, toujours sans lecture.
+    """
     
     def __init__(self):
         self.controller = None
         self.consumption_storage = None
         self.email_notification_manager = None
         self.running = False
+        self.subscribed = False
         self.scheduler_thread = None
+        self.stop_event = threading.Event()
+        self.check_lock = threading.Lock()  # Une seule évaluation à la fois (surveillance, secours, forcée)
         self.config = NOTIFICATION_CONFIG
+        self.last_check = None  # Horodatage de la dernière évaluation
+        self.checks = 0
         
     def initialize(self, controller, consumption_storage):
         """Initialiser les composants"""
@@ -31,7 +44,7 @@ class NotificationScheduler:
         logger.info("Scheduler de notifications email initialisé")
     
     def start(self):
-        """Démarrer la surveillance périodique"""
+        """Démarrer l'évaluation des alertes sur les instantanés publiés"""
         if self.running:
             logger.warning("Scheduler déjà en cours d'exécution")
             return
@@ -41,79 +54,85 @@ class NotificationScheduler:
             return
         
         self.running = True
+        self.stop_event.clear()
+        if not self.subscribed:
+            self.controller.add_state_listener(self.on_snapshot)
+            self.subscribed = True
         self.scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
         self.scheduler_thread.start()
-        logger.info(f"Scheduler de notifications démarré (intervalle: {self.config['check_interval']} minutes)")
+        logger.info(f"Scheduler de notifications démarré (évaluation à chaque instantané, "
+                    f"secours: {self.config['check_interval']} minutes)")
     
     def stop(self):
-        """Arrêter la surveillance périodique"""
+        """Arrêter l'évaluation des alertes"""
         if not self.running:
             return
         
         self.running = False
+        self.stop_event.set()
         if self.scheduler_thread:
             self.scheduler_thread.join(timeout=5)
         logger.info("Scheduler de notifications arrêté")
     
+    def on_snapshot(self, state):
+        """
+        Évaluer les alertes sur un instantané publié (abonné du contrôleur)
+        
+        Args:
+            state: Copie de l'état publiée par le contrôleur
+        """
+        if not self.running:
+            return
+        self._check_all_conditions(state)
+    
     def _scheduler_loop(self):
-        """Boucle principale de surveillance"""
+        """Évaluation de secours quand aucun instantané n'a été publié depuis check_interval"""
         check_interval_seconds = self.config['check_interval'] * 60  # Convertir en secondes
         
-        while self.running:
-            try:
-                logger.debug("Vérification des conditions d'alerte...")
-                self._check_all_conditions()
-                
-                # Attendre l'intervalle configuré
-                time.sleep(check_interval_seconds)
-                
-            except Exception as e:
-                logger.error(f"Erreur dans la boucle de surveillance: {e}")
-                # En cas d'erreur, attendre un peu avant de réessayer
-                time.sleep(60)
+        while not self.stop_event.wait(check_interval_seconds):
+            if self.last_check is not None and time.time() - self.last_check < check_interval_seconds:
+                continue
+            logger.debug("Aucun instantané récent - vérification des alertes sur l'état en cache")
+            self._check_all_conditions(self.controller.get_state_for_notifications())
     
-    def _check_all_conditions(self):
-        """Vérifier toutes les conditions d'alerte"""
+    def _check_all_conditions(self, state):
+        """
+        Vérifier toutes les conditions d'alerte sur un état
+        
+        Args:
+            state: Copie de l'état du contrôleur (aucune lecture sur le bus n'est faite ici)
+        """
         if not self.controller or not self.email_notification_manager:
             logger.warning("Composants non initialisés pour la surveillance")
             return
         
-        try:
-            # Lire l'état du poêle pour les notifications (sans modifier l'état interne)
-            state = self.controller.get_state_for_notifications()
-            if not state:
-                logger.warning("Impossible de lire l'état du poêle pour les notifications")
-                return
-            
-            # Vérifier les conditions d'alerte email
-            if self.email_notification_manager:
-                self.email_notification_manager.check_all_conditions(state, self._get_consumption_data())
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la vérification des conditions: {e}")
-    
-    def _get_consumption_data(self):
-        """Obtenir les données de consommation pour la maintenance"""
-        if not self.consumption_storage or not self.controller:
-            return None
-        
-        try:
-            consumption = self.controller.get_pellet_consumption()
-            if consumption is not None:
-                return self.consumption_storage.get_maintenance_consumption(consumption)
-        except Exception as e:
-            logger.error(f"Erreur lors de la lecture des données de consommation: {e}")
-        
-        return None
+        with self.check_lock:
+            try:
+                state = dict(state)
+                consumption = state.get('pellet_consumption')
+                consumption_data = None
+                state['fill_level'] = None
+                if consumption is not None and self.consumption_storage:
+                    # Niveau, autonomie projetée et maintenance à partir du compteur publié
+                    state['fill_level'] = self.consumption_storage.get_fill_level(consumption)
+                    consumption_data = self.consumption_storage.get_maintenance_consumption(consumption)
+                
+                # Mise en file des emails: l'évaluation ne bloque pas la surveillance
+                self.email_notification_manager.check_all_conditions(state, consumption_data)
+                self.last_check = time.time()
+                self.checks += 1
+                
+            except Exception as e:
+                logger.error(f"Erreur lors de la vérification des conditions: {e}")
     
     def force_check(self):
-        """Forcer une vérification immédiate (pour les tests)"""
+        """Forcer une vérification immédiate sur l'état en cache (pour les tests)"""
         if not self.running:
             logger.warning("Scheduler non démarré, impossible de forcer la vérification")
             return
         
         logger.info("Vérification forcée des conditions d'alerte")
-        self._check_all_conditions()
+        self._check_all_conditions(self.controller.get_state_for_notifications())
     
     def get_status(self):
         """Obtenir le statut du scheduler"""
@@ -121,7 +140,8 @@ class NotificationScheduler:
             'running': self.running,
             'enabled': self.config['enabled'],
             'check_interval': self.config['check_interval'],
-            'last_check': datetime.now().isoformat() if self.running else None
+            'checks': self.checks,
+            'last_check': datetime.fromtimestamp(self.last_check).isoformat() if self.last_check else None
         }
 
 
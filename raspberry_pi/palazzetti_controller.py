@@ -5,11 +5,64 @@ import time
 import threading
 import logging
 from serial_communicator import SerialCommunicator
+from bus_scheduler import bus_scheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from metrics import metrics
 from frame import parse_temperature, parse_status, parse_setpoint
 from config import *
 
 logger = logging.getLogger(__name__)
 
+# Étapes de lecture: nom → champs de l'état renseignés, dans l'ordre d'exécution
+READ_STEPS = {
+    'status': ('status', 'status_code', 'power'),
+    'temperature': ('temperature',),
+    'setpoint': ('setpoint', 'seco'),
+    'error': ('error_code', 'error_message'),
+    'alarm': ('alarm_status',),
+    'timer': ('timer_enabled',),
+    'pellet_consumption': ('pellet_consumption',),
+    'chrono': ('chrono_programs', 'chrono_days'),
+}
+
+# Étapes d'une lecture complète de l'état (get_state)
+STATE_STEPS = ('status', 'temperature', 'setpoint', 'error', 'alarm', 'timer')
+
+# Champ de l'état → étape qui le lit
+FIELD_STEPS = {field: step for step, fields in READ_STEPS.items() for field in fields}
+
+STATE_CACHE = metrics.counter(
+    'palazzetti_state_cache_total', "Champs servis depuis le cache (hit) ou relus sur le bus (miss)", ('field', 'result'))
+
+
+def _count_cache(steps, result):
+    """Compter les champs des étapes servies depuis le cache ('hit') ou à relire ('miss')"""
+    for step in steps:
+        for field in READ_STEPS[step]:
+            STATE_CACHE.inc(field=field, result=result)
+
+
+def plan_reads(fields):
+    """
+    Construire le plan de lecture minimal pour un ensemble de champs
+    
+    Args:
+        fields: Noms de champs de l'état (voir READ_STEPS)
+    
+    Returns:
+        list: Étapes à exécuter, sans doublon et dans l'ordre de READ_STEPS
+    
+    Raises:
+        ValueError: Si un champ n'est lu par aucune étape
+    """
+    steps = set()
+    for field in fields:
+        if field not in FIELD_STEPS:
+            raise ValueError(f"Champ inconnu: {field}")
+        steps.add(FIELD_STEPS[field])
+    if 'error' in steps:
+        steps.add('status')  # Le code d'erreur est d'abord déduit du statut
+    return [step for step in READ_STEPS if step in steps]
+
 
 class PalazzettiController:
     """Contrôleur pour le poêle Palazzetti avec logique de contrôle séparée"""
@@ -17,7 +70,7 @@ class PalazzettiController:
     def __init__(self):
         self.communicator = SerialCommunicator()
         self.state_lock = threading.Lock()  # Sémaphore pour get_state()
-        self.communication_lock = threading.Lock()  # Sémaphore pour les communications série
+        self.communication_lock = threading.RLock()  # Sémaphore pour les communications série (réentrant: plans de lecture)
         self.last_state_read = 0  # Timestamp de la dernière lecture
         self.state_cache_duration = 10  # Durée du cache en secondes
         self.current_operation = None  # Opération en cours
@@ -25,7 +78,9 @@ class PalazzettiController:
         self.state = {
             'connected': False,
             'synchronized': False,
+            'link_down': False,   # Disjoncteur ouvert: état servi depuis le cache
             'status': 'OFF',
+            'status_code': None,  # Code de statut brut (registre 0x201C)
             'power': False,
             'temperature': DEFAULT_TEMPERATURE,
             'setpoint': DEFAULT_TEMPERATURE,
@@ -37,9 +92,19 @@ class PalazzettiController:
             'alarm_status': 0,    # Statut des alarmes
             'timer_enabled': False, # Timer activé/désactivé
             'chrono_programs': [],  # Programmes de timer (6 programmes)
-            'chrono_days': []       # Programmation par jour (7 jours)
+            'chrono_days': [],      # Programmation par jour (7 jours)
+            'pellet_consumption': None,  # Compteur de consommation (lu par la surveillance)
+            'timestamp': None       # Horodatage de la dernière lecture
         }
         self.running = False
+        self.monitor_thread = None
+        self.state_listeners = []  # Abonnés aux instantanés d'état publiés
+        self.step_read_times = {}  # Étape de lecture → horodatage de la dernière lecture réussie
+        self.chrono_cache_duration = CHRONO_CACHE_DURATION  # Durée du cache des données du chrono (s)
+        self.chrono_generation = 0  # Incrémentée quand les données du chrono changent
+        self.version = 0  # Version de l'état (ETag), voir state_version()
+        self.versioned_state = None  # Contenu de l'état à la dernière version
+        self.version_lock = threading.Lock()
         
     def connect(self, port=None, baudrate=38400, timeout=10):
         """
@@ -73,13 +138,58 @@ class PalazzettiController:
         self.state['synchronized'] = False
     
     def is_connected(self):
-        """Vérifier si le contrôleur est connecté"""
-        return self.communicator.is_connected()
+        """
+        Vérifier si le contrôleur est connecté
+        
+        Retourne l'état publié (mis à jour par le superviseur de connexion),
+        sans communication sur le bus: cet appel ne bloque jamais.
+        """
+        return self.state['connected'] and self.communicator.is_port_open()
+    
+    def mark_link_lost(self):
+        """Marquer le lien comme perdu (appelé par le superviseur de connexion)"""
+        self.state['connected'] = False
+        self.state['synchronized'] = False
+        self.state['error_message'] = 'Connexion série perdue - vérifiez le câble'
+        # Les abonnés (notifications, clients temps réel) l'apprennent sans attendre la surveillance
+        self._publish_state()
+    
+    def reconnect(self, port=None, baudrate=38400, timeout=10):
+        """
+        Rouvrir le port série et relancer la découverte du poêle
+        
+        Appelé depuis le thread du superviseur de connexion, jamais depuis
+        un gestionnaire HTTP. La fermeture et la réouverture du port occupent
+        le bus: aucun autre job ne s'exécute sur un port à moitié rouvert.
+        
+        Returns:
+            bool: True si le poêle répond à nouveau, False sinon
+        """
+        def reopen():
+            self.communicator.disconnect()
+            return self.connect(port, baudrate, timeout)
+        
+        if not bus_scheduler.run('reconnect', reopen, PRIORITY_INTERACTIVE):
+            return False
+        
+        # Découverte: relire l'état complet en ignorant le cache
+        self.last_state_read = 0
+        bus_scheduler.run('refresh', self.force_state_refresh, PRIORITY_INTERACTIVE)
+        return True
     
-    def get_state(self):
-        """Obtenir l'état complet du poêle"""
+    def get_state(self, fields=None):
+        """
+        Obtenir l'état du poêle
+        
+        Args:
+            fields: Champs voulus (None pour l'état complet). Seuls les registres
+                de ces champs sont relus, et seulement si leur cache a expiré.
+        
+        Raises:
+            ValueError: Si un champ demandé n'est lu par aucune étape
+        """
         # Vérifier d'abord si la connexion série est toujours active
-        if not self.communicator.is_connected():
+        if not self.is_connected():
             logger.warning("Connexion série perdue - retour d'état existant sans modification")
             # Ne pas modifier l'état existant, juste retourner ce qu'on a
             return self.state
@@ -87,10 +197,22 @@ class PalazzettiController:
         if not self.state['connected']:
             return self.state
         
+        # Disjoncteur ouvert: répondre immédiatement avec le dernier état connu
+        if self.communicator.breaker.is_open():
+            logger.debug("Disjoncteur ouvert - retour de l'état en cache")
+            self.state['link_down'] = True
+            return self.state
+        
+        # Lecture partielle: plan minimal pour les champs demandés
+        if fields is not None:
+            self.read_steps(plan_reads(fields), self.state_cache_duration)
+            return self.state
+        
         # Vérifier si on peut utiliser le cache
         current_time = time.time()
         if current_time - self.last_state_read < self.state_cache_duration:
             logger.debug("Utilisation du cache d'état (lecture récente)")
+            _count_cache(STATE_STEPS, 'hit')
             return self.state
         
         # Utiliser un sémaphore pour éviter les appels concurrents
@@ -98,45 +220,79 @@ class PalazzettiController:
             # Vérifier à nouveau le cache (double-checked locking)
             if current_time - self.last_state_read < self.state_cache_duration:
                 logger.debug("Utilisation du cache d'état (après sémaphore)")
+                _count_cache(STATE_STEPS, 'hit')
                 return self.state
+            _count_cache(STATE_STEPS, 'miss')
             return self._read_state()
     
+    def probe_link(self):
+        """
+        Envoyer une transaction de sonde pour refermer le disjoncteur
+        
+        Appelé périodiquement par le superviseur de connexion tant que le
+        disjoncteur est ouvert; la sonde et le rafraîchissement passent par
+        la file du bus.
+        
+        Returns:
+            bool: True si le poêle a répondu
+        """
+        frame = bus_scheduler.run(
+            'probe', lambda: self.communicator.send_read_command(REGISTER_STATUS, probe=True), PRIORITY_BACKGROUND)
+        if frame:
+            logger.info("Sonde réussie - rafraîchissement de l'état")
+            self.state['link_down'] = False
+            bus_scheduler.run('refresh', self.force_state_refresh, PRIORITY_INTERACTIVE)
+            return True
+        return False
+    
     def get_state_for_notifications(self):
-        """Obtenir l'état pour les notifications sans modifier l'état interne"""
-        # Cette méthode ne modifie pas self.state, elle lit juste les données
-        try:
-            # Essayer de lire la consommation pour vérifier la communication
-            consumption = self.get_pellet_consumption()
-            if consumption is not None:
-                # Si on peut lire la consommation, on considère que la communication fonctionne
-                return {
-                    'connected': True,
-                    'synchronized': True,
-                    'error_code': 0,
-                    'error_message': '',
-                    'fill_level': {'fill_level': 100}  # Valeur par défaut
-                }
-            else:
-                return {
-                    'connected': False,
-                    'synchronized': False,
-                    'error_code': 0,
-                    'error_message': 'Communication impossible',
-                    'fill_level': None
-                }
-        except Exception as e:
-            logger.debug(f"Erreur lors de la lecture pour notifications: {e}")
-            return {
-                'connected': False,
-                'synchronized': False,
-                'error_code': 0,
-                'error_message': f'Erreur: {str(e)}',
-                'fill_level': None
-            }
+        """
+        Obtenir l'état pour les notifications, sans transaction sur le bus
+        
+        Copie de l'état publié par la surveillance; 'connected' reflète l'état
+        réel du port série, même si aucun instantané n'a été publié depuis.
+        """
+        state = self.state.copy()
+        state['connected'] = self.is_connected()
+        return state
 
+    def state_version(self):
+        """
+        Obtenir la version de l'état, incrémentée à chaque changement de contenu
+        
+        L'horodatage de lecture est ignoré: relire des valeurs identiques ne
+        change pas la version.
+        
+        Returns:
+            int: Numéro de version
+        """
+        with self.version_lock:
+            content = {key: value for key, value in self.state.items() if key != 'timestamp'}
+            if content != self.versioned_state:
+                self.versioned_state = content
+                self.version += 1
+            return self.version
+    
+    def remaining_ttl(self, steps, duration=None):
+        """
+        Durée de validité restante des champs lus par des étapes
+        
+        Args:
+            steps: Étapes de lecture (voir READ_STEPS)
+            duration: Durée du cache (state_cache_duration par défaut)
+        
+        Returns:
+            int: Secondes avant que la plus ancienne de ces étapes soit à relire
+        """
+        if duration is None:
+            duration = self.state_cache_duration
+        now = time.time()
+        oldest = min((self.step_read_times.get(step, 0) for step in steps), default=0)
+        return max(0, int(duration - (now - oldest)))
+    
     def get_pellet_consumption(self):
         """Obtenir la consommation de pellets"""
-        if not self.communicator.is_connected():
+        if not self.is_connected():
             logger.warning("Connexion série perdue - impossible de lire la consommation de pellets")
             return None
         
@@ -149,6 +305,7 @@ class PalazzettiController:
                     # Le registre 0x2002 contient un word (16 bits)
                     consumption = (data[1] << 8) | data[0]
                     logger.info(f"Consommation de pellets lue: {consumption}")
+                    self.state['pellet_consumption'] = consumption
                     return consumption
                 else:
                     logger.warning("Pas de données valides pour la consommation de pellets")
@@ -160,15 +317,159 @@ class PalazzettiController:
             logger.error(f"Erreur lors de la lecture de la consommation de pellets: {e}")
             return None
     
+    def _read_status(self):
+        """Étape 'status': statut, puissance et erreur signalée par le statut"""
+        logger.debug("Lecture du registre statut...")
+        status_frame = self.communicator.send_read_command(REGISTER_STATUS)
+        if not status_frame:
+            logger.warning("Échec de lecture du registre statut")
+            return False
+        status_code, status_name, power_on = parse_status(status_frame.get_data())
+        self.state['status'] = status_name
+        self.state['status_code'] = status_code
+        self.state['power'] = power_on
+        logger.debug(f"Statut lu: {status_name}, Puissance: {'ON' if power_on else 'OFF'}")
+        
+        # Si le statut indique une erreur (codes 241-254), mettre à jour l'erreur
+        if status_code >= 241 and status_code <= 254:
+            self.state['error_code'] = status_code
+            self.state['error_message'] = STATUS_ERROR_MAP.get(status_code, f'Erreur inconnue: {status_code}')
+            logger.info(f"Erreur détectée via statut: {status_code} - {self.state['error_message']}")
+        return True
+    
+    def _read_temperature(self):
+        """Étape 'temperature': température ambiante"""
+        logger.debug("Lecture du registre température...")
+        temp_frame = self.communicator.send_read_command(REGISTER_TEMPERATURE)
+        if not temp_frame:
+            logger.warning("Échec de lecture du registre température")
+            return False
+        temperature = parse_temperature(temp_frame.get_data())
+        self.state['temperature'] = temperature
+        logger.debug(f"Température lue: {temperature}°C")
+        return True
+    
+    def _read_setpoint(self):
+        """Étape 'setpoint': consigne et seuil de déclenchement (fluide type 0, granulés)"""
+        logger.debug("Lecture du registre consigne...")
+        setpoint_result = self.get_setpoint()
+        if not setpoint_result:
+            logger.warning("Échec de lecture du registre consigne")
+            return False
+        setpoint, seco = setpoint_result
+        logger.debug(f"Consigne lue: {setpoint}°C, Seuil: {seco}°C")
+        return True
+    
+    def _read_error(self):
+        """Étape 'error': code d'erreur, lu seulement si le statut n'en signale pas déjà une"""
+        status_code = self.state.get('status_code')
+        if status_code and status_code >= 241 and status_code <= 254:
+            logger.debug("Erreur déjà détectée via le statut, pas besoin de lire le registre d'erreur")
+            return True
+        logger.debug("Lecture du registre code d'erreur...")
+        error_frame = self.communicator.send_read_command(REGISTER_ERROR_CODE)
+        if not error_frame:
+            logger.warning("Échec de lecture du registre code d'erreur")
+            return False
+        error_code = error_frame.get_data()[0]
+        self.state['error_code'] = error_code
+        # Essayer d'abord le mapping des codes de statut numériques, puis le mapping des codes d'erreur
+        self.state['error_message'] = STATUS_ERROR_MAP.get(error_code, 
+            ERROR_MAP.get(error_code, f'Erreur inconnue: {error_code}'))
+        logger.debug(f"Code d'erreur lu: {error_code} - {self.state['error_message']}")
+        return True
+    
+    def _read_alarm(self):
+        """Étape 'alarm': statut des alarmes"""
+        logger.debug("Lecture du registre statut des alarmes...")
+        alarm_frame = self.communicator.send_read_command(REGISTER_ALARM_STATUS)
+        if not alarm_frame:
+            logger.warning("Échec de lecture du registre statut des alarmes")
+            return False
+        self.state['alarm_status'] = alarm_frame.get_data()[0]
+        logger.debug(f"Statut des alarmes lu: {self.state['alarm_status']}")
+        return True
+    
+    def _read_timer(self):
+        """Étape 'timer': activation du timer"""
+        logger.debug("Lecture du registre statut timer...")
+        timer_frame = self.communicator.send_read_command(REGISTER_CHRONO_STATUS)
+        if not timer_frame:
+            logger.warning("Échec de lecture du registre statut timer")
+            return False
+        timer_enabled = (timer_frame.get_data()[0] & 0x01) == 1
+        if timer_enabled != self.state['timer_enabled']:
+            self.chrono_generation += 1  # Timer changé sur le poêle: les données du chrono servies changent
+        self.state['timer_enabled'] = timer_enabled
+        logger.debug(f"Statut timer lu: {'Activé' if self.state['timer_enabled'] else 'Désactivé'}")
+        return True
+    
+    def _read_pellet_consumption(self):
+        """Étape 'pellet_consumption': compteur de consommation"""
+        return self.get_pellet_consumption() is not None
+    
+    def _read_chrono(self):
+        """Étape 'chrono': programmes et programmation par jour"""
+        return self._read_chrono_data() is not None
+    
+    def _run_step(self, step):
+        """Exécuter une étape de lecture et noter son horodatage si elle a réussi"""
+        success = getattr(self, f'_read_{step}')()
+        if success:
+            self.step_read_times[step] = time.time()
+        return success
+    
+    def read_steps(self, steps, max_age=None):
+        """
+        Exécuter un plan de lecture en une seule opération sur le bus
+        
+        Args:
+            steps: Étapes à lire, dans l'ordre (voir plan_reads)
+            max_age: Ne pas relire les étapes lues depuis moins de max_age secondes
+                (None pour tout relire)
+        
+        Returns:
+            list: Étapes effectivement lues avec succès
+        """
+        if not self.is_connected() or self.communicator.breaker.is_open():
+            return []
+        if max_age is not None:
+            now = time.time()
+            stale = [step for step in steps if now - self.step_read_times.get(step, 0) >= max_age]
+            _count_cache([step for step in steps if step not in stale], 'hit')
+            _count_cache(stale, 'miss')
+            steps = stale
+        if not steps:
+            return []
+        
+        def _read_steps_internal():
+            read = []
+            with self.communication_lock:
+                for step in steps:
+                    # Demandeur parti: les étapes restantes ne sont pas lues
+                    if bus_scheduler.should_abort():
+                        break
+                    try:
+                        if self._run_step(step):
+                            read.append(step)
+                    except Exception as e:
+                        logger.error(f"Erreur lors de l'étape de lecture {step}: {e}")
+            if read:
+                self.state['timestamp'] = time.time()
+            logger.debug(f"Plan de lecture {steps}: {len(read)}/{len(steps)} étapes lues")
+            return read
+        
+        return self._execute_operation('read_steps', _read_steps_internal) or []
+    
     def _read_state(self):
         """Lecture interne de l'état (protégée par le sémaphore)"""
         def _read_state_internal():
             start_time = time.time()
-            successful_reads = 0  # Compteur de lectures réussies
-            total_reads = 0       # Compteur total de lectures
+            results = {}  # Étape → succès
+            aborted = False
             
             # Vérifier d'abord si la connexion est toujours active
-            if not self.communicator.is_connected():
+            if not self.is_connected():
                 logger.error("Connexion série perdue - câble peut-être déconnecté")
                 self.state['connected'] = False
                 self.state['synchronized'] = False
@@ -179,98 +480,33 @@ class PalazzettiController:
             with self.communication_lock:
                 try:
                     logger.info("Lecture de l'état du poêle...")
-                    
-                    # Lire le statut
-                    logger.debug("Lecture du registre statut...")
-                    total_reads += 1
-                    status_code = None  # Initialiser la variable
-                    status_frame = self.communicator.send_read_command(REGISTER_STATUS)
-                    if status_frame:
-                        status_code, status_name, power_on = parse_status(status_frame.get_data())
-                        self.state['status'] = status_name
-                        self.state['power'] = power_on
-                        successful_reads += 1
-                        logger.debug(f"Statut lu: {status_name}, Puissance: {'ON' if power_on else 'OFF'}")
-                        
-                        # Si le statut indique une erreur (codes 241-254), mettre à jour l'erreur
-                        if status_code >= 241 and status_code <= 254:
-                            self.state['error_code'] = status_code
-                            self.state['error_message'] = STATUS_ERROR_MAP.get(status_code, f'Erreur inconnue: {status_code}')
-                            logger.info(f"Erreur détectée via statut: {status_code} - {self.state['error_message']}")
-                    else:
-                        logger.warning("Échec de lecture du registre statut")
-                
-                    # Lire la température actuelle
-                    logger.debug("Lecture du registre température...")
-                    total_reads += 1
-                    temp_frame = self.communicator.send_read_command(REGISTER_TEMPERATURE)
-                    if temp_frame:
-                        temperature = parse_temperature(temp_frame.get_data())
-                        self.state['temperature'] = temperature
-                        successful_reads += 1
-                        logger.debug(f"Température lue: {temperature}°C")
-                    else:
-                        logger.warning("Échec de lecture du registre température")
-                
-                    # Lire la température de consigne avec fluide type 0 (granulés)
-                    logger.debug("Lecture du registre consigne...")
-                    total_reads += 1
-                    setpoint_result = self.get_setpoint()
-                    if setpoint_result:
-                        setpoint, seco = setpoint_result
-                        self.state['setpoint'] = setpoint
-                        self.state['seco'] = seco
-                        successful_reads += 1
-                        logger.debug(f"Consigne lue: {setpoint}°C, Seuil: {seco}°C")
-                    else:
-                        logger.warning("Échec de lecture du registre consigne")
-                
-                    # Lire le code d'erreur seulement si aucune erreur n'a été détectée via le statut
-                    if not (status_code and status_code >= 241 and status_code <= 254):
-                        logger.debug("Lecture du registre code d'erreur...")
-                        error_frame = self.communicator.send_read_command(REGISTER_ERROR_CODE)
-                        if error_frame:
-                            error_code = error_frame.get_data()[0]
-                            self.state['error_code'] = error_code
-                            # Essayer d'abord le mapping des codes de statut numériques, puis le mapping des codes d'erreur
-                            self.state['error_message'] = STATUS_ERROR_MAP.get(error_code, 
-                                ERROR_MAP.get(error_code, f'Erreur inconnue: {error_code}'))
-                            logger.debug(f"Code d'erreur lu: {error_code} - {self.state['error_message']}")
-                        else:
-                            logger.warning("Échec de lecture du registre code d'erreur")
-                    else:
-                        logger.debug("Erreur déjà détectée via le statut, pas besoin de lire le registre d'erreur")
-                
-                    
-                    # Lire le statut des alarmes
-                    logger.debug("Lecture du registre statut des alarmes...")
-                    alarm_frame = self.communicator.send_read_command(REGISTER_ALARM_STATUS)
-                    if alarm_frame:
-                        alarm_status = alarm_frame.get_data()[0]
-                        self.state['alarm_status'] = alarm_status
-                        logger.debug(f"Statut des alarmes lu: {alarm_status}")
-                    else:
-                        logger.warning("Échec de lecture du registre statut des alarmes")
-                    
-                    # Lire le statut du timer
-                    logger.debug("Lecture du registre statut timer...")
-                    timer_frame = self.communicator.send_read_command(REGISTER_CHRONO_STATUS)
-                    if timer_frame:
-                        timer_status = timer_frame.get_data()[0]
-                        self.state['timer_enabled'] = (timer_status & 0x01) == 1
-                        logger.debug(f"Statut timer lu: {'Activé' if self.state['timer_enabled'] else 'Désactivé'}")
-                    else:
-                        logger.warning("Échec de lecture du registre statut timer")
-                    
+                    for step in STATE_STEPS:
+                        if bus_scheduler.should_abort():
+                            aborted = True
+                            break
+                        results[step] = self._run_step(step)
                 except Exception as e:
                     logger.error(f"Erreur lors de la lecture de l'état: {e}")
             
+            # Lecture interrompue: la synchronisation n'est pas jugée sur un cycle incomplet
+            if aborted:
+                logger.info(f"Lecture de l'état interrompue après {len(results)}/{len(STATE_STEPS)} étapes")
+                if any(results.values()):
+                    self.state['timestamp'] = time.time()
+                return self.state
+            
+            # Lectures principales servant à juger la synchronisation
+            total_reads = 3
+            successful_reads = sum(1 for step in ('status', 'temperature', 'setpoint') if results.get(step))
+            
             # Calculer le temps de lecture
             end_time = time.time()
             read_duration = end_time - start_time
             
             # Mettre à jour le timestamp de la dernière lecture
             self.last_state_read = time.time()
+            self.state['timestamp'] = self.last_state_read
+            self.state['link_down'] = self.communicator.breaker.is_open()
             
             # Logger l'état complet avec le temps de lecture
             logger.info("=== État du poêle ===")
@@ -291,7 +527,7 @@ class PalazzettiController:
             
             # Déterminer si on est synchronisé basé sur le succès des lectures
             # On considère synchronisé si au moins 2 des 3 lectures principales ont réussi
-            if total_reads >= 3 and successful_reads >= 2:
+            if successful_reads >= 2:
                 self.state['synchronized'] = True
                 logger.info(f"✅ Synchronisation réussie ({successful_reads}/{total_reads} lectures)")
             else:
@@ -415,32 +651,71 @@ class PalazzettiController:
             return False
     
     def start_monitoring(self):
-        """Démarrer la surveillance en arrière-plan - DÉSACTIVÉE pour l'instant"""
-        # Surveillance périodique désactivée - lecture uniquement à la demande
-        logger.info("Surveillance périodique désactivée - lecture uniquement à la demande")
-        return
+        """Démarrer la surveillance périodique en arrière-plan (MONITOR_INTERVAL secondes)"""
+        if MONITOR_INTERVAL <= 0:
+            logger.info("Surveillance périodique désactivée - lecture uniquement à la demande")
+            return
+        if self.running:
+            return
+        
+        self.running = True
+        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self.monitor_thread.start()
+        logger.info(f"Surveillance périodique démarrée (intervalle: {MONITOR_INTERVAL}s)")
     
     def stop_monitoring(self):
-        """Arrêter la surveillance - DÉSACTIVÉE pour l'instant"""
-        # Surveillance périodique désactivée
-        logger.info("Surveillance périodique désactivée")
-        return
+        """Arrêter la surveillance périodique"""
+        if not self.running:
+            return
+        
+        self.running = False
+        if self.monitor_thread:
+            self.monitor_thread.join(timeout=5)
+        logger.info("Surveillance périodique arrêtée")
     
     def _monitor_loop(self):
-        """Boucle de surveillance en arrière-plan"""
+        """Boucle de surveillance en arrière-plan: lecture et publication d'instantanés"""
         while self.running:
             try:
-                old_state = self.state.copy()
-                self.get_state()
-                
-                # Émettre les changements via WebSocket si callback défini
-                if old_state != self.state and hasattr(self, 'websocket_callback'):
-                    self.websocket_callback('state_update', self.state)
+                if self.is_connected():
+                    # Lectures en priorité basse: les commandes en file passent devant
+                    bus_scheduler.run('monitor', self._monitor_read, PRIORITY_BACKGROUND)
+                    self._publish_state()
                     
             except Exception as e:
                 logger.error(f"Erreur dans la boucle de surveillance: {e}")
-                
-            time.sleep(60)  # Mise à jour toutes les 10 secondes
+            
+            # Attente fractionnée pour un arrêt rapide
+            deadline = time.time() + MONITOR_INTERVAL
+            while self.running and time.time() < deadline:
+                time.sleep(0.5)
+    
+    def _monitor_read(self):
+        """Lectures d'un cycle de surveillance (exécutées par la file du bus)"""
+        self.get_state()
+        self.get_pellet_consumption()
+    
+    def add_state_listener(self, callback):
+        """
+        Abonner un callback aux instantanés d'état publiés par la surveillance
+        
+        Args:
+            callback: Fonction appelée avec une copie de l'état
+        """
+        self.state_listeners.append(callback)
+    
+    def _publish_state(self):
+        """Publier une copie de l'état courant aux abonnés"""
+        snapshot = self.state.copy()
+        for callback in list(self.state_listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Erreur dans un abonné à l'état: {e}")
+        
+        # Compatibilité avec l'ancien callback WebSocket
+        if hasattr(self, 'websocket_callback'):
+            self.websocket_callback('state_update', snapshot)
     
     def set_websocket_callback(self, callback):
         """
@@ -486,96 +761,126 @@ class PalazzettiController:
                 self.current_operation = None
                 logger.debug(f"Fin de l'opération {operation_name}")
     
-    def get_chrono_data(self):
+    def get_chrono_data(self, max_age=None):
         """
         Récupérer toutes les données du système de timer/chrono
+        
+        Args:
+            max_age: Servir les données en cache si elles ont moins de max_age secondes
+                (None pour toujours relire)
         """
-        def _read_chrono_data():
-            try:
-                if not self.state['connected']:
-                    logger.warning("Poêle non connecté, impossible de lire les données du chrono")
+        age = time.time() - self.step_read_times.get('chrono', 0)
+        if max_age is not None and self.state['chrono_programs'] and age < max_age:
+            logger.debug("Utilisation du cache des données du chrono")
+            _count_cache(['chrono'], 'hit')
+            return {
+                'timer_enabled': self.state['timer_enabled'],
+                'programs': self.state['chrono_programs'],
+                'days': self.state['chrono_days']
+            }
+        
+        if max_age is not None:
+            _count_cache(['chrono'], 'miss')
+        # Exécuter l'opération avec gestion des conflits
+        return self._execute_operation('chrono_data', self._read_chrono_data)
+    
+    def _read_chrono_data(self):
+        """Lecture des données du chrono (sans gestion des conflits)"""
+        try:
+            if not self.state['connected']:
+                logger.warning("Poêle non connecté, impossible de lire les données du chrono")
+                return None
+            
+            logger.debug("Lecture des données du chrono...")
+            
+            # Utiliser le sémaphore de communication pour éviter les conflits
+            with self.communication_lock:
+                # Lire les températures de consigne des programmes (0x802D)
+                setpoints_frame = self.communicator.send_read_command(REGISTER_CHRONO_SETPOINTS)
+                if not setpoints_frame:
+                    logger.warning("Échec de lecture des températures de consigne des programmes")
                     return None
-                
-                logger.debug("Lecture des données du chrono...")
-                
-                # Utiliser le sémaphore de communication pour éviter les conflits
-                with self.communication_lock:
-                    # Lire les températures de consigne des programmes (0x802D)
-                    setpoints_frame = self.communicator.send_read_command(REGISTER_CHRONO_SETPOINTS)
-                    if not setpoints_frame:
-                        logger.warning("Échec de lecture des températures de consigne des programmes")
-                        return None
-                
-                setpoints_data = setpoints_frame.get_data()
-                
-                # Lire les programmes de timer (0x8000-0x8014)
-                programs = []
-                for i in range(6):  # 6 programmes
-                    addr = [REGISTER_CHRONO_PROGRAMS[0], REGISTER_CHRONO_PROGRAMS[1] + i * 4]
-                    program_frame = self.communicator.send_read_command(addr)
-                    if not program_frame:
-                        logger.warning(f"Échec de lecture du programme {i+1}")
-                        return None
-                    
-                    program_data = program_frame.get_data()
-                    program = {
-                        'number': i + 1,
-                        'start_hour': program_data[0],
-                        'start_minute': program_data[1],
-                        'stop_hour': program_data[2],
-                        'stop_minute': program_data[3],
-                        'setpoint': setpoints_data[i] / 5.0 if setpoints_data[i] > 0 else 0  # Conversion pour fluide type 0
-                    }
-                    programs.append(program)
-                
-                # Lire la programmation par jour (0x8018-0x802A)
-                days = []
-                for i in range(7):  # 7 jours
-                    addr = [REGISTER_CHRONO_DAYS[0], REGISTER_CHRONO_DAYS[1] + i * 3]
-                    day_frame = self.communicator.send_read_command(addr)
-                    if not day_frame:
-                        logger.warning(f"Échec de lecture du jour {i+1}")
-                        return None
-                    
-                    day_data = day_frame.get_data()
-                    day = {
-                        'day_number': i + 1,
-                        'day_name': ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'][i],
-                        'memory_1': day_data[0],
-                        'memory_2': day_data[1],
-                        'memory_3': day_data[2]
-                    }
-                    days.append(day)
-                
-                # Lire le statut du timer (0x207E)
-                status_frame = self.communicator.send_read_command(REGISTER_CHRONO_STATUS)
-                if not status_frame:
-                    logger.warning("Échec de lecture du statut du timer")
+            
+            setpoints_data = setpoints_frame.get_data()
+            
+            # Lire les programmes de timer (0x8000-0x8014)
+            programs = []
+            for i in range(6):  # 6 programmes
+                if bus_scheduler.should_abort():
+                    return None
+                addr = [REGISTER_CHRONO_PROGRAMS[0], REGISTER_CHRONO_PROGRAMS[1] + i * 4]
+                program_frame = self.communicator.send_read_command(addr)
+                if not program_frame:
+                    logger.warning(f"Échec de lecture du programme {i+1}")
                     return None
                 
-                status_data = status_frame.get_data()
-                timer_enabled = (status_data[0] & 0x01) == 1
-                
-                chrono_data = {
-                    'timer_enabled': timer_enabled,
-                    'programs': programs,
-                    'days': days
+                program_data = program_frame.get_data()
+                program = {
+                    'number': i + 1,
+                    'start_hour': program_data[0],
+                    'start_minute': program_data[1],
+                    'stop_hour': program_data[2],
+                    'stop_minute': program_data[3],
+                    'setpoint': setpoints_data[i] / 5.0 if setpoints_data[i] > 0 else 0  # Conversion pour fluide type 0
                 }
+                programs.append(program)
+            
+            # Lire la programmation par jour (0x8018-0x802A)
+            days = []
+            for i in range(7):  # 7 jours
+                if bus_scheduler.should_abort():
+                    return None
+                addr = [REGISTER_CHRONO_DAYS[0], REGISTER_CHRONO_DAYS[1] + i * 3]
+                day_frame = self.communicator.send_read_command(addr)
+                if not day_frame:
+                    logger.warning(f"Échec de lecture du jour {i+1}")
+                    return None
                 
-                # Mettre à jour l'état
-                self.state['chrono_programs'] = programs
-                self.state['chrono_days'] = days
-                self.state['timer_enabled'] = timer_enabled
-                
-                logger.info(f"Données du chrono lues: Timer {'activé' if timer_enabled else 'désactivé'}")
-                return chrono_data
+                day_data = day_frame.get_data()
+                day = {
+                    'day_number': i + 1,
+                    'day_name': ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'][i],
+                    'memory_1': day_data[0],
+                    'memory_2': day_data[1],
+                    'memory_3': day_data[2]
+                }
+                days.append(day)
             
-            except Exception as e:
-                logger.error(f"Erreur lors de la lecture des données du chrono: {e}")
+            # Lire le statut du timer (0x207E)
+            status_frame = self.communicator.send_read_command(REGISTER_CHRONO_STATUS)
+            if not status_frame:
+                logger.warning("Échec de lecture du statut du timer")
                 return None
+            
+            status_data = status_frame.get_data()
+            timer_enabled = (status_data[0] & 0x01) == 1
+            
+            chrono_data = {
+                'timer_enabled': timer_enabled,
+                'programs': programs,
+                'days': days
+            }
+            
+            # Mettre à jour l'état
+            previous = (self.state['chrono_programs'], self.state['chrono_days'], self.state['timer_enabled'])
+            if (programs, days, timer_enabled) != previous:
+                self.chrono_generation += 1
+            self.state['chrono_programs'] = programs
+            self.state['chrono_days'] = days
+            self.state['timer_enabled'] = timer_enabled
+            self.step_read_times['chrono'] = time.time()
+            
+            logger.info(f"Données du chrono lues: Timer {'activé' if timer_enabled else 'désactivé'}")
+            return chrono_data
         
-        # Exécuter l'opération avec gestion des conflits
-        return self._execute_operation('chrono_data', _read_chrono_data)
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture des données du chrono: {e}")
+            return None
+    
+    def _invalidate_chrono(self):
+        """Forcer la relecture du chrono après une écriture (et changer l'ETag des données servies)"""
+        self.step_read_times.pop('chrono', None)
+        self.chrono_generation += 1
     
     def set_chrono_program(self, program_number, start_hour, start_minute, stop_hour, stop_minute, setpoint):
         """
@@ -623,6 +928,7 @@ class PalazzettiController:
                 return False
             
             logger.info(f"Programme {program_number} configuré avec succès")
+            self._invalidate_chrono()
             return True
             
         except Exception as e:
@@ -661,6 +967,7 @@ class PalazzettiController:
                 return False
             
             logger.info(f"{day_names[day_number-1]} configuré avec succès")
+            self._invalidate_chrono()
             return True
             
         except Exception as e:
@@ -703,6 +1010,7 @@ class PalazzettiController:
             self.state['timer_enabled'] = enabled
             
             logger.info(f"Timer {'activé' if enabled else 'désactivé'} avec succès")
+            self._invalidate_chrono()
             return True
             
         except Exception as e:
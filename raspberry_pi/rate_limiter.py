@@ -0,0 +1,136 @@
+"""
+Contrôle d'admission des requêtes HTTP pour protéger le bus série
+
+Chaque client (adresse IP) dispose d'un seau à jetons par classe de requête:
+- bus_read: requêtes qui forceraient une lecture sur le bus (données en cache
+  expirées, rafraîchissement). Hors budget, elles sont servies depuis le cache.
+- command: écritures (consigne, chrono, remplissage). Hors budget: 429.
+Un seau global limite en plus la fréquence des rafraîchissements forcés, tous
+clients confondus, pour que le bus reste disponible pour les commandes.
+"""
+import time
+import threading
+import logging
+from collections import OrderedDict
+from config import RATE_LIMITS, FORCED_REFRESH_LIMIT, RATE_LIMIT_MAX_CLIENTS
+
+logger = logging.getLogger(__name__)
+
+# Classes de requêtes
+CLASS_BUS_READ = 'bus_read'
+CLASS_COMMAND = 'command'
+
+
+class TokenBucket:
+    """Seau à jetons: rate jetons par seconde, au plus burst en réserve"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, tokens=1):
+        """
+        Prendre des jetons si disponibles
+
+        Returns:
+            bool: True si la requête est admise
+        """
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, tokens=1):
+        """Secondes avant que tokens jetons soient disponibles"""
+        self._refill()
+        if self.tokens >= tokens or self.rate <= 0:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Seaux à jetons par client et par classe, plus un seau global de rafraîchissement"""
+
+    def __init__(self, limits=RATE_LIMITS, refresh_limit=FORCED_REFRESH_LIMIT, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.limits = limits  # Classe → (jetons par seconde, réserve)
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()  # (client, classe) → TokenBucket, le moins récent en tête
+        self.refresh_bucket = TokenBucket(*refresh_limit)
+        self.lock = threading.Lock()
+        self.admitted = {name: 0 for name in limits}
+        self.limited = {name: 0 for name in limits}
+        self.refresh_limited = 0
+
+    def _bucket(self, client, endpoint_class):
+        """Seau d'un client (les clients inactifs les plus anciens sont oubliés)"""
+        key = (client, endpoint_class)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(*self.limits[endpoint_class])
+            while len(self.buckets) > self.max_clients * len(self.limits):
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    def allow(self, client, endpoint_class):
+        """
+        Admettre ou non une requête d'un client
+
+        Args:
+            client: Identifiant du client (adresse IP)
+            endpoint_class: CLASS_BUS_READ ou CLASS_COMMAND
+
+        Returns:
+            bool: True si la requête est dans le budget du client
+        """
+        with self.lock:
+            if self._bucket(client, endpoint_class).consume():
+                self.admitted[endpoint_class] += 1
+                return True
+            self.limited[endpoint_class] += 1
+        logger.debug(f"Client {client} hors budget ({endpoint_class})")
+        return False
+
+    def allow_forced_refresh(self, client):
+        """
+        Admettre un rafraîchissement forcé: budget du client puis plafond global
+
+        Returns:
+            bool: True si la lecture peut avoir lieu
+        """
+        if not self.allow(client, CLASS_BUS_READ):
+            return False
+        with self.lock:
+            if self.refresh_bucket.consume():
+                return True
+            self.refresh_limited += 1
+        logger.info("Plafond global de rafraîchissements forcés atteint - réponse depuis le cache")
+        return False
+
+    def retry_after(self, client, endpoint_class):
+        """Secondes avant la prochaine requête admise pour ce client"""
+        with self.lock:
+            return self._bucket(client, endpoint_class).retry_after()
+
+    def get_status(self):
+        """Obtenir les compteurs du limiteur"""
+        with self.lock:
+            return {
+                'clients': len({client for client, _ in self.buckets}),
+                'admitted': dict(self.admitted),
+                'limited': dict(self.limited),
+                'refresh_limited': self.refresh_limited
+            }
+
+
+# Instance globale du limiteur
+rate_limiter = RateLimiter()
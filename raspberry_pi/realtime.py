@@ -0,0 +1,285 @@
+"""
+Canal temps réel WebSocket: diffusion des différences d'état et commandes
+
+Messages serveur → client (JSON):
+    {"type": "snapshot", "version": n, "state": {...}}       à la connexion
+    {"type": "diff", "version": n, "changes": {...}}         à chaque publication
+    {"type": "ack", "id": ..., "command": ...}               commande acceptée et mise en file
+    {"type": "result", "id": ..., "success": bool, ...}      commande exécutée
+    {"type": "error", "id": ..., "error": "..."}             message ou commande invalide
+
+Messages client → serveur:
+    {"id": "abc", "type": "command", "command": "set_temperature", "params": {"temperature": 21}}
+    {"id": "abc", "type": "ping"}
+"""
+import json
+import queue
+import threading
+import logging
+from bus_scheduler import bus_scheduler, PRIORITY_COMMAND, PRIORITY_INTERACTIVE
+from rate_limiter import rate_limiter, CLASS_COMMAND
+from config import REALTIME_SEND_QUEUE_SIZE, REALTIME_MAX_CLIENTS
+
+logger = logging.getLogger(__name__)
+
+
+def _set_temperature(controller, params):
+    return controller.set_temperature(float(params['temperature']))
+
+
+def _set_chrono_program(controller, params):
+    return controller.set_chrono_program(
+        int(params['program_number']),
+        int(params['start_hour']),
+        int(params['start_minute']),
+        int(params['stop_hour']),
+        int(params['stop_minute']),
+        float(params['setpoint'])
+    )
+
+
+def _set_chrono_day(controller, params):
+    return controller.set_chrono_day(
+        int(params['day_number']),
+        int(params['memory_1']),
+        int(params['memory_2']),
+        int(params['memory_3'])
+    )
+
+
+def _set_chrono_status(controller, params):
+    return controller.set_chrono_status(bool(params['enabled']))
+
+
+def _refresh(controller, params):
+    return controller.force_state_refresh().get('synchronized', False)
+
+
+# Commandes acceptées: nom → (fonction, priorité dans la file du bus)
+COMMANDS = {
+    'set_temperature': (_set_temperature, PRIORITY_COMMAND),
+    'set_chrono_program': (_set_chrono_program, PRIORITY_COMMAND),
+    'set_chrono_day': (_set_chrono_day, PRIORITY_COMMAND),
+    'set_chrono_status': (_set_chrono_status, PRIORITY_COMMAND),
+    'refresh': (_refresh, PRIORITY_INTERACTIVE),
+}
+
+
+class RealtimeClient:
+    """Client WebSocket connecté, avec sa file d'envoi et son thread d'émission"""
+
+    def __init__(self, ws, address=None):
+        self.ws = ws
+        self.address = address  # Adresse du client (contrôle d'admission)
+        self.outbox = queue.Queue(maxsize=REALTIME_SEND_QUEUE_SIZE)
+        self.closed = False
+        self.sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self.sender_thread.start()
+
+    def send(self, message):
+        """
+        Mettre un message en file d'envoi (non bloquant)
+
+        Returns:
+            bool: False si le client ne suit pas et doit être déconnecté
+        """
+        try:
+            self.outbox.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        """Arrêter le thread d'émission"""
+        self.closed = True
+        try:
+            self.outbox.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _sender_loop(self):
+        """Émettre les messages en file, dans l'ordre"""
+        while not self.closed:
+            message = self.outbox.get()
+            if message is None:
+                break
+            try:
+                self.ws.send(json.dumps(message))
+            except Exception as e:
+                logger.debug(f"Envoi WebSocket impossible, client fermé: {e}")
+                self.closed = True
+
+
+class RealtimeHub:
+    """Diffusion des instantanés d'état et exécution des commandes WebSocket"""
+
+    def __init__(self):
+        self.controller = None
+        self.clients = set()
+        self.lock = threading.Lock()  # Protège clients, last_state et version
+        self.last_state = {}
+        self.version = 0
+        self.reserved = 0  # Places réservées par les connexions en cours (voir reserve())
+
+    def initialize(self, controller):
+        """Initialiser le hub avec le contrôleur"""
+        self.controller = controller
+
+    def reserve(self):
+        """
+        Réserver une place de client avant la mise à niveau WebSocket
+
+        Chaque connexion occupe un thread du pool HTTP pendant toute sa durée:
+        au-delà de REALTIME_MAX_CLIENTS, la connexion est refusée.
+
+        Returns:
+            bool: False si toutes les places sont prises
+        """
+        with self.lock:
+            if self.reserved >= REALTIME_MAX_CLIENTS:
+                return False
+            self.reserved += 1
+            return True
+
+    def release(self):
+        """Libérer une place réservée (fin de la requête WebSocket)"""
+        with self.lock:
+            self.reserved = max(0, self.reserved - 1)
+
+    def publish(self, state):
+        """
+        Diffuser les champs modifiés d'un instantané (abonné du contrôleur)
+
+        Args:
+            state: Copie de l'état publiée par le contrôleur
+        """
+        with self.lock:
+            changes = {key: value for key, value in state.items() if self.last_state.get(key, object()) != value}
+            if not changes:
+                return
+            self.last_state = dict(state)
+            self.version += 1
+            message = {'type': 'diff', 'version': self.version, 'changes': changes}
+            clients = list(self.clients)
+
+        for client in clients:
+            if not client.send(message):
+                logger.warning("Client WebSocket trop lent - déconnexion")
+                self._drop(client)
+
+    def _drop(self, client):
+        """Retirer un client et fermer sa connexion (la boucle de réception s'arrête)"""
+        with self.lock:
+            self.clients.discard(client)
+        client.close()
+        # Trame de fermeture envoyée hors du thread appelant: un client lent ne bloque pas la diffusion
+        threading.Thread(target=self._close_ws, args=(client.ws,), daemon=True).start()
+
+    @staticmethod
+    def _close_ws(ws):
+        """Fermer une connexion WebSocket en ignorant les erreurs (déjà fermée)"""
+        try:
+            ws.close()
+        except Exception as e:
+            logger.debug(f"Fermeture WebSocket: {e}")
+
+    def handle(self, ws, address=None):
+        """
+        Servir une connexion WebSocket jusqu'à sa fermeture
+
+        Args:
+            ws: Connexion WebSocket (send/receive)
+            address: Adresse du client (contrôle d'admission)
+        """
+        client = RealtimeClient(ws, address)
+        with self.lock:
+            self.clients.add(client)
+            state = self.last_state or (self.controller.state.copy() if self.controller else {})
+            client.send({'type': 'snapshot', 'version': self.version, 'state': state})
+        logger.info(f"Client WebSocket connecté ({len(self.clients)} actifs)")
+
+        try:
+            while not client.closed:
+                raw = ws.receive()
+                if raw is None:
+                    break
+                self._handle_message(client, raw)
+        except Exception as e:
+            logger.debug(f"Connexion WebSocket terminée: {e}")
+        finally:
+            self._drop(client)
+            logger.info(f"Client WebSocket déconnecté ({len(self.clients)} actifs)")
+
+    def _handle_message(self, client, raw):
+        """Traiter un message reçu d'un client"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            client.send({'type': 'error', 'id': None, 'error': 'JSON invalide'})
+            return
+        if not isinstance(message, dict):
+            client.send({'type': 'error', 'id': None, 'error': 'JSON invalide'})
+            return
+
+        message_id = message.get('id')
+        kind = message.get('type')
+        if kind == 'ping':
+            client.send({'type': 'pong', 'id': message_id, 'version': self.version})
+            return
+        if kind != 'command':
+            client.send({'type': 'error', 'id': message_id, 'error': f'Type de message inconnu: {kind}'})
+            return
+
+        name = message.get('command')
+        if not isinstance(name, str) or name not in COMMANDS:
+            client.send({'type': 'error', 'id': message_id, 'error': f'Commande inconnue: {name}'})
+            return
+        params = message.get('params') or {}
+        if not isinstance(params, dict):
+            client.send({'type': 'error', 'id': message_id, 'error': 'Paramètres invalides (objet JSON attendu)'})
+            return
+        if self.controller is None or not self.controller.is_connected():
+            client.send({'type': 'result', 'id': message_id, 'success': False, 'error': 'Poêle non connecté'})
+            return
+
+        # Même budget que les APIs HTTP: écritures par client, rafraîchissements plafonnés globalement
+        if name == 'refresh':
+            admitted = rate_limiter.allow_forced_refresh(client.address)
+        else:
+            admitted = rate_limiter.allow(client.address, CLASS_COMMAND)
+        if not admitted:
+            client.send({'type': 'result', 'id': message_id, 'success': False, 'error': 'Trop de requêtes'})
+            return
+
+        func, priority = COMMANDS[name]
+
+        def _command():
+            return func(self.controller, params)
+
+        def _on_done(job):
+            success = bool(job.result) and job.error is None
+            client.send({
+                'type': 'result',
+                'id': message_id,
+                'job': job.id,
+                'success': success,
+                'error': str(job.error) if job.error else None,
+                'duration': round(job.finished - job.started, 3)
+            })
+            # Les autres clients voient l'effet de la commande sans attendre la surveillance
+            if success and self.controller:
+                self.publish(self.controller.state.copy())
+
+        # Accusé de réception avant la mise en file: il précède toujours le résultat
+        client.send({'type': 'ack', 'id': message_id, 'command': name})
+        # Client déconnecté avant son tour: la commande est abandonnée sans accès au bus
+        bus_scheduler.submit(f"ws_{name}", _command, priority, callback=_on_done, cancel_check=lambda: client.closed)
+
+    def get_status(self):
+        """Obtenir l'état du hub"""
+        with self.lock:
+            return {'clients': len(self.clients), 'max_clients': REALTIME_MAX_CLIENTS, 'version': self.version}
+
+
+# Instance globale du hub temps réel
+realtime_hub = RealtimeHub()
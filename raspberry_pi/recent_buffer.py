@@ -0,0 +1,114 @@
+"""
+Tampons circulaires en mémoire des derniers échantillons du poêle
+
+Les colonnes sont des array préalloués de taille fixe: la mémoire reste
+constante quelle que soit la durée de fonctionnement et l'ajout d'un échantillon
+n'alloue rien. Sert les graphiques courte durée sans accès au stockage.
+Les températures sont gardées en double précision: les colonnes sont servies
+telles quelles, sans conversion par échantillon.
+"""
+import threading
+from array import array
+from config import MONITOR_INTERVAL, RECENT_BUFFER_SIZE
+
+# Colonnes: (nom, code de type array)
+RECENT_COLUMNS = (
+    ('t', 'I'),            # Timestamp (s)
+    ('temperature', 'd'),  # °C
+    ('setpoint', 'd'),     # °C
+    ('status', 'H'),       # Code statut
+    ('pqt', 'H'),          # Compteur de consommation
+)
+
+
+class RecentBuffer:
+    """Derniers échantillons en colonnes circulaires"""
+
+    def __init__(self, size=RECENT_BUFFER_SIZE):
+        if size <= 0:
+            raise ValueError(f"Taille du tampon invalide: {size} (RECENT_BUFFER_SIZE doit être positif)")
+        self.size = size
+        self.lock = threading.Lock()
+        self.columns = {name: array(typecode, [0]) * size for name, typecode in RECENT_COLUMNS}
+        self.next_index = 0  # Prochaine position d'écriture
+        self.count = 0       # Échantillons valides (<= size)
+
+    def append(self, timestamp, temperature, setpoint, status, pqt):
+        """
+        Ajouter un échantillon, en écrasant le plus ancien si le tampon est plein
+
+        Returns:
+            bool: True si l'échantillon a été ajouté, False s'il est ignoré
+        """
+        timestamp = int(timestamp)
+        with self.lock:
+            # Timestamps strictement croissants: un état republié sans nouvelle lecture est ignoré
+            if self.count and timestamp <= self.columns['t'][self.next_index - 1]:
+                return False
+            i = self.next_index
+            self.columns['t'][i] = timestamp
+            self.columns['temperature'][i] = temperature
+            self.columns['setpoint'][i] = setpoint
+            self.columns['status'][i] = int(status) & 0xFFFF
+            self.columns['pqt'][i] = int(pqt) & 0xFFFF
+            self.next_index = (i + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+            return True
+
+    def record_snapshot(self, state):
+        """Ajouter un instantané d'état publié par le contrôleur"""
+        if not state.get('connected') or not state.get('synchronized') or state.get('link_down'):
+            return
+        if state.get('temperature') is None or state.get('status_code') is None:
+            return
+        self.append(
+            state.get('timestamp') or 0,
+            state['temperature'],
+            state.get('setpoint') or 0,
+            state['status_code'],
+            state.get('pellet_consumption') or 0
+        )
+
+    def snapshot(self, since=None):
+        """
+        Obtenir les échantillons dans l'ordre chronologique, en colonnes
+
+        Args:
+            since: Ne garder que les échantillons de timestamp > since
+
+        Returns:
+            dict: Une liste par colonne (toutes de même longueur)
+        """
+        with self.lock:
+            oldest = (self.next_index - self.count) % self.size
+            first = 0
+            if since is not None:
+                # Timestamps strictement croissants: recherche dichotomique du premier échantillon postérieur
+                times = self.columns['t']
+                low, high = 0, self.count
+                while low < high:
+                    middle = (low + high) // 2
+                    if times[(oldest + middle) % self.size] <= since:
+                        low = middle + 1
+                    else:
+                        high = middle
+                first = low
+
+            start = (oldest + first) % self.size
+            length = self.count - first
+            result = {}
+            for name, column in self.columns.items():
+                if start + length <= self.size:
+                    result[name] = column[start:start + length].tolist()
+                else:
+                    result[name] = column[start:].tolist() + column[:self.next_index].tolist()
+            return result
+
+    def get_status(self):
+        """Obtenir la taille et le remplissage du tampon"""
+        return {
+            'size': self.size,
+            'count': self.count,
+            'span_seconds': self.count * MONITOR_INTERVAL,
+            'memory_bytes': sum(column.itemsize * len(column) for column in self.columns.values())
+        }
@@ -0,0 +1,145 @@
+"""
+Cache des réponses JSON pré-sérialisées
+
+Les APIs de lecture les plus sollicitées (/api/state, /api/chrono_data)
+renvoient le même contenu à tous les clients tant que la version de l'état ne
+change pas. Le corps JSON est donc sérialisé une seule fois par version, ainsi
+que ses variantes gzip et brotli (calculées à la première demande), puis servi
+tel quel depuis la mémoire: une requête ne coûte plus qu'une recherche dans un
+dictionnaire et l'écriture des octets.
+
+brotli est optionnel: sans le paquet, seules les variantes identité et gzip
+sont proposées.
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from flask import Response
+from config import RESPONSE_CACHE_SIZE, RESPONSE_COMPRESS_MIN_SIZE
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Encodages proposés, par ordre de préférence
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+RESPONSE_CACHE = metrics.counter(
+    'palazzetti_response_cache_total', "Réponses servies déjà sérialisées (hit) ou à sérialiser (miss)", ('route', 'result'))
+
+
+def _compress(data, encoding):
+    """Compresser un corps pour un encodage donné"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+class SerializedBody:
+    """Corps JSON d'une version, avec ses variantes compressées"""
+
+    def __init__(self, version, data):
+        self.version = version
+        self.data = data
+        self.encoded = {}  # Encodage → octets compressés
+        self.lock = threading.Lock()
+
+    def variant(self, encoding):
+        """
+        Obtenir le corps pour un encodage (compressé une seule fois)
+
+        Returns:
+            bytes: Corps encodé
+        """
+        body = self.encoded.get(encoding)
+        if body is None:
+            with self.lock:
+                body = self.encoded.get(encoding)
+                if body is None:
+                    body = self.encoded[encoding] = _compress(self.data, encoding)
+        return body
+
+
+class ResponseCache:
+    """Corps sérialisés par clé de requête, remplacés à chaque nouvelle version"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Clé → SerializedBody (ordre LRU)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        """
+        Obtenir le corps sérialisé d'une requête
+
+        Args:
+            key: Clé de la requête (route et paramètres)
+            version: Version du contenu; une version différente provoque une nouvelle sérialisation
+            build: Fonction sans argument renvoyant le contenu (dict) à sérialiser
+
+        Returns:
+            SerializedBody
+        """
+        route = key[0] if isinstance(key, tuple) else key
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                RESPONSE_CACHE.inc(route=route, result='hit')
+                return entry
+            self.misses += 1
+        RESPONSE_CACHE.inc(route=route, result='miss')
+
+        # Même format que jsonify (clés triées, séparateurs compacts)
+        data = json.dumps(build(), sort_keys=True, separators=(',', ':')).encode() + b'\n'
+        entry = SerializedBody(version, data)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def respond(self, entry, accept_encodings):
+        """
+        Construire la réponse avec le meilleur encodage accepté par le client
+
+        Args:
+            entry: SerializedBody
+            accept_encodings: En-tête Accept-Encoding analysé (request.accept_encodings)
+
+        Returns:
+            flask.Response
+        """
+        body = entry.data
+        encoding = None
+        if len(body) >= RESPONSE_COMPRESS_MIN_SIZE:
+            encoding = next((name for name in ENCODINGS if accept_encodings[name]), None)
+            if encoding:
+                body = entry.variant(encoding)
+
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def get_status(self):
+        """Obtenir les statistiques du cache"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'encodings': list(ENCODINGS)
+            }
+
+
+# Instance globale du cache de réponses
+response_cache = ResponseCache()
@@ -6,9 +6,114 @@ import time
 import threading
 import logging
 from frame import Frame, construct_read_frame, construct_write_frame
+from bus_scheduler import bus_scheduler
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# États du disjoncteur de transactions
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+
+# Métriques des transactions (étiquettes: registre 0xMMLL, read/write)
+SYNC_WAIT = metrics.histogram(
+    'palazzetti_serial_sync_wait_seconds', "Attente de la trame de synchronisation", ('register', 'kind'))
+RESPONSE_WAIT = metrics.histogram(
+    'palazzetti_serial_response_wait_seconds', "Attente de la réponse après l'envoi de la commande", ('register', 'kind'))
+TRANSACTION_TIME = metrics.histogram(
+    'palazzetti_serial_transaction_seconds', "Durée totale d'une transaction, tentatives comprises", ('register', 'kind', 'result'))
+RETRIES = metrics.counter(
+    'palazzetti_serial_retries_total', "Tentatives supplémentaires d'une transaction", ('register', 'kind'))
+CHECKSUM_FAILURES = metrics.counter(
+    'palazzetti_serial_checksum_failures_total', "Trames reçues avec un checksum invalide")
+RESYNC_BYTES = metrics.counter(
+    'palazzetti_serial_resync_bytes_total', "Octets écartés (trames invalides) en attendant une trame valide")
+
+
+def _register_label(address):
+    """Étiquette d'un registre: 0xMMLL"""
+    return f"0x{address[0]:02X}{address[1]:02X}"
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur des transactions série
+    
+    Après failure_threshold transactions consécutives en échec, le disjoncteur
+    s'ouvre: les transactions ordinaires échouent immédiatement au lieu de
+    parcourir toutes leurs tentatives. Seule une transaction de sonde, au plus
+    une toutes les probe_interval secondes, peut alors passer pour le refermer.
+    """
+    
+    def __init__(self, failure_threshold=3, probe_interval=15):
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_probe = 0
+        self.lock = threading.Lock()
+    
+    def is_open(self):
+        """Vérifier si le disjoncteur est ouvert (lien considéré comme coupé)"""
+        return self.state == BREAKER_OPEN
+    
+    def allow(self, probe=False):
+        """
+        Vérifier si une transaction peut être envoyée sur le bus
+        
+        Args:
+            probe: True pour une transaction de sonde (superviseur uniquement)
+        
+        Returns:
+            bool: True si la transaction peut être envoyée
+        """
+        with self.lock:
+            if self.state == BREAKER_CLOSED:
+                return True
+            if probe and time.time() - self.last_probe >= self.probe_interval:
+                self.last_probe = time.time()
+                return True
+            return False
+    
+    def is_probe_due(self):
+        """Vérifier si une sonde peut être envoyée pour refermer le disjoncteur"""
+        return self.is_open() and time.time() - self.last_probe >= self.probe_interval
+    
+    def record_success(self):
+        """Enregistrer une transaction réussie (referme le disjoncteur)"""
+        with self.lock:
+            if self.state == BREAKER_OPEN:
+                logger.info("Disjoncteur refermé - le poêle répond à nouveau")
+            self.state = BREAKER_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        """Enregistrer une transaction en échec (peut ouvrir le disjoncteur)"""
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == BREAKER_CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.state = BREAKER_OPEN
+                self.opened_at = time.time()
+                self.last_probe = self.opened_at
+                logger.warning(f"Disjoncteur ouvert après {self.consecutive_failures} transactions en échec")
+    
+    def reset(self):
+        """Réinitialiser le disjoncteur (nouvelle connexion)"""
+        with self.lock:
+            self.state = BREAKER_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+    
+    def get_status(self):
+        """Obtenir l'état du disjoncteur"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'opened_at': self.opened_at
+        }
+
 
 class SerialCommunicator:
     """Gestionnaire de communication série avec le poêle Palazzetti"""
@@ -16,6 +121,9 @@ class SerialCommunicator:
     def __init__(self):
         self.serial_connection = None
         self.lock = threading.Lock()
+        self.last_frame_time = 0  # Timestamp de la dernière trame valide reçue (vivacité passive)
+        from config import BREAKER_FAILURE_THRESHOLD, BREAKER_PROBE_INTERVAL
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_PROBE_INTERVAL)
         
     def connect(self, port, baudrate=38400, timeout=10):
         """
@@ -29,29 +137,32 @@ class SerialCommunicator:
         Returns:
             bool: True si connexion réussie, False sinon
         """
-        try:
-            self.serial_connection = serial.Serial(
-                port=port,
-                baudrate=baudrate,
-                timeout=timeout,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_TWO,  # 2 stop bits selon documentation
-            )
-            logger.info(f"Connexion série établie sur {port} ({baudrate}, 8N2)")
-            
-            # Test de communication pour vérifier que le poêle répond
-            if self._test_communication():
-                logger.info("Test de communication réussi - poêle détecté")
-                return True
-            else:
-                logger.warning("Test de communication échoué - câble peut-être déconnecté")
-                self.disconnect()
-                return False
+        # Verrou pour ne pas remplacer le port pendant une transaction en cours
+        with self.lock:
+            try:
+                self.serial_connection = serial.Serial(
+                    port=port,
+                    baudrate=baudrate,
+                    timeout=timeout,
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_TWO,  # 2 stop bits selon documentation
+                )
+                logger.info(f"Connexion série établie sur {port} ({baudrate}, 8N2)")
                 
-        except Exception as e:
-            logger.error(f"Erreur de connexion série: {e}")
-            return False
+                # Test de communication pour vérifier que le poêle répond
+                if self._test_communication():
+                    logger.info("Test de communication réussi - poêle détecté")
+                    self.breaker.reset()
+                    return True
+                else:
+                    logger.warning("Test de communication échoué - câble peut-être déconnecté")
+                    self.disconnect()
+                    return False
+                    
+            except Exception as e:
+                logger.error(f"Erreur de connexion série: {e}")
+                return False
     
     def _test_communication(self):
         """
@@ -82,28 +193,63 @@ class SerialCommunicator:
         except Exception as e:
             logger.warning(f"Erreur lors de la fermeture de la connexion série: {e}")
     
-    def is_connected(self):
-        """Vérifier si la connexion est active"""
-        if not self.serial_connection:
-            return False
+    def is_port_open(self):
+        """Vérifier si le port série est ouvert (sans communication sur le bus)"""
+        return bool(self.serial_connection and self.serial_connection.is_open)
+    
+    def get_silence_duration(self):
+        """
+        Obtenir la durée écoulée depuis la dernière trame valide reçue
         
-        if not self.serial_connection.is_open:
+        Returns:
+            float: Durée en secondes, ou None si aucune trame n'a jamais été reçue
+        """
+        if not self.last_frame_time:
+            return None
+        return time.time() - self.last_frame_time
+    
+    def check_liveness(self, max_silence, listen_timeout):
+        """
+        Vérifier la vivacité du lien de manière passive
+        
+        Toute trame valide reçue (synchronisation ou réponse) prouve que le poêle
+        répond. Le bus n'est écouté que si aucune trame n'a été vue depuis
+        max_silence secondes et qu'aucune transaction n'est en cours.
+        
+        Args:
+            max_silence: Silence maximal toléré sans écoute du bus (secondes)
+            listen_timeout: Durée d'écoute d'une trame de synchronisation (secondes)
+        
+        Returns:
+            bool: True si le poêle répond, False sinon
+        """
+        if not self.is_port_open():
             return False
         
-        # Test de communication pour vérifier que le poêle répond
+        silence = self.get_silence_duration()
+        if silence is not None and silence < max_silence:
+            return True
+        
+        # Une transaction en cours mettra à jour last_frame_time par elle-même
+        if not self.lock.acquire(blocking=False):
+            return True
         try:
-            # Tenter de lire une trame de synchronisation avec un timeout configurable
-            from config import CONNECTION_TEST_TIMEOUT
-            sync_frame = self.synchro_trame(0x00, timeout=CONNECTION_TEST_TIMEOUT)
+            sync_frame = self.synchro_trame(0x00, timeout=listen_timeout)
             if sync_frame:
-                logger.debug("Test de connexion réussi - poêle répond")
+                logger.debug("Test de vivacité réussi - poêle répond")
                 return True
-            else:
-                logger.debug("Aucune trame de synchronisation reçue - connexion considérée comme perdue")
-                return False
+            logger.debug("Aucune trame de synchronisation reçue - lien considéré comme perdu")
+            return False
         except Exception as e:
-            logger.debug(f"Erreur lors du test de connexion: {e}")
+            logger.debug(f"Erreur lors du test de vivacité: {e}")
             return False
+        finally:
+            self.lock.release()
+    
+    def is_connected(self):
+        """Vérifier si la connexion est active"""
+        from config import CONNECTION_TEST_TIMEOUT
+        return self.check_liveness(CONNECTION_TEST_TIMEOUT, CONNECTION_TEST_TIMEOUT)
     
     def synchro_trame(self, expected_id, timeout=5):
         """
@@ -125,29 +271,42 @@ class SerialCommunicator:
                 buffer = self.serial_connection.read(11)
                 frame = Frame(buffer=buffer)
                 if frame.is_valid():
+                    self.last_frame_time = time.time()
                     if frame.get_id() == expected_id:
                         logger.debug(f"Trame trouvée avec ID 0x{expected_id:02X}")
                         return frame
+                else:
+                    CHECKSUM_FAILURES.inc()
+                    RESYNC_BYTES.inc(len(buffer))
             # Pas de sleep pour être plus réactif comme le code C#
         
         logger.debug(f"Timeout: aucune trame avec ID 0x{expected_id:02X} reçue")
         return None
     
-    def send_read_command(self, address):
+    def send_read_command(self, address, probe=False):
         """
         Envoyer une commande de lecture pour une adresse donnée
         Implémentation basée sur le code C# ReadRegisterWithID
         
         Args:
             address: Adresse du registre à lire [MSB, LSB]
+            probe: True pour une sonde du disjoncteur (une seule tentative)
         
         Returns:
-            Frame ou None si erreur
+            Frame ou None si erreur ou disjoncteur ouvert
         """
         if not self.serial_connection or not self.serial_connection.is_open:
             logger.error("Connexion série non disponible")
             return None
         
+        if not self.breaker.allow(probe):
+            logger.debug("Disjoncteur ouvert - lecture court-circuitée")
+            return None
+        
+        # Une sonde se limite à une tentative pour borner sa durée
+        max_attempts = 1 if probe else 5
+        register = _register_label(address)
+        
         start_time = time.time()
         with self.lock:
             try:
@@ -156,11 +315,20 @@ class SerialCommunicator:
                 expected_id = read_frame.get_id()
                 
                 # Boucle de retry comme dans le code C# (max 5 tentatives)
-                for attempt in range(5):
-                    logger.debug(f"Tentative {attempt + 1}/5...")
+                for attempt in range(max_attempts):
+                    # Demandeur parti: inutile de consommer d'autres fenêtres de synchronisation
+                    if attempt > 0 and bus_scheduler.should_abort():
+                        logger.debug("Lecture abandonnée - résultat plus attendu")
+                        TRANSACTION_TIME.observe(time.time() - start_time, register=register, kind='read', result='aborted')
+                        return None
+                    logger.debug(f"Tentative {attempt + 1}/{max_attempts}...")
+                    if attempt > 0:
+                        RETRIES.inc(register=register, kind='read')
                     
                     # 1. Attendre la trame de synchronisation (0x00)
+                    wait_start = time.time()
                     sync_frame = self.synchro_trame(0x00, timeout=2)
+                    SYNC_WAIT.observe(time.time() - wait_start, register=register, kind='read')
                     if sync_frame:
                         logger.debug("Trame de synchronisation reçue")
                         
@@ -168,13 +336,18 @@ class SerialCommunicator:
                         logger.debug(f"Envoi commande: {read_frame}")
                         self.serial_connection.write(read_frame.as_bytes())
                         self.serial_connection.flush()
+                        bus_scheduler.record_sync_window()
                         
                         # 3. Attendre la réponse avec le même ID
+                        wait_start = time.time()
                         response = self.synchro_trame(expected_id, timeout=1)
+                        RESPONSE_WAIT.observe(time.time() - wait_start, register=register, kind='read')
                         if response:
                             end_time = time.time()
                             read_duration = end_time - start_time
                             logger.debug(f"Réponse reçue: {response} (⏱️ {read_duration:.3f}s)")
+                            TRANSACTION_TIME.observe(read_duration, register=register, kind='read', result='ok')
+                            self.breaker.record_success()
                             return response
                         else:
                             logger.debug(f"Pas de réponse avec ID 0x{expected_id:02X}")
@@ -183,13 +356,16 @@ class SerialCommunicator:
                 
                 end_time = time.time()
                 read_duration = end_time - start_time
-                logger.error(f"Échec après 5 tentatives (⏱️ {read_duration:.3f}s)")
+                logger.error(f"Échec après {max_attempts} tentatives (⏱️ {read_duration:.3f}s)")
+                TRANSACTION_TIME.observe(read_duration, register=register, kind='read', result='failed')
+                self.breaker.record_failure()
                 return None
                     
             except Exception as e:
                 end_time = time.time()
                 read_duration = end_time - start_time
                 logger.error(f"Erreur lors de l'envoi de commande de lecture: {e} (⏱️ {read_duration:.3f}s)")
+                self.breaker.record_failure()
                 return None
     
     def send_write_command(self, address, value_bytes):
@@ -207,6 +383,11 @@ class SerialCommunicator:
             logger.error("Connexion série non disponible")
             return None
         
+        if not self.breaker.allow():
+            logger.debug("Disjoncteur ouvert - écriture court-circuitée")
+            return None
+        
+        register = _register_label(address)
         start_time = time.time()
         with self.lock:
             try:
@@ -217,9 +398,13 @@ class SerialCommunicator:
                 # Boucle de retry comme pour la lecture (max 2 tentatives)
                 for attempt in range(2):
                     logger.debug(f"Tentative {attempt + 1}/2...")
+                    if attempt > 0:
+                        RETRIES.inc(register=register, kind='write')
                     
                     # 1. Attendre la trame de synchronisation (0x00)
+                    wait_start = time.time()
                     sync_frame = self.synchro_trame(0x00, timeout=5)
+                    SYNC_WAIT.observe(time.time() - wait_start, register=register, kind='write')
                     if sync_frame:
                         logger.debug("Trame de synchronisation reçue")
                         
@@ -227,13 +412,18 @@ class SerialCommunicator:
                         logger.debug(f"Envoi commande: {write_frame}")
                         self.serial_connection.write(write_frame.as_bytes())
                         self.serial_connection.flush()
+                        bus_scheduler.record_sync_window()
                         
                         # 3. Attendre la réponse avec le même ID
+                        wait_start = time.time()
                         response = self.synchro_trame(expected_id, timeout=5)
+                        RESPONSE_WAIT.observe(time.time() - wait_start, register=register, kind='write')
                         if response:
                             end_time = time.time()
                             write_duration = end_time - start_time
                             logger.debug(f"Réponse reçue: {response} (⏱️ {write_duration:.3f}s)")
+                            TRANSACTION_TIME.observe(write_duration, register=register, kind='write', result='ok')
+                            self.breaker.record_success()
                             return response
                         else:
                             logger.debug(f"Pas de réponse avec ID 0x{expected_id:02X}")
@@ -243,11 +433,14 @@ class SerialCommunicator:
                 end_time = time.time()
                 write_duration = end_time - start_time
                 logger.error(f"Échec après 2 tentatives (⏱️ {write_duration:.3f}s)")
+                TRANSACTION_TIME.observe(write_duration, register=register, kind='write', result='failed')
+                self.breaker.record_failure()
                 return None
                     
             except Exception as e:
                 end_time = time.time()
                 write_duration = end_time - start_time
                 logger.error(f"Erreur lors de l'envoi de commande d'écriture: {e} (⏱️ {write_duration:.3f}s)")
+                self.breaker.record_failure()
                 return None
     
@@ -0,0 +1,257 @@
+"""
+Stockage de la consommation de pellets sur SQLite (mode WAL)
+
+Même interface que ConsumptionStorage, avec en plus l'historique des
+échantillons et des événements (remplissages, resets de maintenance).
+Toutes les écritures passent par un unique thread d'écriture qui les regroupe
+dans des transactions; chaque thread lecteur a sa propre connexion, et le mode
+WAL garantit que les lectures ne bloquent jamais l'ingestion.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from consumption_storage import ConsumptionStorage
+from config import CONSUMPTION_FLUSH_INTERVAL, SQLITE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS state (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS samples (
+        timestamp INTEGER PRIMARY KEY,
+        pqt INTEGER NOT NULL,
+        temperature REAL,
+        setpoint REAL,
+        status INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp REAL NOT NULL,
+        type TEXT NOT NULL,
+        consumption INTEGER,
+        details TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON events (type, timestamp)",
+]
+
+# Requêtes constantes: sqlite3 garde leurs instructions préparées en cache par connexion
+SQL_UPSERT_STATE = "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+SQL_SELECT_STATE = "SELECT key, value FROM state"
+SQL_INSERT_SAMPLE = "INSERT OR IGNORE INTO samples (timestamp, pqt, temperature, setpoint, status) VALUES (?, ?, ?, ?, ?)"
+SQL_SELECT_SAMPLES = "SELECT timestamp, pqt, temperature, setpoint, status FROM samples WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp"
+SQL_INSERT_EVENT = "INSERT INTO events (timestamp, type, consumption, details) VALUES (?, ?, ?, ?)"
+SQL_SELECT_EVENTS = "SELECT timestamp, type, consumption, details FROM events WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC LIMIT ?"
+SQL_SELECT_EVENTS_BY_TYPE = "SELECT timestamp, type, consumption, details FROM events WHERE type = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC LIMIT ?"
+
+# Type d'événement par clé de l'état persistant
+EVENT_TYPES = {'last_fill': 'fill', 'maintenance_counter': 'maintenance_reset'}
+
+
+class _WriteRequest:
+    """Écriture en attente dans la file du thread d'écriture"""
+
+    def __init__(self, statements, wait=False):
+        self.statements = statements  # Liste de (sql, paramètres)
+        self.done = threading.Event() if wait else None
+        self.error = None
+
+
+class SQLiteConsumptionStorage(ConsumptionStorage):
+    """Gestionnaire de stockage de la consommation sur SQLite (WAL)"""
+
+    def __init__(self, db_file='consumption.db', flush_interval=CONSUMPTION_FLUSH_INTERVAL,
+                 json_file='consumption_data.json'):
+        self.db_file = db_file
+        self.json_file = json_file  # Ancien fichier JSON importé au premier démarrage
+        self.write_queue = queue.Queue()
+        self.writer_thread = None
+        self.local = threading.local()  # Connexion de lecture par thread
+        self._create_schema()
+        super().__init__(storage_file=db_file, flush_interval=flush_interval)
+
+    def _connect(self):
+        """Ouvrir une connexion configurée pour le mode WAL"""
+        connection = sqlite3.connect(self.db_file, timeout=10, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # Suffisant en WAL, moins d'écritures sur la carte SD
+        return connection
+
+    def _read_connection(self):
+        """Connexion de lecture propre au thread appelant"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self.local.connection = connection
+        return connection
+
+    def _create_schema(self):
+        """Créer les tables et index si nécessaire"""
+        connection = self._connect()
+        try:
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+
+    def _load_data(self):
+        """Charger l'état persistant depuis la base (import du JSON au premier démarrage)"""
+        try:
+            rows = self._read_connection().execute(SQL_SELECT_STATE).fetchall()
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement des données SQLite: {e}")
+            return self._create_default_data()
+
+        if rows:
+            data = self._create_default_data()
+            data.update({key: json.loads(value) for key, value in rows})
+            logger.info(f"Données de consommation chargées depuis {self.db_file}")
+            return data
+
+        if self.json_file and os.path.exists(self.json_file):
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            logger.info(f"Import des données de consommation depuis {self.json_file}")
+            self._execute([(SQL_UPSERT_STATE, (key, json.dumps(value))) for key, value in data.items()], wait=True)
+            return data
+
+        logger.info(f"Base {self.db_file} vide, création des données par défaut")
+        return self._create_default_data()
+
+    def start(self):
+        """Démarrer le thread d'écriture puis la sauvegarde différée"""
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.writer_thread.start()
+        super().start()
+
+    def stop(self):
+        """Écrire les modifications en attente puis arrêter le thread d'écriture"""
+        super().stop()
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.write_queue.put(None)
+            self.writer_thread.join(timeout=10)
+        self.writer_thread = None
+
+    def _writer_loop(self):
+        """Thread d'écriture unique: regroupe les écritures en attente par transaction"""
+        connection = self._connect()
+        running = True
+        while running:
+            batch = [self.write_queue.get()]
+            while len(batch) < SQLITE_BATCH_SIZE:
+                try:
+                    batch.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [request for request in batch if request is not None]
+            self._commit_batch(connection, batch)
+        connection.close()
+        logger.debug("Thread d'écriture SQLite arrêté")
+
+    def _commit_batch(self, connection, batch):
+        """Exécuter un lot d'écritures dans une seule transaction"""
+        if not batch:
+            return
+        try:
+            with connection:
+                for request in batch:
+                    for sql, params in request.statements:
+                        connection.execute(sql, params)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture SQLite ({len(batch)} requêtes): {e}")
+            for request in batch:
+                request.error = e
+        for request in batch:
+            if request.done:
+                request.done.set()
+
+    def _execute(self, statements, wait=False):
+        """
+        Soumettre des écritures au thread d'écriture
+
+        Args:
+            statements: Liste de (sql, paramètres) à exécuter dans la même transaction
+            wait: True pour attendre la validation (écriture durable)
+        """
+        request = _WriteRequest(statements, wait)
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            # Thread d'écriture non démarré: écriture directe
+            connection = self._connect()
+            try:
+                self._commit_batch(connection, [request])
+            finally:
+                connection.close()
+        else:
+            self.write_queue.put(request)
+            if wait:
+                request.done.wait()
+        if request.error:
+            raise request.error
+
+    def _write_atomic(self, data, event_key=None):
+        """
+        Écrire l'état persistant dans la base (une transaction)
+
+        Args:
+            data: État persistant à écrire
+            event_key: Clé de l'événement à ajouter à l'historique dans la même transaction
+        """
+        statements = [(SQL_UPSERT_STATE, (key, json.dumps(value))) for key, value in data.items()]
+        if event_key:
+            statements.append(self._event_statement(data, event_key))
+        self._execute(statements, wait=True)
+
+    def _event_statement(self, data, key):
+        """Requête d'ajout à l'historique de l'événement correspondant à une clé de l'état"""
+        entry = data[key]
+        consumption = entry.get('consumption_at_fill', entry.get('consumption_at_reset'))
+        timestamp = entry.get('timestamp', entry.get('reset_timestamp')) or time.time()
+        return (SQL_INSERT_EVENT, (timestamp, EVENT_TYPES[key], consumption, None))
+
+    def record_sample(self, state):
+        """Ajouter un échantillon (écriture groupée, non bloquante)"""
+        if not state.get('connected') or not state.get('synchronized') or state.get('link_down'):
+            return
+        super().record_sample(state)
+        pqt = state.get('pellet_consumption')
+        if pqt is None:
+            return
+        self._execute([(SQL_INSERT_SAMPLE, (
+            int(state.get('timestamp') or time.time()),
+            pqt,
+            state.get('temperature'),
+            state.get('setpoint'),
+            state.get('status_code')
+        ))])
+
+    def query_samples(self, start, end):
+        """Obtenir les échantillons de la plage [start, end)"""
+        rows = self._read_connection().execute(SQL_SELECT_SAMPLES, (start, end)).fetchall()
+        return [
+            {'timestamp': ts, 'pqt': pqt, 'temperature': temperature, 'setpoint': setpoint, 'status': status}
+            for ts, pqt, temperature, setpoint, status in rows
+        ]
+
+    def get_events(self, event_type=None, start=0, end=None, limit=100):
+        """Obtenir les événements de la plage [start, end), du plus récent au plus ancien"""
+        end = end if end is not None else time.time() + 1
+        connection = self._read_connection()
+        if event_type:
+            rows = connection.execute(SQL_SELECT_EVENTS_BY_TYPE, (event_type, start, end, limit)).fetchall()
+        else:
+            rows = connection.execute(SQL_SELECT_EVENTS, (start, end, limit)).fetchall()
+        return [
+            {'timestamp': ts, 'type': kind, 'consumption': consumption, 'details': details}
+            for ts, kind, consumption, details in rows
+        ]
@@ -0,0 +1,99 @@
+"""
+Test de l'ETag et du cache de réponse de /api/chrono_data après un changement du timer
+
+Le poêle est simulé par un port série en mémoire qui répond aux lectures et
+mémorise les écritures: aucune connexion réelle n'est nécessaire.
+"""
+import sys
+import os
+import tempfile
+import threading
+
+# Ajouter le répertoire raspberry_pi au path pour importer les modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'raspberry_pi'))
+
+import pytest
+import serial
+from frame import Frame
+
+
+class SimulatedStove:
+    """Port série simulé: trames de synchronisation, lectures et écritures de registres"""
+
+    registers = {}  # (adresse haute, adresse basse) → 9 octets de données
+
+    def __init__(self, *args, **kwargs):
+        self.is_open = True
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            if len(self.buffer) < 11:
+                self.buffer += Frame(frame_id=0x00, data=[0] * 9).as_bytes()
+            return len(self.buffer)
+
+    def read(self, size):
+        with self.lock:
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            return data
+
+    def write(self, data):
+        frame_id, address = data[0], (data[2], data[1])
+        if frame_id == 0x01:
+            SimulatedStove.registers[address] = list(data[3:10]) + [0, 0]
+        values = SimulatedStove.registers.get(address, [0x10, 0x01, 0, 0, 0, 0, 0, 0, 0])
+        with self.lock:
+            self.buffer = bytearray(Frame(frame_id=frame_id, data=list(values)).as_bytes())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+import app as palazzetti_app
+from bus_scheduler import bus_scheduler
+from palazzetti_controller import PalazzettiController
+from consumption_storage import ConsumptionStorage
+
+
+def test_timer_toggle_changes_chrono_etag(monkeypatch, tmp_path):
+    """Après un changement du timer, l'ancien ETag n'obtient plus de 304 et le corps est à jour"""
+    monkeypatch.setattr(serial, 'Serial', SimulatedStove)
+    monkeypatch.setattr(SimulatedStove, 'registers', {})
+    controller = PalazzettiController()
+    assert controller.connect('/dev/simulated')
+    # Globales de l'application rétablies par monkeypatch à la fin du test
+    monkeypatch.setattr(palazzetti_app, 'controller', controller)
+    monkeypatch.setattr(palazzetti_app, 'consumption_storage',
+                        ConsumptionStorage(os.path.join(str(tmp_path), 'consumption.json')))
+    bus_scheduler.start()
+    try:
+        client = palazzetti_app.app.test_client()
+
+        response = client.get('/api/chrono_data')
+        assert response.status_code == 200
+        assert response.get_json()['data']['timer_enabled'] is False
+        etag = response.headers['ETag']
+        assert client.get('/api/chrono_data', headers={'If-None-Match': etag}).status_code == 304
+
+        response = client.post('/api/chrono_status', json={'enabled': True})
+        assert response.get_json()['success'] is True
+
+        response = client.get('/api/chrono_data', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.get_json()['data']['timer_enabled'] is True
+    finally:
+        bus_scheduler.stop()
+        controller.disconnect()
+
+
+if __name__ == '__main__':
+    with pytest.MonkeyPatch.context() as patch:
+        test_timer_toggle_changes_chrono_etag(patch, tempfile.mkdtemp())
+    print("✓ test_timer_toggle_changes_chrono_etag")
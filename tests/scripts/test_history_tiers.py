@@ -0,0 +1,62 @@
+"""
+Tests du choix du niveau d'agrégation de l'historique selon la rétention
+
+Une plage plus ancienne que la rétention des agrégats minute doit être servie
+depuis les échantillons bruts (ou un niveau plus grossier encore conservé),
+pas depuis un niveau purgé qui la renverrait vide.
+"""
+import sys
+import os
+import tempfile
+import time
+
+# Ajouter le répertoire raspberry_pi au path pour importer les modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'raspberry_pi'))
+
+from history_store import HistoryStore
+
+
+def _store(directory, raw_days):
+    retention = {'raw': raw_days, 'minute': 30, 'hour': 730, 'day': 0}
+    return HistoryStore(str(directory), retention_days=retention, archive_after_days=0)
+
+
+def _fill(store, start, minutes):
+    for i in range(minutes):
+        store.append(start + i * 60, 1000 + i, 20.5, 21.0, 6)
+    store.apply_retention()
+
+
+def test_range_older_than_minute_retention_uses_raw(tmp_path):
+    """Plage de 40 jours: les agrégats minute sont purgés, les bruts sont encore là"""
+    store = _store(tmp_path, raw_days=365)
+    start = int(time.time()) - 40 * 86400
+    start -= start % 3600
+    _fill(store, start, 120)
+
+    assert store.select_tier(start, 60) is None
+    columns = store.query_columns('pqt', start, start + 7200, 60)
+    assert len(columns['t']) == 120
+    assert columns['t'][0] == start
+
+
+def test_range_older_than_raw_retention_uses_coarser_tier(tmp_path):
+    """Bruts et agrégats minute purgés: le niveau heure encore conservé sert la plage"""
+    store = _store(tmp_path, raw_days=7)
+    start = int(time.time()) - 40 * 86400
+    assert store.select_tier(start, 60).name == 'hour'
+
+
+def test_recent_range_keeps_requested_tier(tmp_path):
+    """Plage récente: le niveau minute reste choisi pour un pas d'une minute"""
+    store = _store(tmp_path, raw_days=365)
+    start = int(time.time()) - 86400
+    assert store.select_tier(start, 60).name == 'minute'
+
+
+if __name__ == '__main__':
+    for test in (test_range_older_than_minute_retention_uses_raw,
+                 test_range_older_than_raw_retention_uses_coarser_tier,
+                 test_recent_range_keeps_requested_tier):
+        test(tempfile.mkdtemp())
+        print(f"✓ {test.__name__}")
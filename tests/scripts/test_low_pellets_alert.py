@@ -0,0 +1,95 @@
+"""
+Tests de l'alerte de niveau de pellets bas (autonomie projetée)
+
+Poêle éteint, l'autonomie n'est pas projetée: l'alerte ne doit pas être
+déclarée résolue à chaque arrêt, seulement après un remplissage ou quand
+l'autonomie remonte nettement au-dessus du seuil.
+"""
+import sys
+import os
+
+# Ajouter le répertoire raspberry_pi au path pour importer les modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'raspberry_pi'))
+
+from email_notifications import EmailNotificationManager, AUTONOMY_HYSTERESIS
+
+
+class RecordingOutbox:
+    """File d'envoi qui garde les sujets au lieu d'envoyer"""
+
+    def __init__(self):
+        self.subjects = []
+
+    def send(self, subject, body, html_body, sender, recipients, wait=None):
+        self.subjects.append(subject)
+        return True
+
+
+def _manager():
+    outbox = RecordingOutbox()
+    smtp_config = {'smtp_server': 'localhost', 'smtp_port': 25, 'username': 'u', 'password': '',
+                   'from_email': 'poele@example.org', 'to_emails': ['moi@example.org'], 'use_tls': False}
+    manager = EmailNotificationManager(smtp_config, outbox=outbox)
+    manager.config = {
+        'enabled': True,
+        'alerts': {
+            'critical_errors': {'codes': [253], 'cooldown': 0},
+            'low_pellets': {'threshold': 20, 'autonomy_hours': 6, 'cooldown': 0},
+            'maintenance': {'threshold': 500, 'cooldown': 0},
+            'connection_lost': {'cooldown': 0},
+        }
+    }
+    return manager, outbox
+
+
+def _check(manager, hours_to_empty, fill_level=45, last_fill_date='2026-01-01T08:00:00'):
+    state = {'connected': True, 'error_code': 0, 'fill_level': {
+        'fill_level': fill_level, 'hours_to_empty': hours_to_empty, 'last_fill_date': last_fill_date}}
+    manager.check_all_conditions(state)
+
+
+def _low(outbox):
+    return [subject for subject in outbox.subjects if 'Pellets' in subject]
+
+
+def test_stove_off_keeps_autonomy_alert():
+    """Poêle qui s'arrête et redémarre: une seule alerte, aucune résolution"""
+    manager, outbox = _manager()
+    for hours in (3, None, 3, None, 2.5, None):
+        _check(manager, hours)
+    assert len(_low(outbox)) == 1
+    assert 'Bas' in _low(outbox)[0]
+
+
+def test_autonomy_resolves_with_hysteresis():
+    """L'alerte ne se résout qu'au-delà de AUTONOMY_HYSTERESIS fois le seuil"""
+    manager, outbox = _manager()
+    _check(manager, 5)
+    _check(manager, 6 * AUTONOMY_HYSTERESIS - 1)
+    assert len(_low(outbox)) == 1
+    _check(manager, 6 * AUTONOMY_HYSTERESIS + 1)
+    assert len(_low(outbox)) == 2
+    assert 'Bas' not in _low(outbox)[1]
+
+
+def test_refill_resolves_autonomy_alert():
+    """Un remplissage résout l'alerte même poêle éteint"""
+    manager, outbox = _manager()
+    _check(manager, 3)
+    _check(manager, None, fill_level=100, last_fill_date='2026-01-02T09:00:00')
+    assert len(_low(outbox)) == 2
+
+
+def test_missing_fill_data_keeps_verdict():
+    """Sans compteur de consommation, pas de résolution"""
+    manager, outbox = _manager()
+    _check(manager, None, fill_level=10)
+    manager.check_all_conditions({'connected': True, 'error_code': 0, 'fill_level': None})
+    assert len(_low(outbox)) == 1
+
+
+if __name__ == '__main__':
+    for test in (test_stove_off_keeps_autonomy_alert, test_autonomy_resolves_with_hysteresis,
+                 test_refill_resolves_autonomy_alert, test_missing_fill_data_keeps_verdict):
+        test()
+        print(f"✓ {test.__name__}")